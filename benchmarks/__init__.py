@@ -0,0 +1 @@
+"""Benchmarks for plone.registryfromenviron; not part of the test run."""
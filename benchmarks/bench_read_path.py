@@ -0,0 +1,249 @@
+"""Micro-benchmarks for the patched registry read path.
+
+Measures ``Registry.get``, ``Registry.__getitem__``, ``RecordsProxy``
+attribute access, ``registry.records[key].value`` and a pre-resolved
+:class:`~plone.registryfromenviron.handles.RecordHandle` (``get(registry)``
+and ``value``, which finds the registry utility itself) against a registry
+stored in an in-memory ZODB, for:
+
+- ``unpatched``: the original plone.registry methods,
+- ``miss``: patched, reading a key that is not overridden,
+- ``hit``: patched, reading an overridden key of each field type,
+
+each with 0, 10 and 1000 unrelated overrides in the table. Every read is
+timed warm, with the registry and its BTree buckets loaded, and cold, with
+the connection cache minimized before each single call, so the first read
+pays the persistent loads.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_read_path --output bench.json
+
+Prints one JSON document: ``{"meta": {...}, "results": [...]}`` where every
+result holds ``case``, ``op``, ``field``, ``overrides``, ``ns_per_op`` (warm,
+best of ``repeat`` runs of ``number`` calls) and ``cold_ns_per_op`` (median
+of ``cold_number`` calls).
+"""
+
+from plone.registry import field as reg_field
+from plone.registry.interfaces import IRegistry
+from plone.registry.recordsproxy import RecordsProxy
+from plone.registry.registry import Registry
+from plone.registryfromenviron import environ
+from plone.registryfromenviron import patch
+from plone.registryfromenviron.handles import RecordHandle
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope import schema
+from zope.component import getGlobalSiteManager
+from zope.interface import Interface
+from zope.interface.interface import InterfaceClass
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+import transaction
+
+
+PREFIX = "bench.ISettings."
+FILLER = 1000
+OVERRIDE_COUNTS = (0, 10, 1000)
+
+# field name -> (persistent field factory, stored value, raw override).
+# Factories, since a persistent field can only be stored in one database.
+FIELDS = {
+    "textline": (reg_field.TextLine, "stored", "overridden"),
+    "text": (reg_field.Text, "stored", "over\nridden"),
+    "int": (reg_field.Int, 1, "2"),
+    "bool": (reg_field.Bool, False, "true"),
+    "float": (reg_field.Float, 1.0, "2.5"),
+    "decimal": (reg_field.Decimal, None, "2.5"),
+    "list": (lambda: reg_field.List(value_type=reg_field.TextLine()), [], '["a", "b"]'),
+    "tuple": (
+        lambda: reg_field.Tuple(value_type=reg_field.TextLine()),
+        (),
+        '["a", "b"]',
+    ),
+    "set": (
+        lambda: reg_field.Set(value_type=reg_field.TextLine()),
+        set(),
+        '["a", "b"]',
+    ),
+    "frozenset": (
+        lambda: reg_field.FrozenSet(value_type=reg_field.TextLine()),
+        frozenset(),
+        '["a", "b"]',
+    ),
+    "dict": (
+        lambda: reg_field.Dict(
+            key_type=reg_field.TextLine(), value_type=reg_field.TextLine()
+        ),
+        {},
+        '{"k": "v"}',
+    ),
+    "datetime": (
+        reg_field.Datetime,
+        datetime.datetime(2024, 1, 1),
+        "2025-06-01T12:00:00",
+    ),
+    "date": (reg_field.Date, datetime.date(2024, 1, 1), "2025-06-01"),
+    "timedelta": (reg_field.Timedelta, datetime.timedelta(0), "01:30"),
+    "bytes": (reg_field.Bytes, b"stored", "overridden"),
+    "choice": (lambda: reg_field.Choice(values=["a", "b"]), "a", "b"),
+}
+
+
+# Schema read through RecordsProxy; one attribute per benchmarked field.
+ISettings = InterfaceClass(
+    "ISettings",
+    (Interface,),
+    {name: schema.Field() for name in FIELDS},
+    __module__=__name__,
+)
+
+
+def make_database():
+    """Return a MappingStorage DB whose root holds a populated ``registry``."""
+    db = DB(MappingStorage())
+    connection = db.open()
+    registry = Registry()
+    for name, (factory, value, _) in FIELDS.items():
+        registry._records._fields[PREFIX + name] = factory()
+        registry._records._values[PREFIX + name] = value
+    for i in range(FILLER):
+        registry._records._fields[f"bench.filler.r{i}"] = reg_field.Int()
+        registry._records._values[f"bench.filler.r{i}"] = i
+    connection.root()["registry"] = registry
+    transaction.commit()
+    connection.close()
+    return db
+
+
+def set_overrides(count, hit=None):
+    """Fill the override table with ``count`` filler keys (+ ``hit``)."""
+    environ.RAW_OVERRIDES.clear()
+    environ._COERCED.clear()
+    for i in range(count):
+        environ.RAW_OVERRIDES[f"bench.filler.r{i}"] = str(i + 1)
+    if hit is not None:
+        environ.RAW_OVERRIDES[PREFIX + hit] = FIELDS[hit][2]
+
+
+def _operations(registry, name):
+    key = PREFIX + name
+    proxy = RecordsProxy(registry, ISettings, prefix=PREFIX)
+    handle = RecordHandle(key)
+    return {
+        "get": lambda: registry.get(key),
+        "getitem": lambda: registry[key],
+        "proxy": lambda: getattr(proxy, name),
+        "record": lambda: registry.records[key].value,
+        "handle": lambda: handle.get(registry),
+        "value": lambda: handle.value,
+    }
+
+
+def _time(func, number, repeat):
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1e9
+
+
+def _time_cold(connection, func, number):
+    timings = []
+    for _ in range(number):
+        connection.cacheMinimize()
+        started = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - started)
+    return statistics.median(timings)
+
+
+def run(number=20000, repeat=5, fields=None, cold_number=200):
+    """Run every scenario and return the list of result dicts."""
+    fields = list(fields or FIELDS)
+    saved = environ.RAW_OVERRIDES.copy()
+    was_patched = bool(patch._originals)
+    db = make_database()
+    connection = db.open()
+    registry = connection.root()["registry"]
+    results = []
+    site_manager = getGlobalSiteManager()
+    site_manager.registerUtility(registry, IRegistry)
+    try:
+        patch.unpatch()
+        for count in OVERRIDE_COUNTS:
+            for case in ("unpatched", "miss", "hit"):
+                if case == "unpatched":
+                    patch.unpatch()
+                else:
+                    patch.apply_patch()
+                for name in fields:
+                    set_overrides(count, hit=name if case == "hit" else None)
+                    for op, func in _operations(registry, name).items():
+                        func()  # coerce outside the timed loop
+                        results.append(
+                            {
+                                "case": case,
+                                "op": op,
+                                "field": name,
+                                "overrides": count,
+                                "ns_per_op": round(_time(func, number, repeat), 1),
+                                "cold_ns_per_op": round(
+                                    _time_cold(connection, func, cold_number), 1
+                                ),
+                            }
+                        )
+    finally:
+        site_manager.unregisterUtility(registry, IRegistry)
+        patch.unpatch()
+        set_overrides(0)
+        environ.RAW_OVERRIDES.update(saved)
+        if was_patched:
+            patch.apply_patch()
+        transaction.abort()
+        connection.close()
+        db.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--number", type=int, default=20000, help="calls per timing run"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timing runs, best is kept"
+    )
+    parser.add_argument(
+        "--cold-number", type=int, default=200, help="cold calls, median is kept"
+    )
+    parser.add_argument(
+        "--field", action="append", choices=sorted(FIELDS), help="limit to field"
+    )
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "number": args.number,
+            "repeat": args.repeat,
+            "cold_number": args.cold_number,
+        },
+        "results": run(args.number, args.repeat, args.field, args.cold_number),
+    }
+    text = json.dumps(document, indent=1)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
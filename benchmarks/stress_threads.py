@@ -0,0 +1,299 @@
+"""Multi-threaded stress harness for the patched registry read path.
+
+Reads overridden and plain keys through the patched ``Registry.get`` and
+``Registry.__getitem__`` from N reader threads at once, each with its own
+ZODB connection to one shared storage (``MappingStorage`` or a
+``FileStorage`` in a temporary directory), while writer threads commit
+changes to the same registry. Every run starts with a cold coercion cache,
+so all readers race for the first coercion of every key.
+
+Each run reports:
+
+- ``ops_per_s`` and ``scaling``, the throughput relative to one thread,
+- ``duplicate_coercions``: keys coerced more than once; single-flight
+  coercion (see :func:`environ._resolve`) keeps this empty,
+- ``inconsistent``: reads returning anything but the override (or, for
+  plain and invalid keys, the type stored in ZODB),
+- ``commits`` and ``conflicts`` of the writers.
+
+Run from the repository root::
+
+    python -m benchmarks.stress_threads --threads 1,2,4,8 --storage file
+
+Prints one JSON document: ``{"meta": {...}, "results": [...]}``. Exits
+with status 1 if any run saw a duplicate coercion or an inconsistent value.
+"""
+
+from plone.registry import field as reg_field
+from plone.registry.registry import Registry
+from plone.registryfromenviron import environ
+from plone.registryfromenviron import patch
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.MappingStorage import MappingStorage
+from ZODB.POSException import ConflictError
+
+import argparse
+import collections
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import transaction
+
+
+KEYS = 50
+THREADS = (1, 2, 4, 8)
+STORAGES = ("mapping", "file")
+# Readers start a new transaction (and see the writers' commits) this often.
+SYNC_EVERY = 20
+
+
+def _expected():
+    """Return ``{key: expected value}`` of the overridden keys."""
+    expected = {}
+    for i in range(KEYS):
+        expected[f"stress.int{i}"] = i * 7
+        expected[f"stress.list{i}"] = ["a", str(i)]
+    return expected
+
+
+def make_overrides():
+    """Return the override table: ints, lists and one invalid key."""
+    raw = {}
+    for i in range(KEYS):
+        raw[f"stress.int{i}"] = str(i * 7)
+        raw[f"stress.list{i}"] = json.dumps(["a", str(i)])
+    raw["stress.bad"] = "not a number"
+    return environ.OverrideTable(raw)
+
+
+def make_database(storage, directory):
+    """Return a DB on ``storage`` whose root holds a populated ``registry``."""
+    factories = {
+        "file": lambda: FileStorage(os.path.join(directory, "Data.fs")),
+        "mapping": MappingStorage,
+    }
+    db = DB(factories[storage]())
+    connection = db.open()
+    registry = Registry()
+    fields, values = registry._records._fields, registry._records._values
+    for i in range(KEYS):
+        fields[f"stress.int{i}"] = reg_field.Int()
+        values[f"stress.int{i}"] = 0
+        fields[f"stress.list{i}"] = reg_field.List(value_type=reg_field.TextLine())
+        values[f"stress.list{i}"] = []
+        fields[f"stress.plain{i}"] = reg_field.Int()
+        values[f"stress.plain{i}"] = 0
+    fields["stress.bad"] = reg_field.Int()
+    values["stress.bad"] = 0
+    connection.root()["registry"] = registry
+    transaction.commit()
+    connection.close()
+    return db
+
+
+class _Run:
+    """Shared state of one run: counters, the stop flag and problems seen."""
+
+    def __init__(self, threads):
+        self.lock = threading.Lock()
+        self.start = threading.Barrier(threads + 1)
+        self.stop = threading.Event()
+        self.coercions = collections.Counter()
+        self.ops = 0
+        self.inconsistent = 0
+        self.commits = 0
+        self.conflicts = 0
+        self.errors = []
+
+    def fail(self, error):
+        with self.lock:
+            self.errors.append(repr(error))
+
+
+def _read(db, run, expected):
+    manager = transaction.TransactionManager()
+    connection = db.open(transaction_manager=manager)
+    ops = inconsistent = 0
+    try:
+        registry = connection.root()["registry"]
+        names = list(expected)
+        plain = [f"stress.plain{i}" for i in range(KEYS)] + ["stress.bad"]
+        run.start.wait()
+        rounds = 0
+        while not run.stop.is_set():
+            for name in names:
+                if registry.get(name) != expected[name]:
+                    inconsistent += 1
+                if registry[name] != expected[name]:
+                    inconsistent += 1
+            for name in plain:
+                if type(registry.get(name)) is not int:
+                    inconsistent += 1
+            ops += 2 * len(names) + len(plain)
+            rounds += 1
+            if rounds % SYNC_EVERY == 0:
+                manager.abort()
+    except Exception as error:
+        run.fail(error)
+    finally:
+        manager.abort()
+        connection.close()
+        with run.lock:
+            run.ops += ops
+            run.inconsistent += inconsistent
+
+
+def _write(db, run, index):
+    manager = transaction.TransactionManager()
+    connection = db.open(transaction_manager=manager)
+    commits = conflicts = 0
+    try:
+        registry = connection.root()["registry"]
+        run.start.wait()
+        value = 0
+        while not run.stop.is_set():
+            value += 1
+            values = registry.records._values
+            # Overridden keys too: the override must keep winning.
+            values[f"stress.plain{(value + index) % KEYS}"] = value
+            values[f"stress.int{(value + index) % KEYS}"] = -value
+            try:
+                manager.commit()
+                commits += 1
+            except ConflictError:
+                manager.abort()
+                conflicts += 1
+            time.sleep(0.001)
+    except Exception as error:
+        run.fail(error)
+    finally:
+        manager.abort()
+        connection.close()
+        with run.lock:
+            run.commits += commits
+            run.conflicts += conflicts
+
+
+def run_threads(db, threads, duration, writers=1):
+    """Run ``threads`` readers and ``writers`` writers for ``duration`` seconds.
+
+    Starts from an empty coercion cache and counts every coercion per key.
+    """
+    run = _Run(threads + writers)
+    expected = _expected()
+    coerce_override = environ._coerce_override
+
+    def counted(registry, name, overrides):
+        with run.lock:
+            run.coercions[name] += 1
+        return coerce_override(registry, name, overrides)
+
+    environ.RAW_OVERRIDES.coerced.clear()
+    environ._LOGGED.clear()
+    environ._coerce_override = counted
+    workers = [
+        threading.Thread(target=_read, args=(db, run, expected)) for _ in range(threads)
+    ] + [threading.Thread(target=_write, args=(db, run, i)) for i in range(writers)]
+    try:
+        for worker in workers:
+            worker.start()
+        run.start.wait()
+        started = time.perf_counter()
+        time.sleep(duration)
+        run.stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        environ._coerce_override = coerce_override
+    return {
+        "threads": threads,
+        "writers": writers,
+        "ops": run.ops,
+        "ops_per_s": round(run.ops / elapsed, 1),
+        "coerced_keys": len(run.coercions),
+        "duplicate_coercions": {
+            name: count for name, count in sorted(run.coercions.items()) if count > 1
+        },
+        "inconsistent": run.inconsistent,
+        "commits": run.commits,
+        "conflicts": run.conflicts,
+        "errors": run.errors,
+    }
+
+
+def run(storage="mapping", threads=THREADS, duration=1.0, writers=1):
+    """Run every thread count against one storage; return the result dicts."""
+    saved = environ.swap_overrides(make_overrides())
+    was_patched = bool(patch._originals)
+    directory = tempfile.mkdtemp(prefix="registryfromenviron-stress-")
+    db = make_database(storage, directory)
+    db.setPoolSize(max(threads, default=1) + writers)
+    results = []
+    try:
+        patch.unpatch()
+        patch.apply_patch()
+        for count in threads:
+            result = run_threads(db, count, duration, writers)
+            result["storage"] = storage
+            results.append(result)
+        base = results[0]["ops_per_s"] / results[0]["threads"] if results else 0
+        for result in results:
+            result["scaling"] = round(result["ops_per_s"] / base, 2) if base else 0
+    finally:
+        patch.unpatch()
+        environ.swap_overrides(saved)
+        if was_patched:
+            patch.apply_patch()
+        db.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--threads",
+        default=",".join(map(str, THREADS)),
+        help="comma-separated reader thread counts",
+    )
+    parser.add_argument("--storage", choices=STORAGES, default="mapping")
+    parser.add_argument(
+        "--duration", type=float, default=2.0, help="seconds per thread count"
+    )
+    parser.add_argument("--writers", type=int, default=1, help="writer threads")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    threads = [int(count) for count in args.threads.split(",")]
+    results = run(args.storage, threads, args.duration, args.writers)
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "storage": args.storage,
+            "duration": args.duration,
+            "keys": KEYS,
+        },
+        "results": results,
+    }
+    text = json.dumps(document, indent=1)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    broken = any(
+        r["duplicate_coercions"] or r["inconsistent"] or r["errors"] for r in results
+    )
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,36 @@ the package patches ``plone.registry.registry.Registry.__getitem__`` and ``.get`
 to consult those variables before falling back to the ZODB-stored value.
 
 If no matching env vars are present, the package is a no-op — no patching occurs
-and there is zero runtime overhead.
+and there is zero runtime overhead. The request memo, the process cache and
+read profiling (see :mod:`.memo`, :mod:`.cache` and :mod:`.profile`) also
+activate the patch, as they apply to every registry read. In materialize
+mode (see :mod:`.materialize`) overrides are written into ZODB instead and
+do not activate the patch.
 """
 
+from . import cache
+from . import materialize
+from . import memo
+from . import profile
 from .environ import RAW_OVERRIDES
 from .patch import apply_patch
 
 
 def _maybe_activate():
-    """Apply the patch iff PLONE_REGISTRY_* env vars were found at startup."""
-    if RAW_OVERRIDES:
+    """Apply the patch iff PLONE_REGISTRY_* env vars were found at startup.
+
+    Or ``PLONE_REGISTRYPATTERN_*`` pattern overrides, see :mod:`.patterns`,
+    or ``PLONE_REGISTRYSITE_*`` site-scoped ones.
+    Or if the request memo, the process cache or profiling is switched on.
+    Overrides are ignored in materialize mode.
+    """
+    overridden = RAW_OVERRIDES or RAW_OVERRIDES.patterns or RAW_OVERRIDES.scopes
+    if (
+        (overridden and not materialize.ENABLED)
+        or memo.ENABLED
+        or cache.ENABLED
+        or profile.ENABLED
+    ):
         apply_patch()
 
 
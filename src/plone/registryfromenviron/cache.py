@@ -0,0 +1,256 @@
+"""Optional process-wide read-through cache for registry values.
+
+Enabled with ``PLONE_REGISTRYFROMENVIRON_PROCESS_CACHE=true``. Values read
+from ZODB through ``Registry.__getitem__`` / ``.get`` are kept per process,
+keyed by database name, registry oid and record name, and shared by all
+threads (ZODB connections).
+
+Invalidation follows ZODB: every database the cache serves is watched by
+wrapping the invalidation entry points of its ``MVCCAdapter``, which see
+both commits made in this process and invalidations sent by the storage
+for other processes (ZEO). When a committed transaction touches the
+registry object or any node of its ``Records._values`` BTree, the cached
+values of that database are dropped. Other commits only advance the
+watermark tid. ``MVCCAdapter.invalidateCache`` is wrapped as well: ZEO
+calls it after a reconnect when it cannot tell which objects changed
+meanwhile, and then every cached value of the database is dropped.
+
+To never cache state that is not committed or already outdated:
+
+- a connection with uncommitted changes bypasses the cache, so writers
+  read their own writes,
+- a value is only stored when the reading connection's snapshot is newer
+  than the last invalidation seen.
+
+Collection values follow ``VALUE_POLICY`` like overrides do: under
+``frozen`` the frozen value is cached and handed out, under ``copy`` a
+private copy is cached and every reader gets its own copy. Under
+``shared`` lists, sets and dicts are not cached at all, so no two
+connections ever hand out the same mutable object.
+
+Storages without an ``MVCCAdapter`` (e.g. RelStorage, which polls
+invalidations per connection) are not cached; a warning is logged once.
+
+``STATS`` counts hits, misses, fills and invalidations. The counters are
+plain integers updated without a lock and are approximate under load.
+"""
+
+from . import environ
+from .environ import _copier
+from .environ import _MARKER
+from .environ import _MUTABLE
+from .environ import config_flag
+from .environ import freeze
+from ZODB.mvccadapter import MVCCAdapter
+
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config_flag("PROCESS_CACHE")
+
+STATS = {"hits": 0, "misses": 0, "fills": 0, "invalidations": 0}
+
+_lock = threading.Lock()
+
+
+class _DatabaseCache:
+    """Cached values and watched oids of one database."""
+
+    def __init__(self):
+        # (registry oid, record name) -> (value, copier), see _entry()
+        self.values = {}
+        # registry oids whose _values BTree nodes are in ``oids``
+        self.registries = set()
+        self.oids = set()
+        # tid of the last invalidation seen
+        self.watermark = b""
+
+    def invalidate(self, tid, oids):
+        with _lock:
+            self.watermark = max(self.watermark, tid)
+            if self.oids.isdisjoint(oids):
+                return
+            self._clear()
+
+    def invalidate_all(self, tid):
+        """Drop every value; snapshots up to ``tid`` are not cached again."""
+        with _lock:
+            self.watermark = max(self.watermark, tid)
+            self._clear()
+
+    def _clear(self):
+        self.values.clear()
+        self.registries.clear()
+        self.oids.clear()
+        STATS["invalidations"] += 1
+
+
+# database name -> _DatabaseCache, or None if the database cannot be watched
+_CACHES: dict[str, _DatabaseCache | None] = {}
+
+
+def tree_oids(tree):
+    """Return the oids of a BTree and all its persistent nodes.
+
+    Walks the pickled state: inner nodes are ``((child, key, child, ...),
+    firstbucket)``, buckets ``((key, value, ...), next bucket)``. Small trees
+    keep their only bucket inline and consist of the root alone.
+    """
+    oids = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node._p_oid is None or node._p_oid in oids:
+            continue
+        oids.add(node._p_oid)
+        state = node.__getstate__()
+        if not state:
+            continue
+        items = state[0]
+        if items and hasattr(items[0], "_p_oid"):
+            stack.extend(items[::2])
+        if len(state) > 1 and hasattr(state[1], "_p_oid"):
+            stack.append(state[1])
+    return oids
+
+
+def watch(db):
+    """Start caching for ``db``; returns its cache or None if not possible."""
+    name = db.database_name
+    with _lock:
+        if name in _CACHES:
+            return _CACHES[name]
+        adapter = db._mvcc_storage
+        if not isinstance(adapter, MVCCAdapter):
+            logger.warning(
+                "Process registry cache disabled for database %r: "
+                "storage %s has no central invalidation hook",
+                name,
+                type(adapter).__name__,
+            )
+            _CACHES[name] = None
+            return None
+        cache = _CACHES[name] = _DatabaseCache()
+        # Commits before watching were not seen: treat the newest as invalidating.
+        cache.watermark = db.lastTransaction()
+        invalidate = adapter.invalidate
+        invalidate_finish = adapter._invalidate_finish
+        invalidate_cache = adapter.invalidateCache
+
+        def _invalidate(tid, oids):
+            cache.invalidate(tid, oids)
+            return invalidate(tid, oids)
+
+        def _invalidate_finish(tid, oids, committing_instance):
+            cache.invalidate(tid, oids)
+            return invalidate_finish(tid, oids, committing_instance)
+
+        def _invalidate_cache():
+            # No tid: whatever was committed until now may have changed.
+            cache.invalidate_all(adapter._storage.lastTransaction())
+            return invalidate_cache()
+
+        adapter.invalidate = _invalidate
+        adapter._invalidate_finish = _invalidate_finish
+        adapter.invalidateCache = _invalidate_cache
+        return cache
+
+
+def _database_cache(registry):
+    """Return the cache serving ``registry``'s connection, or None."""
+    jar = registry._p_jar
+    if jar is None or jar._registered_objects:
+        return None
+    db = jar.db()
+    try:
+        return _CACHES[db.database_name]
+    except KeyError:
+        return watch(db)
+
+
+def _entry(value):
+    """Return the ``(value, copier)`` to cache for a ZODB value, or None.
+
+    Prepared for VALUE_POLICY as overrides are, see
+    :func:`environ._coerce_override`. None for a mutable value under
+    ``shared``: it is not cached.
+    """
+    if not isinstance(value, _MUTABLE):
+        return value, None
+    policy = environ.VALUE_POLICY
+    if policy == "frozen":
+        return freeze(value), None
+    if policy == "copy":
+        copier = _copier(value)
+        return copier(value), copier
+    return None
+
+
+def _serve(cache, registry, name, value):
+    """Cache ``value`` read from ZODB if allowed; return what to hand out."""
+    entry = _entry(value)
+    if entry is None:
+        return value
+    _fill(cache, registry, name, entry)
+    value, copier = entry
+    return value if copier is None else copier(value)
+
+
+def _fill(cache, registry, name, entry):
+    start = getattr(registry._p_jar._storage, "_start", None)
+    if start is None or start <= cache.watermark:
+        return
+    oid = registry._p_oid
+    oids = None
+    if oid not in cache.registries:
+        # May load buckets: never under _lock, as storages call the
+        # invalidation hook while holding their own locks.
+        oids = tree_oids(registry.records._values)
+        oids.add(oid)
+    with _lock:
+        if start <= cache.watermark:
+            return
+        if oids is not None:
+            cache.oids.update(oids)
+            cache.registries.add(oid)
+        elif oid not in cache.registries:
+            return  # invalidated meanwhile
+        cache.values[(oid, name)] = entry
+        STATS["fills"] += 1
+
+
+def make_cached_accessors(original_getitem, original_get):
+    """Wrap the original ``__getitem__`` / ``get`` with the process cache."""
+    marker = _MARKER
+
+    def __getitem__(self, name):
+        cache = _database_cache(self)
+        if cache is None:
+            return original_getitem(self, name)
+        entry = cache.values.get((self._p_oid, name), marker)
+        if entry is not marker:
+            STATS["hits"] += 1
+            value, copier = entry
+            return value if copier is None else copier(value)
+        STATS["misses"] += 1
+        return _serve(cache, self, name, original_getitem(self, name))
+
+    def get(self, name, default=None):
+        cache = _database_cache(self)
+        if cache is None:
+            return original_get(self, name, default)
+        entry = cache.values.get((self._p_oid, name), marker)
+        if entry is not marker:
+            STATS["hits"] += 1
+            value, copier = entry
+            return value if copier is None else copier(value)
+        STATS["misses"] += 1
+        value = original_get(self, name, marker)
+        if value is marker:
+            return default
+        return _serve(cache, self, name, value)
+
+    return __getitem__, get
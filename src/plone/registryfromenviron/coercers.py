@@ -0,0 +1,347 @@
+"""Compiled coercers: field definition -> callable turning a raw value into a value.
+
+:func:`compile_coercer` inspects a field once and returns a specialized
+callable, cached per field class and definition (see :func:`definition`).
+Sites that share a field definition, and every reload, reuse the same
+callable, so coercing an override is a single call.
+
+A coercer accepts the raw env-var string or an already decoded value: a
+JSON item inside a collection, or a value of a JSON / TOML override
+document:
+
+- collections and dicts decode JSON once at the top and coerce every item
+  (and key) with the coercer of ``value_type`` (``key_type``),
+- ``Int``, ``Float``, ``Decimal`` and ``Bool`` parse strings and accept
+  JSON numbers / booleans,
+- ``Datetime`` and ``Date`` parse ISO 8601 and accept TOML dates;
+  ``Timedelta`` takes seconds, ``[H]H:MM[:SS]`` or an ISO 8601 duration
+  such as ``P1DT2H30M``,
+- ``Bytes`` / ``BytesLine`` encode as UTF-8,
+- ``Choice`` with fixed values maps the raw string to the matching value
+  (so ``"2"`` selects ``2``); with a named vocabulary the string is kept,
+- text fields keep the string.
+
+Coercers only convert. :func:`coerce` also runs ``field.validate`` on the
+result, so length, range, vocabulary and nested item constraints hold.
+
+Overrides without a record name their type with a hint instead, such as
+``int`` or ``json-list:int``; :func:`hint_field` returns the field a hint
+stands for.
+"""
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from zope import schema
+from zope.schema import interfaces as schema_ifaces
+from zope.schema._field import MissingVocabularyError
+from zope.schema.interfaces import SchemaNotCorrectlyImplemented
+from zope.schema.interfaces import ValidationError
+from zope.schema.interfaces import WrongContainedType
+
+import decimal
+import json
+import re
+
+
+# What a coercion may raise for a value that does not fit the field.
+# json.JSONDecodeError and decimal.InvalidOperation are ValueErrors.
+COERCION_ERRORS = (ValueError, TypeError, ValidationError, decimal.InvalidOperation)
+
+# Attributes that change how a value is coerced or validated.
+_DEFINITION_ATTRIBUTES = (
+    "required",
+    "min",
+    "max",
+    "min_length",
+    "max_length",
+    "unique",
+    "vocabularyName",
+    "_values",
+)
+
+_TRUE = ("true", "1", "yes", "on")
+
+_DURATION = re.compile(
+    r"P(?:(?P<weeks>\d+(?:\.\d+)?)W)?(?:(?P<days>\d+(?:\.\d+)?)D)?"
+    r"(?:T(?:(?P<hours>\d+(?:\.\d+)?)H)?(?:(?P<minutes>\d+(?:\.\d+)?)M)?"
+    r"(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+
+# definition -> coercer
+_COERCERS: dict[tuple, object] = {}
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+
+def definition(field):
+    """Return a hashable description of everything coercion depends on."""
+    if field is None:
+        return None
+    return (
+        type(field).__module__,
+        type(field).__qualname__,
+        tuple(_hashable(getattr(field, name, None)) for name in _DEFINITION_ATTRIBUTES),
+        definition(getattr(field, "key_type", None)),
+        definition(getattr(field, "value_type", None)),
+    )
+
+
+def compile_coercer(field):
+    """Return the cached coercer for ``field``'s definition."""
+    key = definition(field)
+    try:
+        return _COERCERS[key]
+    except KeyError:
+        pass
+    except TypeError:  # unhashable attribute value: do not cache
+        return _compile(field)
+    coercer = _COERCERS[key] = _compile(field)
+    return coercer
+
+
+def _missing_vocabulary(error):
+    """True if ``error`` only reports named vocabularies not found.
+
+    Collections and dicts report the errors of their items in a
+    ``WrongContainedType``, ``Object`` fields in a
+    ``SchemaNotCorrectlyImplemented``, possibly nested.
+    """
+    if isinstance(error, MissingVocabularyError):
+        return True
+    if isinstance(error, (WrongContainedType, SchemaNotCorrectlyImplemented)):
+        return bool(error.errors) and all(
+            _missing_vocabulary(item) for item in error.errors
+        )
+    return False
+
+
+def coerce(raw, field):
+    """Coerce ``raw`` for ``field`` and validate the result.
+
+    Raises one of :data:`COERCION_ERRORS` if the value does not fit. A named
+    vocabulary that cannot be looked up here (no site) is not validated,
+    also not for the items of a collection.
+    """
+    value = compile_coercer(field)(raw)
+    try:
+        field.validate(value)
+    except ValidationError as error:
+        if not _missing_vocabulary(error):
+            raise
+    return value
+
+
+# Type hint -> field factory. Collection hints take an item hint after a
+# colon: "json-list:int" is a list of ints, "json-dict:bool" maps to bools.
+_HINTS = {
+    "bool": schema.Bool,
+    "int": schema.Int,
+    "float": schema.Float,
+    "decimal": schema.Decimal,
+    "text": schema.Text,
+    "textline": schema.TextLine,
+    "bytes": schema.Bytes,
+    "datetime": schema.Datetime,
+    "date": schema.Date,
+    "timedelta": schema.Timedelta,
+}
+_COLLECTION_HINTS = {
+    "json-list": schema.List,
+    "json-tuple": schema.Tuple,
+    "json-set": schema.Set,
+    "json-dict": schema.Dict,
+}
+
+# hint -> field
+_HINT_FIELDS: dict[str, object] = {}
+
+
+def hint_field(hint):
+    """Return the field the type hint ``hint`` stands for.
+
+    Raises ValueError for an unknown hint.
+    """
+    if not isinstance(hint, str):
+        raise ValueError(f"Unknown type hint {hint!r}")
+    try:
+        return _HINT_FIELDS[hint]
+    except KeyError:
+        pass
+    kind, sep, item = hint.strip().lower().partition(":")
+    if kind in _COLLECTION_HINTS:
+        value_type = hint_field(item) if sep else None
+        field = _COLLECTION_HINTS[kind](value_type=value_type, required=False)
+    elif kind in _HINTS and not sep:
+        field = _HINTS[kind](required=False)
+    else:
+        raise ValueError(f"Unknown type hint {hint!r}")
+    _HINT_FIELDS[hint] = field
+    return field
+
+
+def _json(raw):
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+def _to_bool(raw):
+    if isinstance(raw, str):
+        return raw.lower() in _TRUE
+    if isinstance(raw, (bool, int)):
+        return bool(raw)
+    raise TypeError(f"Cannot convert {raw!r} to bool")
+
+
+def _to_int(raw):
+    if isinstance(raw, str) or (isinstance(raw, int) and not isinstance(raw, bool)):
+        return int(raw)
+    raise TypeError(f"Cannot convert {raw!r} to int")
+
+
+def _to_float(raw):
+    if isinstance(raw, (str, int, float)) and not isinstance(raw, bool):
+        return float(raw)
+    raise TypeError(f"Cannot convert {raw!r} to float")
+
+
+def _to_decimal(raw):
+    if isinstance(raw, (str, int, float)) and not isinstance(raw, bool):
+        return decimal.Decimal(str(raw))
+    raise TypeError(f"Cannot convert {raw!r} to Decimal")
+
+
+def _to_text(raw):
+    if isinstance(raw, str):
+        return raw
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return str(raw)
+    raise TypeError(f"Cannot convert {raw!r} to text")
+
+
+def _to_bytes(raw):
+    return _to_text(raw).encode("utf-8")
+
+
+def _to_datetime(raw):
+    if isinstance(raw, datetime):
+        return raw
+    return datetime.fromisoformat(_to_text(raw))
+
+
+def _to_date(raw):
+    if isinstance(raw, datetime):
+        return raw.date()
+    if isinstance(raw, date):
+        return raw
+    return date.fromisoformat(_to_text(raw))
+
+
+def _to_timedelta(raw):
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return timedelta(seconds=raw)
+    raw = _to_text(raw).strip()
+    match = _DURATION.match(raw)
+    if match and raw != "P":
+        return timedelta(
+            **{name: float(value) for name, value in match.groupdict().items() if value}
+        )
+    if ":" in raw:
+        parts = [float(part) for part in raw.split(":")]
+        if len(parts) == 2:
+            parts.append(0.0)
+        if len(parts) != 3:
+            raise ValueError(f"Invalid duration {raw!r}")
+        hours, minutes, seconds = parts
+        return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+    return timedelta(seconds=float(raw))
+
+
+def _choice(field):
+    values = getattr(field, "_values", None)
+    if values is None:
+        return _to_text
+    by_text = {str(value): value for value in values}
+
+    def coerce_choice(raw):
+        if not isinstance(raw, str) and raw in values:
+            return raw
+        try:
+            return by_text[_to_text(raw)]
+        except KeyError:
+            raise ValueError(f"{raw!r} is not one of {sorted(by_text)}") from None
+
+    return coerce_choice
+
+
+def _sequence(factory, item):
+    def coerce_sequence(raw):
+        value = _json(raw)
+        if not isinstance(value, list):
+            raise TypeError(f"Expected a JSON array, got {value!r}")
+        if item is None:
+            return factory(value)
+        return factory(item(entry) for entry in value)
+
+    return coerce_sequence
+
+
+def _dict(key, item):
+    def coerce_dict(raw):
+        value = _json(raw)
+        if not isinstance(value, dict):
+            raise TypeError(f"Expected a JSON object, got {value!r}")
+        return {
+            key(name) if key else name: item(entry) if item else entry
+            for name, entry in value.items()
+        }
+
+    return coerce_dict
+
+
+_SEQUENCES = (
+    (schema_ifaces.ITuple, tuple),
+    (schema_ifaces.IList, list),
+    (schema_ifaces.ISet, set),
+    (schema_ifaces.IFrozenSet, frozenset),
+)
+
+# Checked in order; the first interface the field provides wins.
+_SCALARS = (
+    (schema_ifaces.IBool, _to_bool),
+    (schema_ifaces.IInt, _to_int),
+    (schema_ifaces.IFloat, _to_float),
+    (schema_ifaces.IDecimal, _to_decimal),
+    (schema_ifaces.IDatetime, _to_datetime),
+    (schema_ifaces.IDate, _to_date),
+    (schema_ifaces.ITimedelta, _to_timedelta),
+    (schema_ifaces.IBytes, _to_bytes),
+)
+
+
+def _compile(field):
+    if schema_ifaces.IChoice.providedBy(field):
+        return _choice(field)
+    for interface, factory in _SEQUENCES:
+        if interface.providedBy(field):
+            value_type = getattr(field, "value_type", None)
+            return _sequence(factory, value_type and compile_coercer(value_type))
+    if schema_ifaces.IDict.providedBy(field):
+        key_type = getattr(field, "key_type", None)
+        value_type = getattr(field, "value_type", None)
+        return _dict(
+            key_type and compile_coercer(key_type),
+            value_type and compile_coercer(value_type),
+        )
+    for interface, coercer in _SCALARS:
+        if interface.providedBy(field):
+            return coercer
+    # TextLine, Text, ASCII, URI, Id, DottedName, Password, ...
+    return _to_text
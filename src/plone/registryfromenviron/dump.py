@@ -0,0 +1,222 @@
+"""Dump the effective registry: ZODB values merged with the overrides.
+
+Console entry point ``registryfromenviron-dump``::
+
+    registryfromenviron-dump etc/zope.conf [--site /plone] [--format xml]
+
+Run it with the environment (and ``PLONE_REGISTRYFROMENVIRON_ENV_FILE``) of
+the pod to audit. Every record of one or all Plone sites is written as it
+is read, either as JSON Lines::
+
+    {"site": "/plone", "key": "plone.smtp_host", "source": "env",
+     "value": "mail.example.com"}
+
+or as a GenericSetup-style ``registry.xml`` with a ``source`` attribute per
+record. ``source`` is
+
+- ``env``: a usable override, ``value`` is the override,
+- ``invalid``: an override that does not fit the field, ``value`` is the
+  ZODB value in use instead,
+- ``zodb``: no override,
+- ``hint``: a type-hinted override (see :class:`environ.OverrideTable`)
+  of a key without a record, which the patched registry serves all the
+  same; ``value`` is the override.
+
+Overrides are resolved with :func:`environ.resolve_override` against the
+site's table, site-scoped overrides included, exactly as the patched
+registry does at runtime. The records' values BTree is read in
+batches of ``--batch-size`` keys, and the connection cache is minimized
+between batches, so memory stays flat however large the registry is.
+"""
+
+from .environ import _MARKER
+from .environ import overrides_for
+from .environ import resolve_override
+from .startup import iter_site_registries
+from .startup import open_zope
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+import argparse
+import collections.abc
+import decimal
+import itertools
+import json
+import sys
+
+
+BATCH_SIZE = 500
+FORMATS = ("jsonl", "xml")
+
+
+def iter_effective(registry, batch_size=BATCH_SIZE):
+    """Yield ``(name, value, source)`` for every record of ``registry``.
+
+    And for every type-hinted override without a record. Sorted by name.
+    After each batch the cache of the registry's ZODB connection is
+    minimized; the objects read so far become ghosts again.
+    """
+    connection = registry._p_jar
+    overrides = overrides_for(registry)
+    # Popped from the end as the records pass them by name.
+    hinted = sorted(
+        (name for name in overrides.virtual if name not in registry.records._values),
+        reverse=True,
+    )
+    last = None
+    while True:
+        values = registry.records._values
+        items = values.items(min=last, excludemin=last is not None)
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            while hinted:
+                yield _hinted(registry, hinted.pop(), overrides)
+            return
+        for name, value in batch:
+            while hinted and hinted[-1] < name:
+                yield _hinted(registry, hinted.pop(), overrides)
+            source = "zodb"
+            if name in overrides:
+                override = resolve_override(registry, name, overrides)
+                if override is _MARKER:
+                    source = "invalid"
+                else:
+                    value, source = override, "env"
+            yield name, value, source
+        last = batch[-1][0]
+        del batch, items, values
+        if connection is not None:
+            connection.cacheMinimize()
+
+
+def _hinted(registry, name, overrides):
+    return name, resolve_override(registry, name, overrides), "hint"
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"Cannot serialize {value!r}")
+
+
+def write_jsonl(out, path, rows):
+    """Write ``rows`` of :func:`iter_effective` as JSON Lines; return the count."""
+    count = 0
+    for name, value, source in rows:
+        document = {"site": path, "key": name, "source": source, "value": value}
+        out.write(json.dumps(document, default=_json_default, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, timedelta):
+        return str(value.total_seconds())
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _xml_value(value):
+    if value is None:
+        return "<value />"
+    if isinstance(value, collections.abc.Mapping):
+        elements = "".join(
+            f"<element key={quoteattr(_text(key))}>{escape(_text(item))}</element>"
+            for key, item in value.items()
+        )
+        return f"<value>{elements}</value>"
+    if isinstance(value, (set, frozenset)):
+        value = sorted(value, key=repr)
+    if isinstance(value, (list, tuple)):
+        elements = "".join(
+            f"<element>{escape(_text(item))}</element>" for item in value
+        )
+        return f"<value>{elements}</value>"
+    return f"<value>{escape(_text(value))}</value>"
+
+
+def write_xml(out, path, rows):
+    """Write ``rows`` as one GenericSetup-style ``<registry>``; return the count."""
+    count = 0
+    out.write(f"<registry site={quoteattr(path)}>\n")
+    for name, value, source in rows:
+        out.write(
+            f"  <record name={quoteattr(name)} source={quoteattr(source)}>"
+            f"{_xml_value(value)}</record>\n"
+        )
+        count += 1
+    out.write("</registry>\n")
+    return count
+
+
+def dump(app, out, fmt="jsonl", site=None, batch_size=BATCH_SIZE):
+    """Write the effective registry of ``site`` (default: all sites) to ``out``.
+
+    ``site`` is a site path such as ``/plone``. Returns ``{path: records}``.
+    Raises KeyError if ``site`` is not a Plone site below ``app``.
+    """
+    if site is not None and not site.startswith("/"):
+        site = "/" + site
+    registries = [
+        (path, registry)
+        for path, registry in iter_site_registries(app)
+        if site is None or path == site
+    ]
+    if site is not None and not registries:
+        raise KeyError(site)
+    write = write_xml if fmt == "xml" else write_jsonl
+    several = fmt == "xml" and len(registries) != 1
+    if fmt == "xml":
+        out.write('<?xml version="1.0" encoding="utf-8"?>\n')
+    if several:
+        out.write("<registries>\n")
+    counts = {}
+    for path, registry in registries:
+        counts[path] = write(out, path, iter_effective(registry, batch_size))
+    if several:
+        out.write("</registries>\n")
+    return counts
+
+
+def main(argv=None):
+    """Console entry point, see the module docstring."""
+    parser = argparse.ArgumentParser(
+        prog="registryfromenviron-dump",
+        description="Dump the effective plone.registry values of Plone sites, "
+        "with environment overrides applied.",
+    )
+    parser.add_argument("zopeconf", help="path to zope.conf")
+    parser.add_argument("--site", help="site path, e.g. /plone (default: all)")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    app = open_zope(args.zopeconf)
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                dump(app, out, args.format, args.site, args.batch_size)
+        else:
+            dump(app, sys.stdout, args.format, args.site, args.batch_size)
+    except KeyError:
+        parser.exit(2, f"No Plone site at {args.site}\n")
+    finally:
+        app._p_jar.close()
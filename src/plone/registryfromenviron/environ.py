@@ -1,85 +1,948 @@
 """Scan os.environ for PLONE_REGISTRY_* variables and coerce to field types."""
 
+from .coercers import coerce
+from .coercers import COERCION_ERRORS
+from .coercers import definition
+from .coercers import hint_field
+from .patterns import parse_pattern
+from .patterns import PATTERN_PREFIX
+from .patterns import PatternTrie
+from .patterns import WILDCARD
+from .stats import KeyStats
+from Acquisition import aq_base
 from plone.registry.fieldref import FieldRef
-from zope.schema import interfaces as schema_ifaces
+from plone.registry.interfaces import IRecordAddedEvent
+from plone.registry.interfaces import IRecordRemovedEvent
+from types import MappingProxyType
+from zope.component import adapter
+from zope.component.hooks import getSite
 
+import bisect
+import copy
+import itertools
 import json
 import logging
+import mmap
 import os
+import threading
+import time
+import tomllib
 
 
 logger = logging.getLogger(__name__)
 
 PREFIX = "PLONE_REGISTRY_"
+# Settings of the package itself. Does not clash with PREFIX: the character
+# after "PLONE_REGISTRY" is "F", not "_".
+CONFIG_PREFIX = "PLONE_REGISTRYFROMENVIRON_"
 _MARKER = object()
 
+# Site-scoped overrides: PLONE_REGISTRYSITE_<site id>___<key>, read as the
+# key "/<site id>:<key>", see split_scope(). Registry keys have no colon.
+SITE_PREFIX = "PLONE_REGISTRYSITE_"
+SITE_SEPARATOR = ":"
+# Type hints: PLONE_REGISTRYTYPE_<key>=<hint>, read as the key "<key>#type",
+# see OverrideTable and coercers.hint_field().
+TYPE_PREFIX = "PLONE_REGISTRYTYPE_"
+HINT_SUFFIX = "#type"
+VARIABLE_PREFIXES = (PREFIX, PATTERN_PREFIX, SITE_PREFIX, TYPE_PREFIX)
+
+
+def config(name, default=""):
+    """Return the package setting ``PLONE_REGISTRYFROMENVIRON_<name>``."""
+    return os.environ.get(CONFIG_PREFIX + name, default)
+
+
+def config_flag(name):
+    """Return True if the package setting ``name`` is switched on."""
+    return config(name).strip().lower() in ("true", "1", "yes", "on")
+
+
+def _add_pattern(overrides, name, value):
+    """Add a ``PLONE_REGISTRYPATTERN_*`` assignment to ``overrides``."""
+    try:
+        pattern, raw = parse_pattern(value)
+    except ValueError:
+        logger.warning("Ignoring %s: expected <pattern>=<value> with a '*'", name)
+        return
+    overrides[pattern] = raw
+
+
+def _site_key(name):
+    """Turn ``PLONE_REGISTRYSITE_<site>___<key>`` into ``/<site>:<key>``.
+
+    Returns None, with a warning, if ``name`` has no site id or no key.
+    """
+    site, sep, key = name[len(SITE_PREFIX) :].partition("___")
+    if not site or not sep or not key:
+        logger.warning("Ignoring %s: expected %s<site id>___<key>", name, SITE_PREFIX)
+        return None
+    return f"/{site}{SITE_SEPARATOR}{key.replace('__', '.')}"
+
+
+def _add_variable(overrides, name, value):
+    """Add the assignment of the variable ``name`` to ``overrides``."""
+    if name.startswith(PREFIX):
+        overrides[name[len(PREFIX) :].replace("__", ".")] = value
+    elif name.startswith(PATTERN_PREFIX):
+        _add_pattern(overrides, name, value)
+    elif name.startswith(SITE_PREFIX):
+        key = _site_key(name)
+        if key is not None:
+            overrides[key] = value
+    elif name.startswith(TYPE_PREFIX):
+        key = name[len(TYPE_PREFIX) :].replace("__", ".")
+        overrides[key + HINT_SUFFIX] = value
+
 
 def scan_environ():
     """Scan os.environ for PLONE_REGISTRY_* variables.
 
     Returns a dict mapping registry keys (dots) to raw string values.
     Double underscores in env var names are converted to dots.
+    ``PLONE_REGISTRYPATTERN_*`` variables add their pattern as key, see
+    :mod:`.patterns`; ``PLONE_REGISTRYSITE_*`` variables add a site-scoped
+    key, see :func:`split_scope`; ``PLONE_REGISTRYTYPE_*`` variables add a
+    type hint, see :class:`OverrideTable`.
     """
-    return {
-        key[len(PREFIX) :].replace("__", "."): value
-        for key, value in os.environ.items()
-        if key.startswith(PREFIX)
-    }
+    overrides = {}
+    for key, value in os.environ.items():
+        if key.startswith(VARIABLE_PREFIXES):
+            _add_variable(overrides, key, value)
+    return overrides
+
+
+def scan_env_file(path):
+    """Read ``PLONE_REGISTRY_*`` assignments from a dotenv-style file.
+
+    One ``NAME=value`` per line, as for ``docker --env-file``; blank lines,
+    ``#`` comments and other names are skipped. A value wrapped in matching
+    single or double quotes is unquoted. ``PLONE_REGISTRYPATTERN_*``,
+    ``PLONE_REGISTRYSITE_*`` and ``PLONE_REGISTRYTYPE_*`` lines are read as
+    :func:`scan_environ` does. Raises OSError if unreadable.
+    """
+    overrides = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip()
+            if not key.startswith(VARIABLE_PREFIXES):
+                continue
+            value = value.strip()
+            if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+                value = value[1:-1]
+            _add_variable(overrides, key, value)
+    return overrides
 
 
-# Scanned once at import time — env vars don't change at runtime.
-RAW_OVERRIDES: dict[str, str] = scan_environ()
+# Files of at least this size are memory-mapped and decoded from the mapping.
+MMAP_THRESHOLD = 1 << 16
+
+
+def _read_text(path):
+    """Return the UTF-8 text of ``path``, read in one go.
+
+    Large files are decoded straight from a memory map, without reading
+    them into an intermediate bytes object first.
+    """
+    with open(path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return fh.read().decode("utf-8")
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, "utf-8")
+
+
+def scan_directory(path):
+    """Read a directory with one file per registry key.
+
+    The layout of a mounted Kubernetes secret or config map: the file name
+    is the registry key (``__`` also reads as a dot), the content is the
+    raw value, one trailing newline removed. Hidden entries, such as the
+    ``..data`` links of Kubernetes volumes, and subdirectories are skipped.
+    Raises OSError if unreadable.
+    """
+    overrides = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            value = _read_text(entry.path)
+            if value.endswith("\n"):
+                value = value[:-1]
+            overrides[entry.name.replace("__", ".")] = value
+    return overrides
+
+
+def scan_document(path):
+    """Read a JSON or TOML (by ``.toml`` suffix) document of overrides.
+
+    The top level maps registry keys to values. Values keep their parsed
+    type: a list stays a list and reaches the coercer as it is, without
+    another JSON round trip. Keys with a ``*`` segment are patterns, keys
+    like ``"/plone:plone.smtp_host"`` are site-scoped, keys ending in
+    ``#type`` are type hints. TOML keys with dots must be quoted
+    (``"plone.smtp_host" = "..."``), as a table is a value, e.g. for a
+    ``Dict`` field. Raises OSError if unreadable and ValueError if not a
+    valid document.
+    """
+    text = _read_text(path)
+    loads = tomllib.loads if str(path).endswith(".toml") else json.loads
+    document = loads(text)
+    if not isinstance(document, dict):
+        raise ValueError(f"{path}: expected an object of registry keys")
+    return document
+
+
+def split_scope(key):
+    """Split a site-scoped key into ``(site path, registry key)``.
+
+    ``"/plone:plone.smtp_host"``, ``"plone:plone.smtp_host"`` and
+    ``"/sites/plone/:plone.smtp_host"`` are scoped to the site at that path;
+    the path is normalized to a leading and no trailing slash. Returns None
+    for unscoped keys.
+    """
+    site, sep, name = key.partition(SITE_SEPARATOR)
+    if not sep:
+        return None
+    return "/" + site.strip("/"), name
+
+
+# Process-wide, so no two tables ever share a generation.
+_GENERATIONS = itertools.count(1)
+
+
+class OverrideTable(dict):
+    """The raw override dict, with a sorted key index for prefix queries.
+
+    Reads are plain dict reads. Every mutation bumps ``generation`` and drops
+    the sorted key list, which is rebuilt on the next prefix query, so
+    :meth:`under` costs two bisections instead of a scan of all keys.
+
+    ``coerced`` holds the coercion cache of this table, see ``_COERCED``.
+    Raw values and coerced values are swapped together on reload.
+
+    Keys with a ``*`` segment passed to the constructor are patterns: they
+    go into the :class:`patterns.PatternTrie` ``patterns``, not the dict.
+    :meth:`expand` adds the registry keys they match as ordinary keys, so
+    the patched accessors still need one dict membership test per read.
+    ``matched`` maps each such key to its pattern.
+
+    Site-scoped keys (see :func:`split_scope`) passed to the constructor go
+    into ``scopes``, ``{site path: {registry key: raw value}}``.
+    :meth:`for_site` returns the table a site reads: this one, or a merged
+    copy with the site's keys laid over it, kept in sync when this table
+    changes and sharing its ``coerced``.
+
+    Keys ending in ``#type`` passed to the constructor are type hints
+    (``hints``, registry key to hint, for every site). A hinted override is
+    coerced with the hint's field (see :func:`coercers.hint_field`) as soon
+    as the table is built or changed, into ``virtual``; it needs no record
+    and no ZODB access. A value that does not fit its hint is logged and
+    resolved against the record as without a hint.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hints = {}
+        for key in [key for key in self if key.endswith(HINT_SUFFIX)]:
+            hint = super().pop(key)
+            name = key[: -len(HINT_SUFFIX)].rpartition(SITE_SEPARATOR)[2]
+            try:
+                hint_field(hint)
+            except ValueError:
+                logger.warning("Ignoring unknown type hint %r for %s", hint, name)
+            else:
+                self.hints[name] = hint
+        self.scopes = {}
+        for key in [key for key in self if SITE_SEPARATOR in key]:
+            path, name = split_scope(key)
+            self.scopes.setdefault(path, {})[name] = super().pop(key)
+        # site path -> merged table, registry_key -> table; see for_site().
+        self.scoped = {}
+        self.registries = {}
+        self.patterns = PatternTrie(
+            (key, super(OverrideTable, self).pop(key))
+            for key in list(self)
+            if WILDCARD in key.split(".")
+        )
+        self.matched = {}
+        # [(source, number of keys)], in the order read, see read_overrides().
+        self.sources = []
+        self.generation = next(_GENERATIONS)
+        self._sorted = None
+        self.coerced = {}
+        self.virtual = {}
+        if self.hints:
+            self._coerce_hints()
 
-if RAW_OVERRIDES:
+    def _coerce_hints(self):
+        virtual = {}
+        for name, hint in self.hints.items():
+            if name not in self:
+                continue
+            try:
+                virtual[name] = coerce(self[name], hint_field(hint))
+            except COERCION_ERRORS:
+                logger.exception("Invalid env override value for type hint: %s", name)
+        self.virtual = virtual
+
+    def _changed(self):
+        self.generation = next(_GENERATIONS)
+        self._sorted = None
+        if self.hints:
+            self._coerce_hints()
+        for path, table in list(self.scoped.items()):
+            table.merge(self, self.scopes[path])
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.matched.pop(key, None)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        super().update(other)
+        self._changed()
+        return self
+
+    def clear(self):
+        super().clear()
+        self.patterns = PatternTrie()
+        self.matched.clear()
+        self.hints.clear()
+        # Merged tables may still be bound; they become plain copies.
+        for scope in self.scopes.values():
+            scope.clear()
+        self._changed()
+
+    def pop(self, *args):
+        try:
+            return super().pop(*args)
+        finally:
+            self._changed()
+
+    def popitem(self):
+        try:
+            return super().popitem()
+        finally:
+            self._changed()
+
+    def setdefault(self, key, default=None):
+        try:
+            return super().setdefault(key, default)
+        finally:
+            self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def expand(self, names):
+        """Add those ``names`` that match a pattern; return the added ones.
+
+        Names already in the table are skipped: exact keys win over
+        patterns, and earlier expansions stay as they are. Costs one trie
+        walk per name.
+        """
+        patterns = self.patterns
+        if not patterns:
+            return []
+        added = []
+        for name in names:
+            if name in self:
+                continue
+            found = patterns.match(name)
+            if found is not None:
+                self.matched[name] = found[0]
+                super().__setitem__(name, found[1])
+                added.append(name)
+        if added:
+            self._changed()
+        return added
+
+    def merge(self, root, scope):
+        """Make this table hold ``root`` with ``scope`` laid over it."""
+        merged = {**root, **scope}
+        for name in [name for name in self if name not in merged]:
+            super().__delitem__(name)
+        super().update(merged)
+        self.matched = {
+            name: pattern for name, pattern in root.matched.items() if name not in scope
+        }
+        self._changed()
+
+    def for_site(self, path):
+        """Return the table the site at ``path`` reads.
+
+        This table if the site has no scoped keys, else the site's merged
+        table, created on first use.
+        """
+        scope = self.scopes.get(path)
+        if not scope:
+            return self
+        table = self.scoped.get(path)
+        if table is None:
+            table = OverrideTable()
+            table.hints = self.hints
+            table.coerced = self.coerced
+            table.sources = self.sources
+            table.merge(self, scope)
+            table = self.scoped.setdefault(path, table)
+        return table
+
+    def scoped_items(self):
+        """Return ``{"<site path>:<key>": raw value}`` of all scoped keys."""
+        return {
+            f"{path}{SITE_SEPARATOR}{name}": value
+            for path, scope in self.scopes.items()
+            for name, value in scope.items()
+        }
+
+    def sorted_keys(self):
+        """Return all keys as a sorted list. Do not modify it."""
+        keys = self._sorted
+        if keys is None:
+            keys = self._sorted = sorted(self)
+        return keys
+
+    def under(self, prefix):
+        """Return the sorted keys starting with ``prefix``."""
+        keys = self.sorted_keys()
+        start = bisect.bisect_left(keys, prefix)
+        # Every key starting with prefix sorts before prefix + U+10FFFF.
+        end = bisect.bisect_left(keys, prefix + "\U0010ffff", start)
+        return keys[start:end]
+
+
+# Sources read after the environment, in this order; later sources win.
+# (setting, reader)
+SOURCES = (
+    ("ENV_FILE", scan_env_file),
+    ("DIRECTORY", scan_directory),
+    ("DOCUMENT", scan_document),
+)
+
+
+def read_overrides():
+    """Read all override sources into a new :class:`OverrideTable`.
+
+    Sources are, in this order, the process environment and the sources of
+    the :data:`SOURCES` settings that are set:
+    ``PLONE_REGISTRYFROMENVIRON_ENV_FILE`` (dotenv file),
+    ``PLONE_REGISTRYFROMENVIRON_DIRECTORY`` (one file per key) and
+    ``PLONE_REGISTRYFROMENVIRON_DOCUMENT`` (JSON or TOML). A key in a later
+    source wins. Unlike the environment of a running process, the other
+    sources can change, see :mod:`.reload`. The table's ``sources`` lists
+    what was read. Raises OSError or ValueError if a source is unusable.
+    """
+    overrides = scan_environ()
+    sources = [("environment", len(overrides))]
+    for setting, reader in SOURCES:
+        path = config(setting)
+        if path:
+            found = reader(path)
+            overrides.update(found)
+            sources.append((f"{setting.lower()} {path}", len(found)))
+    table = OverrideTable(overrides)
+    table.sources = sources
+    return table
+
+
+# Read at import time; replaced as a whole by reload.swap_overrides().
+try:
+    RAW_OVERRIDES: OverrideTable = read_overrides()
+except (OSError, ValueError):
+    logger.exception("Cannot read override sources, using the environment")
+    RAW_OVERRIDES = OverrideTable(scan_environ())
+    RAW_OVERRIDES.sources = [("environment", len(RAW_OVERRIDES))]
+
+if RAW_OVERRIDES or RAW_OVERRIDES.patterns or RAW_OVERRIDES.scopes:
+    logger.info(
+        "Registry override sources (later wins): %s",
+        ", ".join(
+            f"{source} ({count} keys)" for source, count in RAW_OVERRIDES.sources
+        ),
+    )
     logger.info(
-        "Registry overrides from environment: %s",
-        ", ".join(sorted(RAW_OVERRIDES)),
+        "Registry overrides: %s",
+        ", ".join(
+            sorted(RAW_OVERRIDES)
+            + sorted(RAW_OVERRIDES.patterns)
+            + sorted(RAW_OVERRIDES.scoped_items())
+        ),
+    )
+
+# How collection values are handed out, see freeze() and _copier().
+VALUE_POLICIES = ("shared", "frozen", "copy")
+VALUE_POLICY = config("VALUE_POLICY", "shared").strip().lower()
+if VALUE_POLICY not in VALUE_POLICIES:
+    logger.warning(
+        "Unknown %sVALUE_POLICY %r, using 'shared'", CONFIG_PREFIX, VALUE_POLICY
+    )
+    VALUE_POLICY = "shared"
+
+# Lazy coercion cache, one table per registry:
+#   registry_key(registry) -> {name: (field_fingerprint, value, copier)}
+# Sites in one ZODB may define the same key differently, so values are never
+# shared between registries. Bounded to MAX_REGISTRIES tables; the oldest
+# table is dropped first. Entries are invalidated by the record event
+# subscribers below. Belongs to RAW_OVERRIDES; this name follows swaps.
+_COERCED: dict[tuple, dict[str, tuple]] = RAW_OVERRIDES.coerced
+MAX_REGISTRIES = int(config("MAX_REGISTRIES", "64"))
+
+# Failed resolutions (unknown key, invalid value) are cached too, as
+# ``(field_fingerprint, retry_at, _FAILED)``, and retried after this many
+# seconds, or at once when the record is added or changed. 0 retries on
+# every read.
+RETRY_INTERVAL = float(config("RETRY_INTERVAL", "60"))
+_FAILED = object()
+
+# Failures are logged at most once per key and LOG_INTERVAL seconds; the
+# next message tells how many were suppressed in between.
+LOG_INTERVAL = float(config("LOG_INTERVAL", "300"))
+# name -> [next log time, suppressed count]
+_LOGGED: dict[str, list] = {}
+
+# registry_key(registry) -> site path, for site-scoped overrides; see
+# bind_site() and overrides_for(). Sites do not move while a process runs.
+SITE_PATHS: dict[tuple, str] = {}
+
+# Single-flight coercion: threads missing the same key of the same coercion
+# table wait for the one coercing it, so a key is coerced (and a failure
+# logged) once per registry and table, however many threads read it cold.
+#   (id(coercion table), name) -> lock held while coercing
+_IN_FLIGHT: dict[tuple, threading.Lock] = {}
+_in_flight_lock = threading.Lock()
+
+# Per-key counters, see stats.py; None unless switched on.
+STATS: KeyStats | None = KeyStats() if config_flag("STATS") else None
+
+
+def registry_key(registry):
+    """Return a hashable identity for ``registry``, stable across connections.
+
+    Persistent registries are identified by database name and ``_p_oid``, so
+    every ZODB connection (thread) shares one table per site. Registries not
+    (yet) stored in a database fall back to the object's ``id()``.
+    """
+    oid = registry._p_oid
+    if oid is None:
+        return (None, id(aq_base(registry)))
+    return (registry._p_jar.db().database_name, oid)
+
+
+def bind_site(path, registry):
+    """Record that ``registry`` belongs to the site at ``path``."""
+    SITE_PATHS[registry_key(registry)] = path
+
+
+def _site_path(registry, key):
+    """Return the site path of ``registry``, or None if unknown.
+
+    Bound paths first; else the current site (``zope.component.hooks``) if
+    ``registry`` is its ``portal_registry``, which is then bound.
+    """
+    path = SITE_PATHS.get(key)
+    if path is None:
+        site = getSite()
+        registry_of_site = getattr(aq_base(site), "portal_registry", None)
+        if registry_of_site is not None and registry_key(registry_of_site) == key:
+            path = SITE_PATHS[key] = "/".join(site.getPhysicalPath())
+    return path
+
+
+def overrides_for(registry, overrides=None):
+    """Return the table of ``overrides`` that applies to ``registry``.
+
+    ``overrides`` defaults to the current table. Without site-scoped keys
+    that is ``overrides`` itself. Otherwise the registry's site is looked
+    up once and the result cached in ``overrides.registries`` against the
+    registry's persistent identity, see :func:`registry_key`. A registry of
+    unknown site gets ``overrides``, uncached, as its site may be bound
+    later.
+    """
+    if overrides is None:
+        overrides = RAW_OVERRIDES
+    if not overrides.scopes:
+        return overrides
+    key = registry_key(registry)
+    table = overrides.registries.get(key)
+    if table is None:
+        path = _site_path(registry, key)
+        if path is None:
+            return overrides
+        table = overrides.registries.setdefault(key, overrides.for_site(path))
+        coerced = overrides.coerced.get(key)
+        if coerced and table is not overrides:
+            # Coerced while the site was unknown, from the global value.
+            for name in overrides.scopes[path]:
+                coerced.pop(name, None)
+    return table
+
+
+def field_fingerprint(field):
+    """Return a hashable description of what coercion depends on in ``field``.
+
+    The definition the coercer is compiled for, see :func:`coercers.definition`.
+    """
+    return definition(field)
+
+
+def _table(registry, overrides):
+    """Return the coercion table of ``registry``, creating it if needed."""
+    coerced = overrides.coerced
+    key = registry_key(registry)
+    table = coerced.get(key)
+    if table is None:
+        # Iterating while another thread evicts would raise.
+        with _in_flight_lock:
+            while len(coerced) >= MAX_REGISTRIES:
+                coerced.pop(next(iter(coerced)), None)
+            table = coerced.setdefault(key, {})
+    return table
+
+
+def freeze(value):
+    """Return an immutable equivalent of a coerced value.
+
+    Lists become tuples, sets frozensets and dicts read-only mappings,
+    recursively. Other values are returned as they are.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    return value
+
+
+_MUTABLE = (list, set, dict)
+
+
+def _copier(value):
+    """Return the cheapest callable copying ``value``, or None if immutable.
+
+    Flat collections are copied with their constructor; only collections
+    nesting other mutable collections need ``copy.deepcopy``.
+    """
+    if not isinstance(value, _MUTABLE):
+        return None
+    items = value.values() if isinstance(value, dict) else value
+    if any(isinstance(item, _MUTABLE) for item in items):
+        return copy.deepcopy
+    return type(value)
+
+
+def _get_field(registry, name):
+    field = registry.records._getField(name)
+    if isinstance(field, FieldRef):
+        field = field.originalField
+    return field
+
+
+def _coerce_override(registry, name, overrides):
+    """Coerce the raw override ``overrides[name]`` to the registry field's type.
+
+    Returns a ``(field_fingerprint, value, copier)`` cache entry, with the
+    value prepared for VALUE_POLICY. Raises KeyError for unknown keys and
+    one of ``coercers.COERCION_ERRORS`` for values that do not fit the field.
+    A value coerced for its type hint (``overrides.virtual``) is taken as
+    it is, without looking up the field; its fingerprint is None.
+    """
+    value = overrides.virtual.get(name, _MARKER)
+    if value is _MARKER:
+        field = _get_field(registry, name)
+        value = coerce_value(overrides[name], field)
+        fingerprint = field_fingerprint(field)
+    else:
+        fingerprint = None
+    if VALUE_POLICY == "frozen":
+        return fingerprint, freeze(value), None
+    if VALUE_POLICY == "copy":
+        return fingerprint, value, _copier(value)
+    return fingerprint, value, None
+
+
+def _log_failure(level, message, name, exc_info=False):
+    """Log a failed resolution of ``name``, rate-limited per key.
+
+    The first failure of a key is logged with ``exc_info``; later ones at
+    most every LOG_INTERVAL seconds, with the number suppressed meanwhile.
+    """
+    now = time.monotonic()
+    state = _LOGGED.get(name)
+    if state is None:
+        state = [now + LOG_INTERVAL, 0]
+        # Of threads failing at once, only the one that stores it logs.
+        if _LOGGED.setdefault(name, state) is state:
+            logger.log(level, message, name, exc_info=exc_info)
+            return
+        state = _LOGGED[name]
+    if now < state[0]:
+        state[1] += 1
+    else:
+        suppressed = state[1]
+        state[0] = now + LOG_INTERVAL
+        state[1] = 0
+        logger.log(
+            level,
+            message + " (%d more failures since last logged)",
+            name,
+            suppressed,
+        )
+
+
+def _failed(registry, name):
+    """Return the negative cache entry for ``name`` in ``registry``."""
+    try:
+        fingerprint = field_fingerprint(_get_field(registry, name))
+    except KeyError:
+        fingerprint = None
+    return fingerprint, time.monotonic() + RETRY_INTERVAL, _FAILED
+
+
+def _usable(entry):
+    """Return True if ``entry`` needs no new resolution."""
+    return entry is not None and (
+        entry[2] is not _FAILED or entry[1] > time.monotonic()
     )
 
-# Lazy coercion cache — filled on first access per key, lives for process lifetime.
-_COERCED: dict[str, object] = {}
+
+def _resolve(registry, name, overrides, table):
+    """Coerce ``name`` into ``table`` once; return the (maybe failed) entry.
+
+    Single-flight: concurrent callers for the same table and name wait for
+    the first one and return its entry, see ``_IN_FLIGHT``.
+    """
+    key = (id(table), name)
+    with _in_flight_lock:
+        lock = _IN_FLIGHT.get(key)
+        if lock is None:
+            lock = _IN_FLIGHT[key] = threading.Lock()
+    try:
+        with lock:
+            entry = table.get(name)
+            if _usable(entry):
+                return entry
+            return _coerce_into(registry, name, overrides, table)
+    finally:
+        with _in_flight_lock:
+            if _IN_FLIGHT.get(key) is lock:
+                del _IN_FLIGHT[key]
+
+
+def _coerce_into(registry, name, overrides, table):
+    stats = STATS
+    started = time.perf_counter()
+    try:
+        entry = table[name] = _coerce_override(registry, name, overrides)
+    except KeyError:
+        _log_failure(logging.WARNING, "Env override for unknown registry key: %s", name)
+        entry = table[name] = (None, time.monotonic() + RETRY_INTERVAL, _FAILED)
+        return entry
+    except COERCION_ERRORS:
+        _log_failure(
+            logging.ERROR, "Invalid env override value for key: %s", name, True
+        )
+        if stats is not None:
+            stats.coerced(name, time.perf_counter() - started, failed=True)
+        entry = table[name] = _failed(registry, name)
+        return entry
+    if stats is not None:
+        stats.coerced(name, time.perf_counter() - started)
+    return entry
 
 
 def get_override(registry, name):
-    """Return coerced override value, or _MARKER if no override."""
-    if name not in RAW_OVERRIDES:
+    """Return coerced override value, or _MARKER if no override.
+
+    Unknown keys and invalid values also return _MARKER; that outcome is
+    cached for RETRY_INTERVAL seconds, see :func:`_resolve`.
+    """
+    # One read of the global: a concurrent reload cannot mix two tables.
+    return resolve_override(registry, name, overrides_for(registry))
+
+
+def resolve_override(registry, name, overrides):
+    """Like :func:`get_override`, with the table of ``registry`` given.
+
+    ``overrides`` is the result of :func:`overrides_for`; the patched
+    accessors bind or cache it and call this directly.
+    """
+    if name not in overrides:
         return _MARKER
-    if name not in _COERCED:
+    stats = STATS
+    table = _table(registry, overrides)
+    entry = table.get(name)
+    if entry is None or (entry[2] is _FAILED and entry[1] <= time.monotonic()):
+        entry = _resolve(registry, name, overrides, table)
+    copier = entry[2]
+    if copier is _FAILED:
+        if stats is not None:
+            stats.fallback(name)
+        return _MARKER
+    if stats is not None:
+        stats.hit(name)
+    if copier is None:
+        return entry[1]
+    return copier(entry[1])
+
+
+def overrides_under(prefix):
+    """Return the sorted override keys starting with ``prefix``.
+
+    Uses the sorted index of ``RAW_OVERRIDES``; the cost does not grow with
+    the number of overrides outside the prefix.
+    """
+    return RAW_OVERRIDES.under(prefix)
+
+
+def get_overrides(registry, names):
+    """Return ``{name: value}`` for those ``names`` that have a usable override.
+
+    Names without override, unknown keys and invalid values are left out.
+    Values follow VALUE_POLICY as with :func:`get_override`.
+    """
+    return _collect(registry, names, overrides_for(registry))
+
+
+def _collect(registry, names, overrides):
+    values = {}
+    for name in names:
+        if name in overrides:
+            value = resolve_override(registry, name, overrides)
+            if value is not _MARKER:
+                values[name] = value
+    return values
+
+
+def get_overrides_under(registry, prefix):
+    """Return ``{name: value}`` of all usable overrides starting with ``prefix``.
+
+    ``prefix`` is usually an interface identifier plus ``"."``, or the
+    prefix of one ``collectionOfInterface`` entry.
+    """
+    overrides = overrides_for(registry)
+    return _collect(registry, overrides.under(prefix), overrides)
+
+
+def expand_patterns(registry, overrides=None):
+    """Add the keys of ``registry`` matching a pattern to ``overrides``.
+
+    ``overrides`` defaults to the current table. Reads every key of the
+    registry, so it runs once per site when the database is opened, on
+    reload and in eager compilation; records added later are matched by
+    :func:`invalidate_added`. Returns the added keys.
+    """
+    if overrides is None:
+        overrides = RAW_OVERRIDES
+    if not overrides.patterns:
+        return []
+    return overrides.expand(registry.records._fields.keys())
+
+
+def compile_overrides(registry, overrides=None):
+    """Coerce every override against ``registry`` up front.
+
+    ``overrides`` defaults to the current table; reload passes a new one
+    before swapping it in. Site-scoped keys of the registry's site are
+    included, see :func:`overrides_for`. Replaces the registry's coercion table in
+    ``overrides.coerced`` (failures included, as negative entries) and
+    returns ``(table, report)``:
+    ``table`` is a read-only mapping of registry key to coerced value,
+    ``report`` a dict with the sorted key lists ``applied``, ``unknown`` (no
+    such record) and ``invalid`` (value does not fit the field). Nothing is
+    logged; callers decide how to report.
+    """
+    overrides = overrides_for(registry, overrides)
+    stats = STATS
+    entries = {}
+    report = {"applied": [], "unknown": [], "invalid": []}
+    for name in overrides.sorted_keys():
+        started = time.perf_counter()
         try:
-            field = registry.records._getField(name)
-            if isinstance(field, FieldRef):
-                field = field.originalField
-            _COERCED[name] = coerce_value(RAW_OVERRIDES[name], field)
+            entries[name] = _coerce_override(registry, name, overrides)
         except KeyError:
-            logger.warning("Env override for unknown registry key: %s", name)
-            return _MARKER
-        except (ValueError, TypeError, json.JSONDecodeError):
-            logger.exception("Invalid env override value for key: %s", name)
-            return _MARKER
-    return _COERCED[name]
+            report["unknown"].append(name)
+            entries[name] = (None, time.monotonic() + RETRY_INTERVAL, _FAILED)
+        except COERCION_ERRORS:
+            report["invalid"].append(name)
+            entries[name] = _failed(registry, name)
+            if stats is not None:
+                stats.coerced(name, time.perf_counter() - started, failed=True)
+        else:
+            report["applied"].append(name)
+            if stats is not None:
+                stats.coerced(name, time.perf_counter() - started)
+    _table(registry, overrides)
+    overrides.coerced[registry_key(registry)] = entries
+    table = {
+        name: entry[1] for name, entry in entries.items() if entry[2] is not _FAILED
+    }
+    return MappingProxyType(table), report
+
+
+def swap_overrides(overrides):
+    """Make ``overrides`` the current :class:`OverrideTable`; return the old one.
+
+    A single rebinding of ``RAW_OVERRIDES``, so readers see either the old
+    or the new table with its coercion cache, never a mix. Code that bound
+    the old table (the patched accessors) must be rebuilt, see
+    :func:`patch.rebind`.
+    """
+    global RAW_OVERRIDES, _COERCED
+    previous = RAW_OVERRIDES
+    RAW_OVERRIDES = overrides
+    _COERCED = overrides.coerced
+    return previous
+
+
+@adapter(IRecordAddedEvent)
+def invalidate_added(event):
+    """Drop a cached override when its record is (re-)added with another field.
+
+    ``registerInterface`` re-adds every record of the interface, so this also
+    covers upgrade steps that change a field type. A new record matching a
+    pattern override gets the pattern's value.
+    """
+    record = event.record
+    if record.__parent__ is None:
+        return
+    if RAW_OVERRIDES.patterns:
+        RAW_OVERRIDES.expand((record.__name__,))
+    table = RAW_OVERRIDES.coerced.get(registry_key(record.__parent__))
+    if not table or record.__name__ not in table:
+        return
+    field = record.field
+    if isinstance(field, FieldRef):
+        field = field.originalField
+    if table[record.__name__][0] != field_fingerprint(field):
+        table.pop(record.__name__, None)
+
+
+@adapter(IRecordRemovedEvent)
+def invalidate_removed(event):
+    """Drop a cached override when its record is removed.
+
+    The record is already unbound when the event fires, so the entry is
+    dropped from every table; the next read re-coerces where still valid.
+    """
+    for table in list(RAW_OVERRIDES.coerced.values()):
+        table.pop(event.record.__name__, None)
 
 
 def coerce_value(raw, field):
-    """Convert env var string to the field's expected Python type."""
-    if schema_ifaces.IBool.providedBy(field):
-        return raw.lower() in ("true", "1", "yes", "on")
-    if schema_ifaces.IInt.providedBy(field):
-        return int(raw)
-    if schema_ifaces.IFloat.providedBy(field):
-        return float(raw)
-    if schema_ifaces.IDecimal.providedBy(field):
-        from decimal import Decimal
-
-        return Decimal(raw)
-    if schema_ifaces.ITuple.providedBy(field):
-        return tuple(json.loads(raw))
-    if schema_ifaces.IList.providedBy(field):
-        return list(json.loads(raw))
-    if schema_ifaces.ISet.providedBy(field):
-        return set(json.loads(raw))
-    if schema_ifaces.IFrozenSet.providedBy(field):
-        return frozenset(json.loads(raw))
-    if schema_ifaces.IDict.providedBy(field):
-        return json.loads(raw)
-    # TextLine, Text, ASCII, BytesLine, URI, Choice, etc.
-    return raw
+    """Convert env var string to the field's expected Python type.
+
+    Uses the compiled coercer of the field's definition and validates the
+    result against the field, see :mod:`.coercers`.
+    """
+    return coerce(raw, field)
@@ -0,0 +1,225 @@
+"""Pre-resolved record handles for hot call sites.
+
+A handle stands for one registry key and is meant to be created once, at
+module level::
+
+    from plone.registryfromenviron.handles import record_handle
+
+    SMTP_HOST = record_handle("plone.smtp_host")
+    TIMEOUT = record_handle("timeout", interface=ISettings, default=30)
+
+    def send(...):
+        host = SMTP_HOST.value  # the current site's registry
+        ...
+        TIMEOUT.get(registry)   # or an explicit one
+
+``value`` returns what ``registry[key]`` returns, but the key is resolved
+once per registry object, not on every read:
+
+- a key with a usable override keeps its coerced value, handed out
+  according to the value policy as by ``Registry.get``,
+- any other key keeps the BTree bucket of ``Records._values`` holding it,
+  so a read is one bucket lookup. The bucket is the connection's own
+  persistent object: uncommitted writes, aborts and ZODB invalidations
+  are seen as by ``Registry.get``, and a key moved by a bucket split is
+  looked up again.
+
+``value`` finds the current registry without a utility lookup per read:
+the registry is remembered per thread for the current site manager and
+looked up again when the site manager or its registrations change.
+
+The resolved state lives in a volatile attribute of the registry, like the
+cached ``forInterface`` proxies (see :mod:`.proxy`). It is dropped when the
+override table changes or is reloaded, when the ``Registry`` patch is
+applied or removed, and when any record is added or removed, e.g. by an
+upgrade step changing a field type.
+"""
+
+from . import environ
+from .environ import _FAILED
+from .environ import _MARKER
+from .environ import _table
+from .environ import overrides_for
+from .environ import resolve_override
+from .patch import _originals
+from Acquisition import aq_base
+from bisect import bisect_right
+from persistent import Persistent
+from plone.registry.interfaces import IRecordAddedEvent
+from plone.registry.interfaces import IRegistry
+from zope.component import adapter
+from zope.component import getSiteManager
+
+import threading
+
+
+_CACHE_ATTR = "_v_registryfromenviron_handles"
+# Slot kinds, see RecordHandle._resolve.
+_OVERRIDE = "override"
+_BUCKET = "bucket"
+
+# Bumped on record added/removed; volatile handle caches of another
+# generation are dropped.
+_GENERATION = 0
+
+
+class _Current(threading.local):
+    """The registry of this thread's site manager, see RecordHandle.value."""
+
+    site_manager = None
+    registrations = None
+    registry = None
+
+
+_CURRENT = _Current()
+
+
+def current_registry():
+    """Return ``getUtility(IRegistry)``, remembered per thread, unwrapped."""
+    current = _CURRENT
+    site_manager = getSiteManager()
+    registrations = site_manager.utilities._generation
+    if (
+        current.site_manager is not site_manager
+        or current.registrations != registrations
+    ):
+        current.registry = aq_base(site_manager.getUtility(IRegistry))
+        current.site_manager = site_manager
+        current.registrations = registrations
+    return current.registry
+
+
+def _leaf(tree, name):
+    """Return the bucket of ``tree`` that holds or would hold ``name``.
+
+    Descends the pickled state, see :func:`cache.tree_oids`. A small tree
+    keeps its only bucket inline and is returned itself.
+    """
+    node = tree
+    while True:
+        state = node.__getstate__()
+        if not state:
+            return node
+        items = state[0]
+        if not items or not isinstance(items[0], Persistent):
+            return node
+        node = items[2 * bisect_right(items[1::2], name)]
+
+
+class RecordHandle:
+    """A registry key resolved once per registry; see the module docstring."""
+
+    __slots__ = ("default", "name")
+
+    def __init__(self, name, default=_MARKER):
+        self.name = name
+        self.default = default
+
+    def __repr__(self):
+        return f"<RecordHandle {self.name!r}>"
+
+    @property
+    def value(self):
+        """The value in the current site's registry."""
+        return self.get(current_registry())
+
+    def get(self, registry):
+        """Return the value of the key in ``registry``.
+
+        Raises KeyError if there is no such record and the handle has no
+        default, like ``registry[name]``.
+        """
+        registry = aq_base(registry)
+        generation = environ.RAW_OVERRIDES.generation
+        patched = bool(_originals)
+        cache = getattr(registry, _CACHE_ATTR, None)
+        if (
+            cache is None
+            or cache[0] != generation
+            or cache[1] != _GENERATION
+            or cache[2] is not patched
+        ):
+            cache = (generation, _GENERATION, patched, {})
+            setattr(registry, _CACHE_ATTR, cache)
+        slot = cache[3].get(self)
+        if slot is not None:
+            kind, value, copier = slot
+            if kind is _BUCKET:
+                value = value.get(self.name, _MARKER)
+                if value is not _MARKER:
+                    return value
+            else:
+                stats = environ.STATS
+                if stats is not None:
+                    stats.hit(self.name)
+                return value if copier is None else copier(value)
+        return self._resolve(registry, cache[3], patched)
+
+    def _resolve(self, registry, slots, patched):
+        """Resolve the key in ``registry``, remember how, return its value.
+
+        Slots are ``(_OVERRIDE, value, copier)`` for a usable override and
+        ``(_BUCKET, bucket, None)`` for a ZODB value. Keys whose
+        override is unusable are not remembered; they are retried like in
+        the patched registry.
+        """
+        name = self.name
+        if patched:
+            overrides = overrides_for(registry)
+            if name in overrides:
+                value = resolve_override(registry, name, overrides)
+                if value is _MARKER:
+                    return self._stored(registry)
+                entry = _table(registry, overrides).get(name)
+                if entry is not None and entry[2] is not _FAILED:
+                    slots[self] = (_OVERRIDE, entry[1], entry[2])
+                return value
+        values = registry.records._values
+        bucket = _leaf(values, name)
+        value = bucket.get(name, _MARKER)
+        if value is _MARKER:
+            return self._missing()
+        # A bucket split off in this transaction is not remembered: an
+        # abort would leave it detached, still holding the keys.
+        if bucket._p_jar is registry._p_jar:
+            slots[self] = (_BUCKET, bucket, None)
+        return value
+
+    def _stored(self, registry):
+        value = registry.records._values.get(self.name, _MARKER)
+        if value is _MARKER:
+            return self._missing()
+        return value
+
+    def _missing(self):
+        if self.default is _MARKER:
+            raise KeyError(self.name)
+        return self.default
+
+
+def record_handle(name, interface=None, default=_MARKER):
+    """Return a :class:`RecordHandle`, in the style of ``plone.api``.
+
+    As ``api.portal.get_registry_record``: with ``interface``, ``name`` is
+    a field of it and the key is ``<interface identifier>.<name>``.
+    ``default`` is returned instead of raising KeyError for a missing
+    record.
+    """
+    if interface is not None:
+        name = f"{interface.__identifier__}.{name}"
+    return RecordHandle(name, default)
+
+
+def reset():
+    """Drop the resolved state of every handle in every registry."""
+    global _GENERATION
+    _GENERATION += 1
+
+
+@adapter(IRecordAddedEvent)
+def invalidate_handles(event):
+    """A record added or removed may change how a key resolves.
+
+    Also registered for ``IRecordRemovedEvent``.
+    """
+    reset()
@@ -0,0 +1,306 @@
+"""Materialize mode: write the overrides into ZODB instead of patching reads.
+
+For deployments whose overrides only change at deploy time. With
+``PLONE_REGISTRYFROMENVIRON_MATERIALIZE=true`` the ``Registry`` patch is
+not applied for overrides (see ``_maybe_activate`` in ``__init__``), so
+reads go straight to the original ``Registry`` methods. Instead, when Zope
+opens its main database, or by running the console entry point
+``registryfromenviron-materialize``::
+
+    registryfromenviron-materialize etc/zope.conf [--site /plone] [--check]
+
+every override is coerced against each Plone site's registry and compared
+with the value stored in ZODB; only the ones that differ are written, all
+sites in one transaction, retried on ``ConflictError``. Writes go through a
+plain ``Record``, so the field validates the value and
+``IRecordModifiedEvent`` is notified, as for any registry write. The values
+written are the coerced overrides as the field expects them, whatever
+``VALUE_POLICY`` says about handing them out. A value the record refuses is
+reported as ``failed`` and the other keys are still written.
+
+The registry remembers the keys it owns in ``OWNED_ATTRIBUTE``: the value
+written and the value it replaced. A later run
+
+- reports owned keys whose ZODB value is no longer the one written, e.g.
+  after a change through the web, as ``drifted`` and writes the override
+  again,
+- restores the replaced value of owned keys that are no longer overridden
+  (``restored``), unless they drifted, then the value in ZODB is kept
+  (``released``).
+
+``--check`` reports without writing, and exits with status 1 if anything
+would be written, restored or has drifted. :func:`drift` lists the drifted
+keys of one registry with both values.
+"""
+
+from . import environ
+from .coercers import COERCION_ERRORS
+from .environ import _get_field
+from .environ import _MARKER
+from .environ import coerce_value
+from .environ import config_flag
+from .environ import expand_patterns
+from .environ import overrides_for
+from .startup import iter_site_registries
+from .startup import open_zope
+from BTrees.OOBTree import OOBTree
+from plone.registry.record import Record
+from ZODB.POSException import ConflictError
+from zope.component import adapter
+from zope.processlifetime import IDatabaseOpenedWithRoot
+
+import argparse
+import copy
+import json
+import logging
+import sys
+import transaction
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config_flag("MATERIALIZE")
+ATTEMPTS = 3
+OWNED_ATTRIBUTE = "_registryfromenviron_owned"
+
+
+def _owned(registry, create=False):
+    """Return the registry's ``{name: (written, replaced)}`` BTree, or None."""
+    owned = getattr(registry, OWNED_ATTRIBUTE, None)
+    if owned is None and create:
+        owned = OOBTree()
+        setattr(registry, OWNED_ATTRIBUTE, owned)
+    return owned
+
+
+def _write(registry, name, value):
+    """Write ``value`` to record ``name`` as plain plone.registry would."""
+    records = registry.records
+    record = Record(records._getField(name), records._values[name], _validate=False)
+    record.__name__ = name
+    record.__parent__ = registry
+    record.value = value
+
+
+def drift(registry):
+    """Return ``{name: {"materialized": ..., "current": ...}}`` of drifted keys.
+
+    Owned keys whose ZODB value differs from the value materialized last.
+    """
+    owned = _owned(registry)
+    if not owned:
+        return {}
+    values = registry.records._values
+    drifted = {}
+    for name, (written, _replaced) in owned.items():
+        current = values.get(name, _MARKER)
+        if current is not _MARKER and current != written:
+            drifted[name] = {"materialized": written, "current": current}
+    return drifted
+
+
+def _coerced(registry, report):
+    """Return ``{name: value}`` of the overrides of ``registry`` that fit.
+
+    Coerced from the raw overrides, not taken from the coercion cache: the
+    cache holds values prepared for VALUE_POLICY, e.g. tuples for a List
+    field under ``frozen``, which the record would refuse. Keys without a
+    record, type-hinted ones included, go to ``report["unknown"]``, values
+    that do not fit the field to ``report["invalid"]``.
+    """
+    overrides = overrides_for(registry)
+    table = {}
+    for name in overrides.sorted_keys():
+        try:
+            table[name] = coerce_value(overrides[name], _get_field(registry, name))
+        except KeyError:
+            report["unknown"].append(name)
+        except COERCION_ERRORS:
+            report["invalid"].append(name)
+    return table
+
+
+def materialize_registry(registry, dry_run=False):
+    """Write the differing overrides into ``registry``; return the report.
+
+    Does not commit. The report holds the sorted key lists ``written``,
+    ``unchanged``, ``drifted``, ``restored``, ``released``, ``failed``
+    (the record refused the value), and, as in
+    :func:`environ.compile_overrides`, ``unknown`` and ``invalid``. Keys
+    with a type hint but no record count as unknown: there is nothing to
+    write them to. With ``dry_run`` nothing is changed.
+    """
+    expand_patterns(registry)
+    report = {
+        "written": [],
+        "unchanged": [],
+        "drifted": [],
+        "restored": [],
+        "released": [],
+        "failed": [],
+        "unknown": [],
+        "invalid": [],
+    }
+    table = _coerced(registry, report)
+    fields = registry.records._fields
+    values = registry.records._values
+    owned = _owned(registry, create=not dry_run)
+    if owned is None:
+        owned = {}
+    for name, value in table.items():
+        current = values.get(name)
+        entry = owned.get(name)
+        if entry is not None and current != entry[0]:
+            report["drifted"].append(name)
+        if current == value:
+            report["unchanged"].append(name)
+            if entry is None or entry[0] != value:
+                # Owned from now on, replacing whatever it replaced before.
+                replaced = current if entry is None else entry[1]
+                if not dry_run:
+                    owned[name] = (copy.deepcopy(value), replaced)
+            continue
+        if not dry_run:
+            try:
+                _write(registry, name, value)
+            except COERCION_ERRORS:
+                logger.exception("Materializing %s failed", name)
+                report["failed"].append(name)
+                continue
+            replaced = current if entry is None else entry[1]
+            owned[name] = (copy.deepcopy(value), replaced)
+        report["written"].append(name)
+    for name in list(owned.keys()):
+        if name in table or name in report["invalid"]:
+            continue
+        written, replaced = owned[name]
+        if name in fields and values.get(name) == written:
+            if not dry_run:
+                try:
+                    _write(registry, name, replaced)
+                except COERCION_ERRORS:
+                    logger.exception("Restoring %s failed", name)
+                    report["failed"].append(name)
+                    continue
+            report["restored"].append(name)
+        else:
+            report["released"].append(name)
+        if not dry_run:
+            del owned[name]
+    for names in report.values():
+        names.sort()
+    return report
+
+
+def materialize(db, site=None, dry_run=False, attempts=ATTEMPTS):
+    """Materialize the overrides of ``site`` (default: all sites) in ``db``.
+
+    One transaction for all sites, retried up to ``attempts`` times on
+    ``ConflictError``. Returns ``{path: report}``, see
+    :func:`materialize_registry`. Raises KeyError if ``site`` is not a Plone
+    site.
+    """
+    if site is not None and not site.startswith("/"):
+        site = "/" + site
+    manager = transaction.TransactionManager()
+    connection = db.open(transaction_manager=manager)
+    try:
+        for attempt in range(1, attempts + 1):
+            manager.begin()
+            app = connection.root().get("Application")
+            reports = {}
+            if app is not None:
+                for path, registry in iter_site_registries(app):
+                    if site is None or path == site:
+                        reports[path] = materialize_registry(registry, dry_run)
+            if site is not None and not reports:
+                raise KeyError(site)
+            if dry_run:
+                manager.abort()
+                return reports
+            try:
+                manager.commit()
+            except ConflictError:
+                manager.abort()
+                if attempt == attempts:
+                    raise
+                logger.info("Materializing overrides conflicted, retrying")
+            else:
+                return reports
+    finally:
+        manager.abort()
+        connection.close()
+
+
+@adapter(IDatabaseOpenedWithRoot)
+def materialize_at_startup(event):
+    """Subscriber: materialize the overrides if ``MATERIALIZE`` is on."""
+    overrides = environ.RAW_OVERRIDES
+    if not ENABLED or not (overrides or overrides.patterns or overrides.scopes):
+        return
+    reports = materialize(event.database)
+    logger.info(
+        "Registry overrides materialized: %s", json.dumps(reports, sort_keys=True)
+    )
+    for path, report in sorted(reports.items()):
+        if report["drifted"]:
+            logger.warning(
+                "Registry overrides changed in ZODB since materialized in %s: %s",
+                path,
+                ", ".join(report["drifted"]),
+            )
+    broken = sorted(
+        {
+            name
+            for report in reports.values()
+            for name in report["unknown"] + report["invalid"] + report["failed"]
+        }
+    )
+    if broken:
+        logger.warning("Registry overrides not materialized: %s", ", ".join(broken))
+
+
+def main(argv=None):
+    """Console entry point, see the module docstring."""
+    from .dump import _json_default
+
+    parser = argparse.ArgumentParser(
+        prog="registryfromenviron-materialize",
+        description="Write environment overrides into the plone.registry of "
+        "Plone sites, and report drift.",
+    )
+    parser.add_argument("zopeconf", help="path to zope.conf")
+    parser.add_argument("--site", help="site path, e.g. /plone (default: all)")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="report only; exit 1 if anything would be written or has drifted",
+    )
+    args = parser.parse_args(argv)
+
+    app = open_zope(args.zopeconf)
+    db = app._p_jar.db()
+    app._p_jar.close()
+    try:
+        reports = materialize(db, args.site, dry_run=args.check)
+    except KeyError:
+        parser.exit(2, f"No Plone site at {args.site}\n")
+    document = {"sites": reports}
+    if args.check:
+        connection = db.open()
+        try:
+            app = connection.root()["Application"]
+            document["drift"] = {
+                path: drift(registry)
+                for path, registry in iter_site_registries(app)
+                if path in reports
+            }
+        finally:
+            transaction.abort()
+            connection.close()
+    sys.stdout.write(json.dumps(document, default=_json_default, indent=1) + "\n")
+    pending = any(
+        report["written"] or report["drifted"] or report["restored"]
+        for report in reports.values()
+    )
+    return 1 if args.check and pending else 0
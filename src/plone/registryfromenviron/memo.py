@@ -0,0 +1,68 @@
+"""Optional request-scoped memo for registry reads.
+
+Enabled with ``PLONE_REGISTRYFROMENVIRON_REQUEST_MEMO=true``. The patched
+``Registry.__getitem__`` / ``.get`` then remember every value read from
+ZODB for the rest of the current request, stored in ``request.other`` (the
+dict Zope's HTTPRequest clears at the end of the request), one memo per
+registry object. Overridden keys are answered from the coercion cache as
+before and are not memoized, so the value policy is kept.
+
+Writes invalidate through record events: ``Registry.__setitem__`` and
+``registry.records[name].value = ...`` both notify ``IRecordModifiedEvent``,
+adding and removing records notify their own events.
+
+Without a current request (scripts, tests) or without ``request.other``,
+reads are not memoized.
+"""
+
+from .environ import config_flag
+from Acquisition import aq_base
+from plone.registry.interfaces import IRecordEvent
+from zope.component import adapter
+from zope.globalrequest import getRequest
+
+
+ENABLED = config_flag("REQUEST_MEMO")
+
+MEMO_KEY = "_plone_registryfromenviron_memo"
+
+
+def _memos():
+    request = getRequest()
+    if request is None:
+        return None
+    other = getattr(request, "other", None)
+    if other is None:
+        return None
+    memos = other.get(MEMO_KEY)
+    if memos is None:
+        memos = other[MEMO_KEY] = {}
+    return memos
+
+
+def request_memo(registry):
+    """Return the memo dict of ``registry`` for the current request, or None."""
+    memos = _memos()
+    if memos is None:
+        return None
+    key = id(aq_base(registry))
+    memo = memos.get(key)
+    if memo is None:
+        memo = memos[key] = {}
+    return memo
+
+
+@adapter(IRecordEvent)
+def invalidate_memo(event):
+    """Forget a memoized value when its record is added, modified or removed."""
+    memos = _memos()
+    if not memos:
+        return
+    record = event.record
+    if record.__parent__ is None:
+        # removed records are unbound before the event fires
+        memos.clear()
+        return
+    memo = memos.get(id(aq_base(record.__parent__)))
+    if memo is not None:
+        memo.pop(record.__name__, None)
@@ -1,8 +1,18 @@
 """Import-time monkey-patch for plone.registry.registry.Registry."""
 
+from . import cache
+from . import environ
+from . import memo
+from . import profile
 from .environ import _MARKER
-from .environ import get_override
+from .environ import registry_key
+from .environ import resolve_override
+from .proxy import make_for_interface
+from .records import make_records_getitem
+from .records import stored_value_methods
+from .records import with_stored_values
 from collections.abc import Callable
+from plone.registry.registry import _Records
 from plone.registry.registry import Registry
 
 import logging
@@ -11,40 +21,326 @@ import logging
 logger = logging.getLogger(__name__)
 
 _originals: dict[str, Callable] = {}
+# Whether the installed accessors look up overrides, see _install.
+_lookups = False
 
 
-def _patched_getitem(self, name):
-    value = get_override(self, name)
-    if value is not _MARKER:
+def _make_accessors(original_getitem, original_get):
+    """Build the patched ``__getitem__`` and ``get``.
+
+    The originals, the override table and the resolver are bound as closure
+    cells, so a read of a non-overridden key costs one dict membership test
+    on top of the original method: no global, attribute or ``_originals``
+    lookup per call. The current ``RAW_OVERRIDES`` is bound as an object;
+    after :func:`environ.swap_overrides` the accessors are rebuilt by
+    :func:`rebind`.
+    """
+    overrides = environ.RAW_OVERRIDES
+    resolve = resolve_override
+    marker = _MARKER
+
+    def __getitem__(self, name):
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        return original_getitem(self, name)
+
+    def get(self, name, default=None):
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        return original_get(self, name, default)
+
+    return __getitem__, get
+
+
+def _make_memo_accessors(original_getitem, original_get):
+    """Like :func:`_make_accessors`, memoizing ZODB reads per request.
+
+    Used when ``PLONE_REGISTRYFROMENVIRON_REQUEST_MEMO`` is on, see
+    :mod:`.memo`.
+    """
+    overrides = environ.RAW_OVERRIDES
+    resolve = resolve_override
+    marker = _MARKER
+    request_memo = memo.request_memo
+
+    def __getitem__(self, name):
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        cache = request_memo(self)
+        if cache is None:
+            return original_getitem(self, name)
+        value = cache.get(name, marker)
+        if value is marker:
+            value = cache[name] = original_getitem(self, name)
         return value
-    return _originals["__getitem__"](self, name)
+
+    def get(self, name, default=None):
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        cache = request_memo(self)
+        if cache is None:
+            return original_get(self, name, default)
+        value = cache.get(name, marker)
+        if value is marker:
+            value = original_get(self, name, marker)
+            if value is marker:
+                return default
+            cache[name] = value
+        return value
+
+    return __getitem__, get
 
 
-def _patched_get(self, name, default=None):
-    value = get_override(self, name)
-    if value is not _MARKER:
+def _make_memo_reads(original_getitem, original_get):
+    """Wrap the ZODB reads in the request memo, for the scoped accessors."""
+    marker = _MARKER
+    request_memo = memo.request_memo
+
+    def getitem(self, name):
+        cache = request_memo(self)
+        if cache is None:
+            return original_getitem(self, name)
+        value = cache.get(name, marker)
+        if value is marker:
+            value = cache[name] = original_getitem(self, name)
+        return value
+
+    def get(self, name, default=None):
+        cache = request_memo(self)
+        if cache is None:
+            return original_get(self, name, default)
+        value = cache.get(name, marker)
+        if value is marker:
+            value = original_get(self, name, marker)
+            if value is marker:
+                return default
+            cache[name] = value
         return value
-    return _originals["get"](self, name, default)
+
+    return getitem, get
+
+
+def _make_scoped_accessors(original_getitem, original_get):
+    """Like :func:`_make_accessors`, for tables with site-scoped overrides.
+
+    Each registry resolves the table of its site once, with
+    :func:`environ.overrides_for`, and keeps it in a volatile attribute
+    named after the bound table's generation, so a table bound before a
+    swap is never read after it. A read costs one attribute lookup and one
+    dict membership test; the site is not looked up again until the
+    registry is ghosted.
+    """
+    root = environ.RAW_OVERRIDES
+    attr = f"_v_registryfromenviron_overrides_{root.generation}"
+    overrides_for = environ.overrides_for
+    resolve = resolve_override
+    marker = _MARKER
+
+    def table_of(registry):
+        overrides = overrides_for(registry, root)
+        # Only cache a resolved site; an unknown one may be bound later.
+        if overrides is not root or registry_key(registry) in root.registries:
+            setattr(registry, attr, overrides)
+        return overrides
+
+    def __getitem__(self, name):
+        overrides = getattr(self, attr, None)
+        if overrides is None:
+            overrides = table_of(self)
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        return original_getitem(self, name)
+
+    def get(self, name, default=None):
+        overrides = getattr(self, attr, None)
+        if overrides is None:
+            overrides = table_of(self)
+        if name in overrides:
+            value = resolve(self, name, overrides)
+            if value is not marker:
+                return value
+        return original_get(self, name, default)
+
+    return __getitem__, get
+
+
+def _make_contains(original_contains):
+    """Build ``Registry.__contains__`` counting overrides with a type hint.
+
+    Only installed while the table has type hints: a hinted override is
+    served without a record, so the registry reports its key as present.
+    """
+    root = environ.RAW_OVERRIDES
+    if root.scopes:
+        overrides_for = environ.overrides_for
+
+        def __contains__(self, name):
+            return name in overrides_for(self, root).virtual or original_contains(
+                self, name
+            )
+
+        return __contains__
+
+    def __contains__(self, name):
+        return name in root.virtual or original_contains(self, name)
+
+    return __contains__
 
 
 def apply_patch():
     """Patch Registry.__getitem__ / .get to consult env-var overrides first.
 
-    Idempotent: calling twice is a no-op.
+    ``forInterface`` and ``registry.records[name]`` are replaced as well,
+    see :mod:`.proxy` and :mod:`.records`, and ``__contains__`` while there
+    are type hints. ``registerInterface`` and the GenericSetup import and
+    export keep working on the ZODB values, see
+    :func:`records.stored_values`. In materialize mode the overrides are
+    in ZODB already: only the request memo, the process cache and profiling
+    wrap the original methods. Idempotent: calling twice is a no-op.
     """
     if _originals:
         return
     _originals["__getitem__"] = Registry.__getitem__
     _originals["get"] = Registry.get
-    Registry.__getitem__ = _patched_getitem
-    Registry.get = _patched_get
-    logger.info("plone.registry.registry.Registry patched for env-var overrides")
+    _originals["__contains__"] = Registry.__contains__
+    _originals["forInterface"] = Registry.forInterface
+    _originals["records.__getitem__"] = _Records.__getitem__
+    for cls, name in stored_value_methods():
+        original = _originals[f"{cls.__name__}.{name}"] = getattr(cls, name)
+        setattr(cls, name, with_stored_values(original))
+    overrides = _overrides_looked_up()
+    _install(overrides)
+    if overrides:
+        Registry.forInterface = make_for_interface()
+    if profile.ENABLED:
+        profile.start()
+    logger.info(
+        "plone.registry.registry.Registry patched %s%s%s%s",
+        "for env-var overrides" if overrides else "without override lookups",
+        " with request memo" if memo.ENABLED else "",
+        " with process cache" if cache.ENABLED else "",
+        " with read profiling" if profile.ENABLED else "",
+    )
+
+
+def _install(overrides=True):
+    """Bind the accessors reading ``RAW_OVERRIDES`` to the current table.
+
+    Without ``overrides`` no override is looked up: only the request memo,
+    the process cache and profiling wrap the original methods, see
+    :func:`retire_if_all_invalid`.
+    """
+    global _lookups
+    _lookups = overrides
+    read_getitem, read_get = _originals["__getitem__"], _originals["get"]
+    if profile.ENABLED:
+        read_getitem, read_get = profile.make_timed_accessors(read_getitem, read_get)
+    if cache.ENABLED:
+        read_getitem, read_get = cache.make_cached_accessors(read_getitem, read_get)
+    if not overrides:
+        if memo.ENABLED:
+            read_getitem, read_get = _make_memo_reads(read_getitem, read_get)
+        getitem, get = read_getitem, read_get
+        if profile.ENABLED:
+            getitem, get = profile.make_counted_accessors(getitem, get)
+        Registry.__getitem__ = getitem
+        Registry.get = get
+        Registry.__contains__ = _originals["__contains__"]
+        Registry.forInterface = _originals["forInterface"]
+        _Records.__getitem__ = _originals["records.__getitem__"]
+        return
+    if environ.RAW_OVERRIDES.scopes:
+        if memo.ENABLED:
+            read_getitem, read_get = _make_memo_reads(read_getitem, read_get)
+        make_accessors = _make_scoped_accessors
+    elif memo.ENABLED:
+        make_accessors = _make_memo_accessors
+    else:
+        make_accessors = _make_accessors
+    getitem, get = make_accessors(read_getitem, read_get)
+    if profile.ENABLED:
+        getitem, get = profile.make_counted_accessors(getitem, get)
+    records_getitem = make_records_getitem(_originals["records.__getitem__"])
+    contains = _originals["__contains__"]
+    if environ.RAW_OVERRIDES.hints:
+        contains = _make_contains(contains)
+    # Each assignment is atomic; every call runs against one table.
+    Registry.__getitem__ = getitem
+    Registry.get = get
+    Registry.__contains__ = contains
+    _Records.__getitem__ = records_getitem
+
+
+def _overrides_looked_up():
+    """Return False in materialize mode, where ZODB holds the overrides."""
+    from . import materialize
+
+    return not materialize.ENABLED
+
+
+def rebind():
+    """Point the patch at the current override table after a swap.
+
+    Applies the patch if it is not applied yet, e.g. when a reload brings
+    the first override into a process that started without any.
+    """
+    if _originals:
+        _install(_overrides_looked_up())
+    else:
+        apply_patch()
 
 
 def unpatch():
     """Restore the original Registry methods. Safe when not patched."""
+    global _lookups
     if not _originals:
         return
+    _lookups = False
     Registry.__getitem__ = _originals["__getitem__"]
     Registry.get = _originals["get"]
+    Registry.__contains__ = _originals["__contains__"]
+    Registry.forInterface = _originals["forInterface"]
+    _Records.__getitem__ = _originals["records.__getitem__"]
+    for cls, name in stored_value_methods():
+        setattr(cls, name, _originals[f"{cls.__name__}.{name}"])
     _originals.clear()
+
+
+def retire_if_all_invalid(reports):
+    """Stop looking up overrides when none can ever apply.
+
+    ``reports`` maps site path to a :func:`environ.compile_overrides` report
+    covering every site of the process, from eager compilation or the
+    warm-up. When each override was found invalid for each site, the
+    override checks would only add overhead, so the original methods are
+    restored. With the request memo, the process
+    cache or profiling on, the patch stays and only the checks are removed.
+    Unknown keys and pattern overrides keep the patch, as their records may
+    still be added by an add-on profile. Returns True if the checks were
+    removed, False if they were kept or are removed already.
+    """
+    if not reports or not _lookups or environ.RAW_OVERRIDES.patterns:
+        return False
+    if any(report["applied"] or report["unknown"] for report in reports.values()):
+        return False
+    if not any(report["invalid"] for report in reports.values()):
+        return False
+    if memo.ENABLED or cache.ENABLED or profile.ENABLED:
+        _install(overrides=False)
+    else:
+        unpatch()
+    logger.warning(
+        "All registry overrides are invalid for every site; "
+        "overrides are no longer looked up, ZODB values are used"
+    )
+    return True
@@ -0,0 +1,105 @@
+"""Pattern overrides: one value for every registry key matching a pattern.
+
+A pattern is a dotted registry key in which a ``*`` segment stands for one
+or more whole segments::
+
+    *.IThemeSettings.enabled          every IThemeSettings.enabled flag
+    plone.app.theming.*               every key below plone.app.theming
+    plone.*.enabled                   plone.x.enabled, plone.x.y.enabled, ...
+
+Patterns come from ``PLONE_REGISTRYPATTERN_<label>=<pattern>=<value>``
+variables (in the environment or the env file). The label only keeps the
+variable names apart; environment variable names cannot hold ``*``.
+
+:class:`PatternTrie` stores the patterns segment by segment, so matching a
+key walks the key's segments once, with a short backtrack per ``*``,
+instead of testing every pattern. Where several patterns match, literal
+segments win over ``*`` from left to right, and a ``*`` consumes as few
+segments as possible; exact ``PLONE_REGISTRY_*`` keys always win over
+patterns, see :meth:`environ.OverrideTable.expand`.
+"""
+
+PATTERN_PREFIX = "PLONE_REGISTRYPATTERN_"
+WILDCARD = "*"
+
+
+def parse_pattern(value):
+    """Split ``"<pattern>=<value>"``; return ``(pattern, value)``.
+
+    Raises ValueError if there is no ``=`` or the pattern has no ``*``
+    segment or an empty one.
+    """
+    pattern, sep, raw = value.partition("=")
+    pattern = pattern.strip()
+    segments = pattern.split(".")
+    if not sep or WILDCARD not in segments or "" in segments:
+        raise ValueError(f"Invalid registry pattern override {value!r}")
+    return pattern, raw
+
+
+class _Node:
+    __slots__ = ("children", "star", "value")
+
+    def __init__(self):
+        self.children = {}
+        self.star = None
+        self.value = None
+
+
+class PatternTrie:
+    """Patterns indexed by segment; see the module docstring for matching."""
+
+    def __init__(self, patterns=()):
+        self._root = _Node()
+        self._patterns = {}
+        for pattern, value in dict(patterns).items():
+            self.add(pattern, value)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __iter__(self):
+        return iter(self._patterns)
+
+    def items(self):
+        """Return ``(pattern, raw value)`` pairs."""
+        return self._patterns.items()
+
+    def add(self, pattern, value):
+        """Add or replace ``pattern`` with the raw override ``value``."""
+        node = self._root
+        for segment in pattern.split("."):
+            if segment == WILDCARD:
+                if node.star is None:
+                    node.star = _Node()
+                node = node.star
+            else:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node()
+                node = child
+        node.value = (pattern, value)
+        self._patterns[pattern] = value
+
+    def match(self, name):
+        """Return ``(pattern, raw value)`` of the best match for ``name``, or None."""
+        if not self._patterns:
+            return None
+        return _match(self._root, name.split("."), 0)
+
+
+def _match(node, segments, index):
+    if index == len(segments):
+        return node.value
+    child = node.children.get(segments[index])
+    if child is not None:
+        found = _match(child, segments, index + 1)
+        if found is not None:
+            return found
+    star = node.star
+    if star is not None:
+        for end in range(index + 1, len(segments) + 1):
+            found = _match(star, segments, end)
+            if found is not None:
+                return found
+    return None
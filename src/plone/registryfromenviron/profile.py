@@ -0,0 +1,229 @@
+"""Opt-in profiling of registry reads.
+
+Enabled by setting ``PLONE_REGISTRYFROMENVIRON_PROFILE`` to a file path.
+The patched ``Registry.__getitem__`` / ``.get`` then record, per key,
+
+- ``reads``: every read, whether answered by an override, a cache or ZODB,
+- ``zodb_reads`` / ``zodb_seconds``: calls of the original plone.registry
+  method and their time, including the loads of the registry, its BTree
+  buckets and the upstream request cache,
+
+both in aggregate and for the current request. Aggregate counters are kept
+per thread without locking (see :class:`stats.ThreadTables`); the request
+profile lives in ``request.other`` and is summarized when the request ends
+(``IPubEnd``).
+
+Every ``PLONE_REGISTRYFROMENVIRON_PROFILE_INTERVAL`` seconds (default 60) a
+background thread appends one JSON line to the file::
+
+    {"time": ..., "pid": ..., "seconds": 60.0,
+     "keys": {"plone.smtp_host": [reads, zodb_reads, zodb_ms], ...},
+     "requests": [[url, reads, distinct keys, zodb_reads, zodb_ms,
+                   [[key, reads], ...]], ...]}
+
+``keys`` holds the counts of that interval, ``requests`` the
+``PLONE_REGISTRYFROMENVIRON_PROFILE_REQUESTS`` (default 20) requests with
+the most ZODB time, each with its five most read keys.
+
+When the setting is unset, the profiling accessors are not installed and
+reads cost exactly what they cost without it.
+"""
+
+from .environ import config
+from .environ import CONFIG_PREFIX
+from .stats import ThreadTables
+from zope.component import adapter
+from zope.globalrequest import getRequest
+from ZPublisher.interfaces import IPubEnd
+
+import atexit
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+PATH = config("PROFILE").strip()
+ENABLED = bool(PATH)
+INTERVAL = float(config("PROFILE_INTERVAL", "60"))
+MAX_REQUESTS = int(config("PROFILE_REQUESTS", "20"))
+
+PROFILE_KEY = "_plone_registryfromenviron_profile"
+
+# name -> [reads, zodb_reads, zodb_seconds]
+_KEYS = ThreadTables(3)
+# Totals at the previous dump; dumps write the difference.
+_dumped = {}
+# Slowest requests of the current interval: (zodb_seconds, seq, summary).
+_requests = []
+_sequence = 0
+_lock = threading.Lock()
+_interval_start = time.time()
+_thread = None
+
+
+def _request_profile():
+    """Return the current request's ``{name: [reads, zodb_reads, seconds]}``."""
+    request = getRequest()
+    other = getattr(request, "other", None)
+    if other is None:
+        return None
+    profile = other.get(PROFILE_KEY)
+    if profile is None:
+        profile = other[PROFILE_KEY] = {}
+    return profile
+
+
+def _record(name, reads, zodb_reads=0, seconds=0.0):
+    counters = _KEYS.counters(name)
+    counters[0] += reads
+    counters[1] += zodb_reads
+    counters[2] += seconds
+    profile = _request_profile()
+    if profile is not None:
+        counters = profile.get(name)
+        if counters is None:
+            counters = profile[name] = [0, 0, 0.0]
+        counters[0] += reads
+        counters[1] += zodb_reads
+        counters[2] += seconds
+
+
+def make_timed_accessors(original_getitem, original_get):
+    """Wrap the original ``__getitem__`` / ``get``, timing ZODB reads."""
+    clock = time.perf_counter
+
+    def __getitem__(self, name):
+        started = clock()
+        try:
+            return original_getitem(self, name)
+        finally:
+            _record(name, 0, 1, clock() - started)
+
+    def get(self, name, default=None):
+        started = clock()
+        try:
+            return original_get(self, name, default)
+        finally:
+            _record(name, 0, 1, clock() - started)
+
+    return __getitem__, get
+
+
+def make_counted_accessors(inner_getitem, inner_get):
+    """Wrap the complete patched ``__getitem__`` / ``get``, counting reads."""
+
+    def __getitem__(self, name):
+        _record(name, 1)
+        return inner_getitem(self, name)
+
+    def get(self, name, default=None):
+        _record(name, 1)
+        return inner_get(self, name, default)
+
+    return __getitem__, get
+
+
+def _summary(request, profile):
+    reads = sum(counters[0] for counters in profile.values())
+    zodb_reads = sum(counters[1] for counters in profile.values())
+    seconds = sum(counters[2] for counters in profile.values())
+    top = sorted(profile.items(), key=lambda item: item[1][0], reverse=True)[:5]
+    url = request.get("ACTUAL_URL") or request.get("PATH_INFO", "")
+    return seconds, [
+        url,
+        reads,
+        len(profile),
+        zodb_reads,
+        round(seconds * 1000, 3),
+        [[name, counters[0]] for name, counters in top],
+    ]
+
+
+@adapter(IPubEnd)
+def request_finished(event):
+    """Subscriber: add the ended request to the current interval."""
+    global _sequence
+    if not ENABLED:
+        return
+    profile = event.request.other.pop(PROFILE_KEY, None)
+    if not profile:
+        return
+    seconds, summary = _summary(event.request, profile)
+    with _lock:
+        _sequence += 1
+        entry = (seconds, _sequence, summary)
+        if len(_requests) < MAX_REQUESTS:
+            heapq.heappush(_requests, entry)
+        elif _requests and entry > _requests[0]:
+            heapq.heapreplace(_requests, entry)
+
+
+def collect():
+    """Return the profile document of the interval since the last call."""
+    global _interval_start
+    totals = _KEYS.totals()
+    with _lock:
+        requests = sorted(_requests, reverse=True)
+        _requests.clear()
+        now = time.time()
+        seconds = now - _interval_start
+        _interval_start = now
+        keys = {}
+        for name in sorted(totals):
+            current = totals[name]
+            previous = _dumped.get(name, (0, 0, 0.0))
+            delta = [current[i] - previous[i] for i in range(3)]
+            if delta[0] or delta[1]:
+                keys[name] = [delta[0], delta[1], round(delta[2] * 1000, 3)]
+        _dumped.update(totals)
+    return {
+        "time": round(now, 3),
+        "pid": os.getpid(),
+        "seconds": round(seconds, 3),
+        "keys": keys,
+        "requests": [summary for _, _, summary in requests],
+    }
+
+
+def dump(path=None):
+    """Append the profile of the interval since the last dump to ``path``."""
+    document = collect()
+    with open(path or PATH, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(document, separators=(",", ":")) + "\n")
+
+
+def _dump_logged():
+    try:
+        dump()
+    except OSError:
+        logger.exception("Cannot write registry profile to %s", PATH)
+
+
+def _run():
+    while True:
+        time.sleep(INTERVAL)
+        _dump_logged()
+
+
+def start():
+    """Start the periodic dump thread once; dump a last time at exit."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(
+            target=_run, name="registryfromenviron-profile", daemon=True
+        )
+    _thread.start()
+    atexit.register(_dump_logged)
+    logger.info(
+        "Registry read profiling to %s every %ss (%sPROFILE)",
+        PATH,
+        INTERVAL,
+        CONFIG_PREFIX,
+    )
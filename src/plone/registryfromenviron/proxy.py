@@ -0,0 +1,168 @@
+"""Override-aware ``Registry.forInterface`` with cached, prefix-bound proxies.
+
+``forInterface`` is called by control-panel heavy add-ons on every request.
+The replacement installed by :func:`patch.apply_patch`
+
+- caches what a proxy needs per interface (the record keys of its fields,
+  the overridden ones among them) on the registry object in a volatile
+  (``_v_``) attribute, so it lives as long as the registry stays loaded in
+  its ZODB connection; the proxy itself is built per call around the
+  registry it was called on, so ``__parent__`` keeps its acquisition chain,
+- remembers per process which ``(registry, interface, prefix, omit)``
+  combinations passed the record check, so other connections skip it too,
+- treats fields whose key has a usable override as existing,
+- hands out :class:`OverrideRecordsProxy` objects that keep the full record
+  key of every field and read overridden fields straight from the coercion
+  cache.
+
+Which overrides fall under a proxy's prefix is answered by the sorted
+override index of the registry's table (:meth:`environ.OverrideTable.under`),
+not by a scan of all overrides. ``collectionOfInterface`` entries are served by ``forInterface``
+and take the same path.
+
+Removing any record invalidates all of the above.
+"""
+
+from . import environ
+from .environ import _MARKER
+from .environ import get_overrides_under
+from .environ import overrides_for
+from .environ import registry_key
+from .environ import resolve_override
+from Acquisition import aq_base
+from plone.registry.interfaces import IRecordRemovedEvent
+from plone.registry.recordsproxy import RecordsProxy
+from zope.component import adapter
+from zope.schema import getFieldNames
+
+
+_CACHE_ATTR = "_v_registryfromenviron_proxies"
+
+# (registry_key, interface identifier, prefix, omit) that passed the check.
+_CHECKED: set[tuple] = set()
+# Bumped on record removal; volatile proxy caches of another generation are dropped.
+_GENERATION = 0
+
+
+class OverrideRecordsProxy(RecordsProxy):
+    """A RecordsProxy with precomputed record keys.
+
+    Overridden fields are answered from the coercion cache without building
+    the key or touching ZODB; other fields go through ``Registry.get``. The
+    set of overridden keys is taken from the prefix index and recomputed
+    when the override table changes or is reloaded.
+    """
+
+    def __init__(self, registry, schema, omitted=(), prefix=None):
+        super().__init__(registry, schema, omitted=omitted, prefix=prefix)
+        prefix = self.__dict__["__prefix__"]
+        self.__dict__["__keys__"] = {
+            name: prefix + name for name in getFieldNames(schema)
+        }
+        # Shared by the proxies bound from the same state, see bind().
+        self.__dict__["__overridden__"] = [(None, frozenset())]
+
+    def state(self):
+        """Return the precomputed state, without the registry."""
+        state = dict(self.__dict__)
+        del state["__registry__"], state["__parent__"]
+        return state
+
+    @classmethod
+    def bind(cls, registry, state):
+        """Return a proxy for ``registry`` sharing the precomputed ``state``."""
+        proxy = cls.__new__(cls)
+        proxy.__dict__.update(state)
+        proxy.__dict__["__registry__"] = proxy.__dict__["__parent__"] = registry
+        return proxy
+
+    def __getattr__(self, name):
+        state = self.__dict__
+        key = state.get("__keys__", {}).get(name)
+        if key is None:
+            return super().__getattr__(name)
+        registry = state["__registry__"]
+        generation, overridden = state["__overridden__"][0]
+        overrides = environ.RAW_OVERRIDES
+        if overrides.scopes:
+            overrides = overrides_for(registry, overrides)
+        current = overrides.generation
+        if generation != current:
+            overridden = frozenset(overrides.under(state["__prefix__"]))
+            state["__overridden__"][0] = (current, overridden)
+        if key in overridden:
+            value = resolve_override(registry, key, overrides)
+            if value is not _MARKER:
+                return value
+        value = registry.get(key, _MARKER)
+        if value is _MARKER:
+            return state["__schema__"][name].missing_value
+        return value
+
+
+def _check(registry, interface, omit, prefix):
+    """Raise KeyError like plone.registry if a field has no record."""
+    overridden = get_overrides_under(registry, prefix)
+    for name in getFieldNames(interface):
+        if name in omit:
+            continue
+        key = prefix + name
+        if key not in overridden and key not in registry:
+            raise KeyError(
+                f"Interface `{interface.__identifier__}` defines a field `{name}`, for which "
+                "there is no record."
+            )
+
+
+def make_for_interface():
+    """Build the replacement for ``Registry.forInterface``."""
+
+    def forInterface(self, interface, check=True, omit=(), prefix=None, factory=None):
+        if prefix is None:
+            prefix = interface.__identifier__
+        if not prefix.endswith("."):
+            prefix += "."
+        omit = tuple(omit)
+        registry = aq_base(self)
+
+        cache = getattr(registry, _CACHE_ATTR, None)
+        if cache is None or cache[0] != _GENERATION:
+            cache = (_GENERATION, {})
+            setattr(registry, _CACHE_ATTR, cache)
+        cache_key = (interface, prefix, omit, check)
+        if factory is None:
+            state = cache[1].get(cache_key)
+            if state is not None:
+                return OverrideRecordsProxy.bind(self, state)
+
+        if check:
+            checked_key = (
+                registry_key(registry),
+                interface.__identifier__,
+                prefix,
+                omit,
+            )
+            if checked_key not in _CHECKED:
+                _check(registry, interface, omit, prefix)
+                _CHECKED.add(checked_key)
+
+        if factory is not None:
+            return factory(self, interface, omitted=omit, prefix=prefix)
+        proxy = OverrideRecordsProxy(self, interface, omitted=omit, prefix=prefix)
+        cache[1][cache_key] = proxy.state()
+        return proxy
+
+    return forInterface
+
+
+def reset():
+    """Drop cached proxies and passed checks of every registry."""
+    global _GENERATION
+    _GENERATION += 1
+    _CHECKED.clear()
+
+
+@adapter(IRecordRemovedEvent)
+def invalidate_proxies(event):
+    """A removed record may make a previously passed check fail."""
+    reset()
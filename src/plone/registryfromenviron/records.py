@@ -0,0 +1,163 @@
+"""Override-aware ``registry.records[name]`` access.
+
+``_Records.__getitem__`` builds a fresh bound ``Record`` per call; its
+``value`` reads the ZODB value directly. The replacement installed by
+:func:`patch.apply_patch` returns an :class:`OverrideRecord` for overridden
+names only. Every other name gets the very ``Record`` plone.registry builds,
+at the cost of one dict membership test.
+
+``Registry.__setitem__`` writes through ``records[name].value``, so the
+record also decides what happens to writes of overridden keys, see
+``WRITE_POLICY``.
+
+Registry maintenance reads ``records[name].value`` to keep or merge the
+stored value: ``Registry.registerInterface`` and the GenericSetup
+``registry.xml`` import and export. Within :func:`stored_values` every
+name gets the plain ``Record``, so these see and write the ZODB value and
+never an override; the patch runs them this way, see
+:func:`stored_value_methods`.
+"""
+
+from . import environ
+from .environ import _MARKER
+from .environ import config
+from .environ import CONFIG_PREFIX
+from .environ import get_override
+from contextlib import contextmanager
+from plone.registry.record import Record
+
+import functools
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# What a write to a key with a usable override does:
+#   passthrough: write to ZODB, as plain plone.registry (default);
+#   skip: drop the write, no ZODB change and no RecordModifiedEvent;
+#   raise: raise OverriddenRecordError.
+WRITE_POLICIES = ("passthrough", "skip", "raise")
+WRITE_POLICY = config("WRITE_POLICY", "passthrough").strip().lower()
+if WRITE_POLICY not in WRITE_POLICIES:
+    logger.warning(
+        "Unknown %sWRITE_POLICY %r, using 'passthrough'", CONFIG_PREFIX, WRITE_POLICY
+    )
+    WRITE_POLICY = "passthrough"
+
+
+class _Maintenance(threading.local):
+    depth = 0
+
+
+_MAINTENANCE = _Maintenance()
+
+
+@contextmanager
+def stored_values():
+    """Let ``records[name]`` ignore overrides in this thread, see above."""
+    _MAINTENANCE.depth += 1
+    try:
+        yield
+    finally:
+        _MAINTENANCE.depth -= 1
+
+
+def with_stored_values(method):
+    """Wrap ``method`` to run within :func:`stored_values`."""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with stored_values():
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def stored_value_methods():
+    """Return ``(class, name)`` of the methods run within :func:`stored_values`."""
+    from plone.app.registry.exportimport.handler import RegistryExporter
+    from plone.app.registry.exportimport.handler import RegistryImporter
+    from plone.registry.registry import Registry
+
+    return (
+        (Registry, "registerInterface"),
+        (RegistryImporter, "importDocument"),
+        (RegistryExporter, "exportDocument"),
+    )
+
+
+class OverriddenRecordError(ValueError):
+    """Raised on writes to an overridden key with the ``raise`` write policy."""
+
+
+class OverrideRecord(Record):
+    """A bound record whose ``value`` reads the env-var override.
+
+    Setting ``value`` follows ``WRITE_POLICY`` while the override is usable;
+    with an unknown or invalid override it writes to ZODB like a plain
+    ``Record``.
+    """
+
+    def _get_value(self):
+        if self.__parent__ is not None:
+            value = get_override(self.__parent__, self.__name__)
+            if value is not _MARKER:
+                return value
+        return Record._get_value(self)
+
+    def _set_value(self, value):
+        policy = WRITE_POLICY
+        if (
+            policy != "passthrough"
+            and self.__parent__ is not None
+            and get_override(self.__parent__, self.__name__) is not _MARKER
+        ):
+            if policy == "raise":
+                raise OverriddenRecordError(
+                    f"Registry key {self.__name__} is overridden by the "
+                    f"environment and cannot be changed"
+                )
+            logger.debug("Skipped write to overridden registry key %s", self.__name__)
+            return
+        Record._set_value(self, value)
+
+    value = property(_get_value, _set_value)
+
+
+def make_records_getitem(original_getitem):
+    """Build the replacement for ``_Records.__getitem__``.
+
+    Binds the current override table, see :func:`patch.rebind`. With
+    site-scoped overrides, the table of the records' registry is looked up
+    per call instead, see :func:`environ.overrides_for`.
+    """
+    overrides = environ.RAW_OVERRIDES
+    maintenance = _MAINTENANCE
+    if overrides.scopes:
+        overrides_for = environ.overrides_for
+
+        def __getitem__(self, name):
+            if (
+                name not in overrides_for(self.__parent__, overrides)
+                or maintenance.depth
+            ):
+                return original_getitem(self, name)
+            return _override_record(self, name)
+
+        return __getitem__
+
+    def __getitem__(self, name):
+        if name not in overrides or maintenance.depth:
+            return original_getitem(self, name)
+        return _override_record(self, name)
+
+    return __getitem__
+
+
+def _override_record(records, name):
+    field = records._getField(name)
+    record = OverrideRecord(field, records._values[name], _validate=False)
+    record.__name__ = name
+    record.__parent__ = records.__parent__
+    return record
@@ -0,0 +1,171 @@
+"""Live reload of overrides without restarting the process.
+
+A reload re-reads the override sources (the environment and the env file,
+directory and document settings, see :func:`environ.read_overrides`)
+into a new table, coerces it against the registry of every Plone site, and
+only then swaps it in:
+
+- if any value is invalid for any site, the whole reload is rejected and the
+  current table stays in place (unknown keys are accepted, as at startup),
+- the new table arrives with its coercion cache filled, so no request pays
+  for coercion,
+- the swap rebinds ``environ.RAW_OVERRIDES`` once and rebuilds the patched
+  accessors; readers on other threads see the old or the new table, never a
+  mix. Cached proxies notice the new table by its generation.
+
+Triggers:
+
+- ``PLONE_REGISTRYFROMENVIRON_RELOAD_SIGNAL`` (e.g. ``HUP``): the signal
+  starts a reload in a background thread,
+- ``@@registryfromenviron-reload`` on the Zope root, POST only, for users
+  with the "View management screens" permission. Returns a JSON report.
+
+Both reload the receiving process only.
+"""
+
+from . import environ
+from . import patch
+from . import proxy
+from .environ import config
+from .startup import InvalidOverrides
+from .startup import iter_site_registries
+from Products.Five.browser import BrowserView
+from zope.component import adapter
+from zope.processlifetime import IDatabaseOpenedWithRoot
+
+import json
+import logging
+import signal
+import threading
+import transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Serializes reloads; readers never take it.
+_lock = threading.Lock()
+# The main database, remembered at startup for signal-triggered reloads.
+_database = None
+
+
+def compile_sites(db, overrides):
+    """Coerce ``overrides`` against every site of ``db``; return the reports.
+
+    Uses its own connection and transaction manager, so it does not touch
+    the transaction of a calling request.
+    """
+    manager = transaction.TransactionManager()
+    connection = db.open(transaction_manager=manager)
+    try:
+        app = connection.root().get("Application")
+        if app is None:
+            return {}
+        reports = {}
+        for path, registry in iter_site_registries(app):
+            environ.expand_patterns(registry, overrides)
+            reports[path] = environ.compile_overrides(registry, overrides)[1]
+        return reports
+    finally:
+        manager.abort()
+        connection.close()
+
+
+def reload_overrides(db=None):
+    """Re-read the override sources and swap them in.
+
+    ``db`` defaults to the database seen at startup; without one, values
+    are not validated and are coerced lazily on first read. Returns a
+    report ``{"added", "removed", "changed", "sites"}``. Raises
+    :class:`InvalidOverrides` if a value is invalid for any site, OSError
+    if a source cannot be read and ValueError if a document cannot be
+    parsed; nothing is swapped then.
+    """
+    if db is None:
+        db = _database
+    with _lock:
+        overrides = environ.read_overrides()
+        sites = compile_sites(db, overrides) if db is not None else {}
+        invalid = sorted(
+            {name for report in sites.values() for name in report["invalid"]}
+        )
+        if invalid:
+            raise InvalidOverrides(
+                "Reload rejected, invalid registry overrides: {}".format(
+                    ", ".join(invalid)
+                )
+            )
+        previous = environ.swap_overrides(overrides)
+        patch.rebind()
+        proxy.reset()
+    current = {**overrides, **overrides.scoped_items()}
+    before = {**previous, **previous.scoped_items()}
+    report = {
+        "added": sorted(current.keys() - before.keys()),
+        "removed": sorted(before.keys() - current.keys()),
+        "changed": sorted(
+            name
+            for name in current.keys() & before.keys()
+            if current[name] != before[name]
+        ),
+        "sites": sites,
+    }
+    logger.info("Registry overrides reloaded: %s", json.dumps(report, sort_keys=True))
+    return report
+
+
+def _reload_in_background():
+    try:
+        reload_overrides()
+    except Exception:
+        logger.exception("Registry override reload failed")
+
+
+def _on_signal(signum, frame):
+    # No ZODB work in a signal handler: it interrupts the main thread.
+    threading.Thread(
+        target=_reload_in_background, name="registryfromenviron-reload", daemon=True
+    ).start()
+
+
+def install_signal_handler(name):
+    """Reload on signal ``name`` (``HUP``, ``SIGUSR1``, ...). Returns success."""
+    name = name.strip().upper()
+    signum = getattr(signal, name if name.startswith("SIG") else "SIG" + name, None)
+    if not isinstance(signum, signal.Signals):
+        logger.warning("Unknown %sRELOAD_SIGNAL %r", environ.CONFIG_PREFIX, name)
+        return False
+    try:
+        signal.signal(signum, _on_signal)
+    except ValueError:
+        logger.warning("Cannot install %s handler outside the main thread", name)
+        return False
+    logger.info("Registry overrides reload on %s", signum.name)
+    return True
+
+
+@adapter(IDatabaseOpenedWithRoot)
+def setup_reload(event):
+    """Subscriber: remember the database and install the signal handler."""
+    global _database
+    _database = event.database
+    name = config("RELOAD_SIGNAL")
+    if name:
+        install_signal_handler(name)
+
+
+class ReloadView(BrowserView):
+    """``@@registryfromenviron-reload``: reload overrides in this process."""
+
+    def __call__(self):
+        response = self.request.response
+        response.setHeader("Content-Type", "application/json")
+        if self.request.get("REQUEST_METHOD") != "POST":
+            response.setStatus(405)
+            response.setHeader("Allow", "POST")
+            return json.dumps({"status": "error", "error": "POST required"})
+        try:
+            report = reload_overrides(self.context._p_jar.db())
+        except (InvalidOverrides, OSError, ValueError) as error:
+            response.setStatus(409)
+            return json.dumps({"status": "rejected", "error": str(error)})
+        return json.dumps({"status": "reloaded", **report}, sort_keys=True)
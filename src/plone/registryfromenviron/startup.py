@@ -0,0 +1,172 @@
+"""Opt-in eager compilation of env-var overrides at database open.
+
+Enabled with ``PLONE_REGISTRYFROMENVIRON_EAGER``:
+
+- ``true`` / ``1`` / ``yes`` / ``on``: when Zope opens its main database,
+  coerce every override against each Plone site's ``portal_registry`` and log
+  one structured report of applied, unknown and invalid keys.
+- ``strict``: as above, but refuse to start if any override is unknown or
+  invalid for any site.
+
+If every override turns out invalid for every site, the Registry patch stops
+looking up overrides (see :func:`patch.retire_if_all_invalid`). The warm-up,
+which compiles the overrides as well, does the same; a reload brings the
+lookups back, as it rejects invalid values.
+
+Without the setting, overrides are coerced lazily on first read, as before.
+
+Pattern overrides (see :mod:`.patterns`) are matched against the keys of
+every site, and the sites of site-scoped overrides are recorded, at
+database open in either case, see :func:`prepare_sites`.
+"""
+
+from . import environ
+from .environ import bind_site
+from .environ import compile_overrides
+from .environ import config
+from .environ import config_flag
+from .environ import expand_patterns as expand_registry_patterns
+from .patch import retire_if_all_invalid
+from Acquisition import aq_base
+from plone.base.interfaces import IPloneSiteRoot
+from zope.component import adapter
+from zope.processlifetime import IDatabaseOpenedWithRoot
+
+import json
+import logging
+import transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidOverrides(Exception):
+    """Raised when overrides do not fit the registry.
+
+    In strict eager mode at startup, and by a rejected reload.
+    """
+
+
+# True in the console scripts, see open_zope(): eager compilation is off.
+SCRIPT = False
+
+
+def eager_mode():
+    """Return ``"strict"``, ``"on"`` or ``""`` (off) from the environment."""
+    if SCRIPT:
+        return ""
+    if config("EAGER").strip().lower() == "strict":
+        return "strict"
+    if config_flag("EAGER"):
+        return "on"
+    return ""
+
+
+def iter_site_registries(app):
+    """Yield ``(path, registry)`` for every Plone site directly below ``app``.
+
+    Binds each registry to its site path for site-scoped overrides, see
+    :func:`environ.bind_site`.
+    """
+    for site in app.objectValues():
+        if not IPloneSiteRoot.providedBy(site):
+            continue
+        registry = getattr(aq_base(site), "portal_registry", None)
+        if registry is not None:
+            path = "/".join(site.getPhysicalPath())
+            bind_site(path, registry)
+            yield path, registry
+
+
+def open_zope(zopeconf):
+    """Configure Zope from ``zopeconf`` for a console script; return the root.
+
+    Configuring Zope opens the database and notifies
+    ``IDatabaseOpenedWithRoot``. Materialize mode, the warm-up and eager
+    compilation are switched off first, so a script neither writes to ZODB
+    nor refuses to start on their behalf.
+    """
+    global SCRIPT
+    from . import materialize
+    from . import warmup
+    from Zope2.Startup.run import make_wsgi_app
+
+    import Zope2
+
+    SCRIPT = True
+    materialize.ENABLED = False
+    warmup.ENABLED = False
+    make_wsgi_app({}, zopeconf)
+    return Zope2.app()
+
+
+def compile_sites(app):
+    """Compile all overrides for every site below ``app``.
+
+    Fills each registry's coercion cache and returns the startup report: a
+    dict mapping site path to the report of :func:`environ.compile_overrides`.
+    Keys matching a pattern override are added first.
+    """
+    reports = {}
+    for path, registry in iter_site_registries(app):
+        expand_registry_patterns(registry)
+        reports[path] = compile_overrides(registry)[1]
+    return reports
+
+
+@adapter(IDatabaseOpenedWithRoot)
+def prepare_sites(event):
+    """Subscriber: bind site paths and add the keys matching pattern overrides.
+
+    Only needed for pattern or site-scoped overrides. Skipped in eager
+    mode, where :func:`compile_sites` does it.
+    """
+    overrides = environ.RAW_OVERRIDES
+    if not (overrides.patterns or overrides.scopes) or eager_mode():
+        return
+    connection = event.database.open()
+    try:
+        app = connection.root().get("Application")
+        if app is None:
+            return
+        for _path, registry in iter_site_registries(app):
+            expand_registry_patterns(registry)
+    finally:
+        transaction.abort()
+        connection.close()
+    if overrides.patterns:
+        logger.info(
+            "Registry pattern overrides match: %s",
+            ", ".join(sorted(overrides.matched)) or "nothing",
+        )
+
+
+@adapter(IDatabaseOpenedWithRoot)
+def eager_compile(event):
+    """Subscriber: precompile overrides before the worker serves requests."""
+    mode = eager_mode()
+    overrides = environ.RAW_OVERRIDES
+    if not mode or not (overrides or overrides.patterns or overrides.scopes):
+        return
+    connection = event.database.open()
+    try:
+        app = connection.root().get("Application")
+        reports = compile_sites(app) if app is not None else {}
+    finally:
+        transaction.abort()
+        connection.close()
+    logger.info(
+        "Registry override startup report: %s", json.dumps(reports, sort_keys=True)
+    )
+    broken = sorted(
+        {
+            name
+            for report in reports.values()
+            for name in report["unknown"] + report["invalid"]
+        }
+    )
+    if broken and mode == "strict":
+        raise InvalidOverrides(
+            "Unknown or invalid registry overrides: {}".format(", ".join(broken))
+        )
+    retire_if_all_invalid(reports)
@@ -0,0 +1,169 @@
+"""Per-key counters for env-var overrides, exported in Prometheus text format.
+
+Enabled with ``PLONE_REGISTRYFROMENVIRON_STATS=true``. For every override
+key :func:`environ.get_override` counts
+
+- ``hits``: reads answered by the override,
+- ``fallbacks``: reads of an overridden key that fell back to ZODB because
+  the key is unknown or the value does not fit the field,
+- ``coercions`` / ``coercion_failures`` / ``coercion_seconds``: coercion
+  attempts, failed ones and their total time (eager compilation and reload
+  included).
+
+Reads of keys without override are not counted and cost nothing extra.
+Keys set by a pattern override carry the pattern as a ``pattern`` label.
+
+Each thread counts into its own table, so the hot path takes no lock and
+loses no increment. Tables are summed when read; only registering the
+first table of a new thread takes a lock.
+
+``@@registryfromenviron-metrics`` on the Zope root renders the counters,
+and those of the process cache when enabled, for Prometheus.
+"""
+
+from Products.Five.browser import BrowserView
+
+import threading
+
+
+# Counter names, in the order of the per-key lists.
+COUNTERS = ("hits", "fallbacks", "coercions", "coercion_failures", "coercion_seconds")
+
+_HELP = {
+    "hits": "Registry reads answered by an env-var override.",
+    "fallbacks": "Reads of an overridden key that fell back to the ZODB value.",
+    "coercions": "Coercions of an override to its field type.",
+    "coercion_failures": "Coercions that failed because the value does not fit.",
+    "coercion_seconds": "Time spent coercing overrides.",
+}
+
+METRIC_PREFIX = "plone_registryfromenviron_"
+
+
+class ThreadTables:
+    """Lists of ``width`` numbers per name, one table per thread.
+
+    :meth:`counters` returns the calling thread's list for ``name``; only
+    that thread changes it, so increments need no lock and are never lost.
+    :meth:`totals` sums the lists of all threads.
+    """
+
+    def __init__(self, width):
+        self._zero = [0] * width
+        self._local = threading.local()
+        self._tables = []
+        self._lock = threading.Lock()
+
+    def counters(self, name):
+        try:
+            table = self._local.table
+        except AttributeError:
+            table = self._local.table = {}
+            with self._lock:
+                self._tables.append(table)
+        counters = table.get(name)
+        if counters is None:
+            counters = table[name] = list(self._zero)
+        return counters
+
+    def totals(self):
+        """Return ``{name: [total, ...]}`` summed over all threads."""
+        with self._lock:
+            tables = list(self._tables)
+        totals = {}
+        for table in tables:
+            # list() copies under the GIL; the owning thread may insert.
+            for name, counters in list(table.items()):
+                summed = totals.get(name)
+                if summed is None:
+                    totals[name] = list(counters)
+                else:
+                    for index, value in enumerate(counters):
+                        summed[index] += value
+        return totals
+
+    def reset(self):
+        """Start counting from zero."""
+        with self._lock:
+            for table in self._tables:
+                table.clear()
+
+
+class KeyStats(ThreadTables):
+    """Counters per override key, see :data:`COUNTERS`."""
+
+    def __init__(self):
+        super().__init__(len(COUNTERS))
+
+    def hit(self, name):
+        self.counters(name)[0] += 1
+
+    def fallback(self, name):
+        self.counters(name)[1] += 1
+
+    def coerced(self, name, seconds, failed=False):
+        counters = self.counters(name)
+        counters[2] += 1
+        counters[4] += seconds
+        if failed:
+            counters[3] += 1
+
+    def snapshot(self):
+        """Return ``{name: {counter: total}}`` summed over all threads."""
+        totals = self.totals()
+        return {
+            name: dict(zip(COUNTERS, totals[name], strict=True))
+            for name in sorted(totals)
+        }
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(snapshot, process_cache=None, patterns=None):
+    """Render a :meth:`KeyStats.snapshot` in Prometheus text format.
+
+    ``process_cache`` is the ``cache.STATS`` dict, rendered as unlabeled
+    counters when given. ``patterns`` maps keys set by a pattern override
+    to the pattern, added as ``pattern`` label.
+    """
+    patterns = patterns or {}
+    labels = {}
+    for name in snapshot:
+        label = f'key="{_label(name)}"'
+        if name in patterns:
+            label += f',pattern="{_label(patterns[name])}"'
+        labels[name] = label
+    lines = []
+    for counter in COUNTERS:
+        metric = f"{METRIC_PREFIX}override_{counter}_total"
+        lines.append(f"# HELP {metric} {_HELP[counter]}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, counters in snapshot.items():
+            lines.append(f"{metric}{{{labels[name]}}} {counters[counter]}")
+    if process_cache is not None:
+        for counter, value in sorted(process_cache.items()):
+            metric = f"{METRIC_PREFIX}process_cache_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsView(BrowserView):
+    """``@@registryfromenviron-metrics``: counters in Prometheus text format."""
+
+    def __call__(self):
+        # Not at module level: environ imports this module.
+        from . import cache
+        from . import environ
+
+        self.request.response.setHeader(
+            "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+        )
+        stats = environ.STATS
+        return render(
+            stats.snapshot() if stats is not None else {},
+            cache.STATS if cache.ENABLED else None,
+            environ.RAW_OVERRIDES.matched,
+        )
@@ -0,0 +1,209 @@
+"""Opt-in warm-up of every site's registry before the worker serves requests.
+
+Enabled with ``PLONE_REGISTRYFROMENVIRON_WARMUP=true``. When Zope opens its
+main database, the registry of every Plone site is loaded into the ZODB
+connection caches in bulk, instead of one BTree bucket and field per
+first read:
+
+- the ``_fields`` and ``_values`` BTrees, and the persistent fields they
+  hold, are walked one tree level at a time; each level is announced to
+  the storage with ``Connection.prefetch`` before it is activated, so
+  storages supporting prefetch (ZEO, RelStorage) fetch it in one round
+  trip, others load it object by object as before,
+- connection caches belong to connections, so this is done for as many
+  pooled connections as ``PLONE_REGISTRYFROMENVIRON_WARMUP_CONNECTIONS``
+  (default: the pool size), which the worker threads then reuse,
+- in the same pass, pattern overrides are matched and all overrides are
+  coerced for every site (see :func:`environ.compile_overrides`), so no
+  request pays for coercion either; if every override is invalid for
+  every site, overrides are no longer looked up (see
+  :func:`patch.retire_if_all_invalid`).
+
+The subscriber runs during startup, before requests are served. Its
+report, with the time taken and the number of objects loaded, is logged.
+``@@registryfromenviron-warmup`` on the Zope root serves its status and
+counts, without site paths or errors: HTTP 200 once the registries are
+warm, 503 until then or if the warm-up failed, for use as a readiness
+probe.
+"""
+
+from . import environ
+from .environ import compile_overrides
+from .environ import config
+from .environ import config_flag
+from .environ import expand_patterns
+from .patch import retire_if_all_invalid
+from .startup import iter_site_registries
+from persistent import Persistent
+from Products.Five.browser import BrowserView
+from zope.component import adapter
+from zope.processlifetime import IDatabaseOpenedWithRoot
+
+import json
+import logging
+import time
+import transaction
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config_flag("WARMUP")
+CONNECTIONS = int(config("WARMUP_CONNECTIONS", "0"))
+
+# The report of the last warm-up, None before it finished; see WarmupView.
+REPORT: dict | None = None
+
+
+def _children(obj):
+    """Return the persistent objects below ``obj`` that belong to the registry.
+
+    BTree nodes are read from their state: inner nodes hold ``(child, key,
+    child, ...)``, buckets ``(key, value, ...)`` and their next bucket.
+    Other objects (fields) are searched for persistent attribute values,
+    such as the ``value_type`` of a collection field.
+    """
+    if hasattr(obj, "__dict__"):
+        return [
+            value for value in obj.__dict__.values() if isinstance(value, Persistent)
+        ]
+    state = obj.__getstate__()
+    if not state:
+        return []
+    items = state[0]
+    if items and isinstance(items[0], Persistent):
+        children = list(items[::2])
+    else:
+        children = [value for value in items[1::2] if isinstance(value, Persistent)]
+    if len(state) > 1 and isinstance(state[1], Persistent):
+        children.append(state[1])
+    return children
+
+
+def load(connection, roots):
+    """Load ``roots`` and the registry objects below them; return the count.
+
+    Breadth first: the ghosts of each level are prefetched together, then
+    activated. Objects already loaded are walked but not counted.
+    """
+    loaded = 0
+    seen = set()
+    level = list(roots)
+    while level:
+        ghosts = [obj for obj in level if obj._p_changed is None]
+        if ghosts:
+            connection.prefetch(ghosts)
+        below = []
+        for obj in level:
+            key = obj._p_oid or id(obj)
+            if key in seen:
+                continue
+            seen.add(key)
+            if obj._p_changed is None:
+                obj._p_activate()
+                loaded += 1
+            below.extend(_children(obj))
+        level = below
+    return loaded
+
+
+def warm_registry(registry):
+    """Load ``registry`` and its records into its connection; return the count."""
+    # _Records is not persistent itself; it lives in the registry's state.
+    loaded = load(registry._p_jar, [registry])
+    records = registry._records
+    return loaded + load(registry._p_jar, [records._fields, records._values])
+
+
+def warm_up(db, connections=None):
+    """Warm the registries of every site in ``connections`` pooled connections.
+
+    ``connections`` defaults to ``CONNECTIONS``, or the pool size of
+    ``db`` if that is 0. Overrides are compiled with the first connection.
+    Returns the report.
+    """
+    if connections is None:
+        connections = CONNECTIONS or db.getPoolSize()
+    started = time.perf_counter()
+    report = {"status": "warm", "connections": 0, "objects": 0, "sites": {}}
+    compiled = {}
+    opened = []
+    try:
+        for index in range(max(connections, 1)):
+            manager = transaction.TransactionManager()
+            connection = db.open(transaction_manager=manager)
+            opened.append((manager, connection))
+            app = connection.root().get("Application")
+            if app is None:
+                break
+            report["prefetch"] = hasattr(connection._storage, "prefetch")
+            for path, registry in iter_site_registries(app):
+                site = report["sites"].setdefault(path, {"objects": 0})
+                objects = warm_registry(registry)
+                site["objects"] += objects
+                report["objects"] += objects
+                if index == 0 and (
+                    environ.RAW_OVERRIDES
+                    or environ.RAW_OVERRIDES.patterns
+                    or environ.RAW_OVERRIDES.scopes
+                ):
+                    expand_patterns(registry)
+                    compiled[path] = compile_overrides(registry)[1]
+                    site["overrides"] = {
+                        name: len(keys) for name, keys in compiled[path].items()
+                    }
+            report["connections"] += 1
+    finally:
+        # Closed only now, so every warm-up above got its own connection.
+        for manager, connection in opened:
+            manager.abort()
+            connection.close()
+    retire_if_all_invalid(compiled)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["cache_size"] = db.getCacheSize()
+    if report["connections"] and (
+        report["objects"] / report["connections"] > report["cache_size"]
+    ):
+        logger.warning(
+            "Registry warm-up loaded %d objects per connection, more than the "
+            "connection cache size %d: they will not all stay cached",
+            report["objects"] // report["connections"],
+            report["cache_size"],
+        )
+    return report
+
+
+@adapter(IDatabaseOpenedWithRoot)
+def warm_up_database(event):
+    """Subscriber: warm up the registries if ``WARMUP`` is on."""
+    global REPORT
+    if not ENABLED:
+        return
+    try:
+        REPORT = warm_up(event.database)
+    except Exception:
+        logger.exception("Registry warm-up failed")
+        REPORT = {"status": "failed"}
+        return
+    logger.info("Registry warm-up: %s", json.dumps(REPORT, sort_keys=True))
+
+
+# Report entries served by the view; the rest is only logged.
+PUBLIC_COUNTS = ("connections", "objects", "seconds")
+
+
+class WarmupView(BrowserView):
+    """``@@registryfromenviron-warmup``: warm-up status, for readiness probes."""
+
+    def __call__(self):
+        response = self.request.response
+        response.setHeader("Content-Type", "application/json")
+        if not ENABLED:
+            return json.dumps({"status": "disabled"})
+        report = REPORT or {"status": "pending"}
+        if report["status"] != "warm":
+            response.setStatus(503)
+            return json.dumps({"status": report["status"]})
+        public = {name: report[name] for name in PUBLIC_COUNTS}
+        public["status"] = report["status"]
+        public["sites"] = len(report["sites"])
+        return json.dumps(public, sort_keys=True)
@@ -0,0 +1,140 @@
+"""Shared fixtures for plone.registryfromenviron tests."""
+
+from OFS.Folder import Folder
+from plone.base.interfaces import IPloneSiteRoot
+from plone.registry import field as reg_field
+from plone.registry.registry import Registry
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope.interface import alsoProvides
+
+import pytest
+import transaction
+
+
+def _make_site(site_id):
+    site = Folder(site_id)
+    alsoProvides(site, IPloneSiteRoot)
+    registry = Registry()
+    registry._records._fields["my.number"] = reg_field.Int(title="A number")
+    registry._records._values["my.number"] = 0
+    site.portal_registry = registry
+    return site
+
+
+# ── Fixtures ──────────────────────────────────────────────────────
+
+
+@pytest.fixture(autouse=True)
+def _clean_overrides():
+    """Reset module-level override dicts before/after each test."""
+    from plone.registryfromenviron import environ
+
+    orig_raw = environ.RAW_OVERRIDES.copy()
+    orig_coerced = environ._COERCED.copy()
+    environ.RAW_OVERRIDES.clear()
+    environ._COERCED.clear()
+    environ._LOGGED.clear()
+    yield environ
+    environ.RAW_OVERRIDES.clear()
+    environ.RAW_OVERRIDES.update(orig_raw)
+    environ._COERCED.clear()
+    environ._COERCED.update(orig_coerced)
+    environ._LOGGED.clear()
+
+
+@pytest.fixture
+def registry():
+    """A plain plone.registry Registry with test records for each field type."""
+    reg = Registry()
+    reg._records._fields["my.textline"] = reg_field.TextLine(title="A text")
+    reg._records._values["my.textline"] = "original"
+    reg._records._fields["my.text"] = reg_field.Text(title="A text block")
+    reg._records._values["my.text"] = "original text"
+    reg._records._fields["my.number"] = reg_field.Int(title="A number")
+    reg._records._values["my.number"] = 0
+    reg._records._fields["my.flag"] = reg_field.Bool(title="A flag")
+    reg._records._values["my.flag"] = False
+    reg._records._fields["my.rate"] = reg_field.Float(title="A rate")
+    reg._records._values["my.rate"] = 0.0
+    reg._records._fields["my.items"] = reg_field.List(
+        title="Items",
+        value_type=reg_field.TextLine(),
+    )
+    reg._records._values["my.items"] = []
+    reg._records._fields["my.pair"] = reg_field.Tuple(
+        title="Pair",
+        value_type=reg_field.TextLine(),
+    )
+    reg._records._values["my.pair"] = ()
+    reg._records._fields["my.tags"] = reg_field.Set(
+        title="Tags",
+        value_type=reg_field.TextLine(),
+    )
+    reg._records._values["my.tags"] = set()
+    reg._records._fields["my.frozen"] = reg_field.FrozenSet(
+        title="Frozen",
+        value_type=reg_field.TextLine(),
+    )
+    reg._records._values["my.frozen"] = frozenset()
+    reg._records._fields["my.mapping"] = reg_field.Dict(
+        title="Mapping",
+        key_type=reg_field.TextLine(),
+        value_type=reg_field.TextLine(),
+    )
+    reg._records._values["my.mapping"] = {}
+    return reg
+
+
+@pytest.fixture
+def database():
+    """An in-memory ZODB whose root holds a Zope app with one Plone site."""
+    db = DB(MappingStorage())
+    connection = db.open()
+    app = Folder("")
+    connection.root()["Application"] = app
+    app._setObject("plone", _make_site("plone"))
+    app._setObject("other", Folder("other"))
+    transaction.commit()
+    connection.close()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def patched(_clean_overrides):
+    """Apply the Registry patch for one test; yields the environ module.
+
+    Fixtures switching on the request memo, the process cache or profiling
+    build on this one and call ``patch.rebind()``.
+    """
+    from plone.registryfromenviron import proxy
+    from plone.registryfromenviron.patch import apply_patch
+    from plone.registryfromenviron.patch import unpatch
+
+    unpatch()
+    apply_patch()
+    proxy._CHECKED.clear()
+    yield _clean_overrides
+    unpatch()
+    proxy._CHECKED.clear()
+
+
+@pytest.fixture
+def subscribe():
+    """Register event handlers in the global registry for one test."""
+    from zope.component import getGlobalSiteManager
+
+    import zope.component.event  # noqa: F401 -- routes zope.event to handlers
+
+    registry = getGlobalSiteManager()
+    registered = []
+
+    def _subscribe(*handlers):
+        for handler in handlers:
+            registry.registerHandler(handler)
+            registered.append(handler)
+
+    yield _subscribe
+    for handler in registered:
+        registry.unregisterHandler(handler)
@@ -0,0 +1,84 @@
+"""Smoke tests keeping the benchmark suite runnable."""
+
+
+class TestReadPathBenchmark:
+    def test_run_covers_all_scenarios(self, _clean_overrides):
+        from benchmarks.bench_read_path import OVERRIDE_COUNTS
+        from benchmarks.bench_read_path import run
+
+        results = run(number=1, repeat=1, fields=["int", "dict"], cold_number=1)
+        scenarios = {(r["case"], r["op"], r["field"], r["overrides"]) for r in results}
+        assert len(scenarios) == len(results) == 3 * 6 * 2 * len(OVERRIDE_COUNTS)
+        assert all(r["ns_per_op"] > 0 for r in results)
+        assert all(r["cold_ns_per_op"] > 0 for r in results)
+
+    def test_run_restores_state(self, _clean_overrides):
+        from benchmarks.bench_read_path import run
+        from plone.registryfromenviron.patch import _originals
+
+        _clean_overrides.RAW_OVERRIDES["some.key"] = "v"
+        run(number=1, repeat=1, fields=["int"], cold_number=1)
+        assert _clean_overrides.RAW_OVERRIDES == {"some.key": "v"}
+        assert not _originals
+
+    def test_main_writes_json(self, _clean_overrides, tmp_path):
+        from benchmarks.bench_read_path import main
+
+        import json
+
+        output = tmp_path / "bench.json"
+        main(
+            [
+                "--number",
+                "1",
+                "--repeat",
+                "1",
+                "--cold-number",
+                "1",
+                "--field",
+                "bool",
+                "--output",
+                str(output),
+            ]
+        )
+        document = json.loads(output.read_text())
+        assert document["meta"]["number"] == 1
+        assert document["meta"]["cold_number"] == 1
+        assert {r["field"] for r in document["results"]} == {"bool"}
+
+
+class TestStressHarness:
+    def test_run_reports_clean_runs(self, _clean_overrides):
+        from benchmarks.stress_threads import run
+
+        results = run("mapping", threads=[1, 4], duration=0.2)
+        assert [r["threads"] for r in results] == [1, 4]
+        for result in results:
+            assert result["ops"] > 0
+            assert result["coerced_keys"] > 0
+            assert result["duplicate_coercions"] == {}
+            assert result["inconsistent"] == 0
+            assert result["errors"] == []
+            assert result["commits"] > 0
+        assert results[0]["scaling"] == 1.0
+
+    def test_file_storage_restores_state(self, _clean_overrides):
+        from benchmarks.stress_threads import run
+        from plone.registryfromenviron.patch import _originals
+
+        _clean_overrides.RAW_OVERRIDES["some.key"] = "v"
+        (result,) = run("file", threads=[2], duration=0.2, writers=2)
+        assert result["inconsistent"] == 0
+        assert result["errors"] == []
+        assert _clean_overrides.RAW_OVERRIDES == {"some.key": "v"}
+        assert not _originals
+
+    def test_main_exit_status(self, _clean_overrides, tmp_path):
+        from benchmarks.stress_threads import main
+
+        import json
+
+        output = tmp_path / "stress.json"
+        status = main(["--threads", "2", "--duration", "0.1", "--output", str(output)])
+        assert status == 0
+        assert json.loads(output.read_text())["meta"]["storage"] == "mapping"
@@ -0,0 +1,198 @@
+"""Tests for the process-wide registry value cache."""
+
+from plone.registry import field as reg_field
+from plone.registry.record import Record
+from plone.registry.registry import Registry
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+
+import pytest
+import transaction
+
+
+@pytest.fixture
+def cache_patched(monkeypatch, patched):
+    from plone.registryfromenviron import cache
+    from plone.registryfromenviron.patch import rebind
+
+    monkeypatch.setattr(cache, "ENABLED", True)
+    monkeypatch.setattr(cache, "_CACHES", {})
+    monkeypatch.setattr(cache, "STATS", dict.fromkeys(cache.STATS, 0))
+    rebind()
+    return cache
+
+
+@pytest.fixture
+def db():
+    db = DB(MappingStorage())
+    tm = transaction.TransactionManager()
+    connection = db.open(transaction_manager=tm)
+    registry = Registry()
+    for i in range(200):
+        registry.records[f"my.key{i:03d}"] = Record(reg_field.Int(), i)
+    registry.records["my.list"] = Record(
+        reg_field.List(value_type=reg_field.TextLine()), ["a"]
+    )
+    connection.root()["registry"] = registry
+    connection.root()["other"] = Registry()
+    tm.commit()
+    connection.close()
+    yield db
+    db.close()
+
+
+def _open(db):
+    tm = transaction.TransactionManager()
+    connection = db.open(transaction_manager=tm)
+    return tm, connection, connection.root()["registry"]
+
+
+class TestProcessCache:
+    def test_second_read_hits(self, cache_patched, db):
+        _, _, reader = _open(db)
+        assert reader["my.key001"] == 1
+        assert reader.get("my.key001") == 1
+        assert cache_patched.STATS["misses"] == 1
+        assert cache_patched.STATS["hits"] == 1
+
+    def test_shared_across_connections(self, cache_patched, db):
+        _, _, first = _open(db)
+        _, _, second = _open(db)
+        assert first["my.key002"] == 2
+        assert second["my.key002"] == 2
+        assert (
+            dict(cache_patched.STATS, hits=1, misses=1, fills=1) == cache_patched.STATS
+        )
+
+    def test_commit_invalidates_other_connections(self, cache_patched, db):
+        reader_tm, _, reader = _open(db)
+        writer_tm, _, writer = _open(db)
+        assert reader["my.key150"] == 150
+        writer["my.key150"] = -1
+        writer_tm.commit()
+        assert cache_patched.STATS["invalidations"] == 1
+        reader_tm.begin()
+        assert reader["my.key150"] == -1
+        assert reader.get("my.key150") == -1
+
+    def test_reconnect_invalidates_all(self, cache_patched, db):
+        reader_tm, _, reader = _open(db)
+        writer_tm, _, writer = _open(db)
+        assert reader["my.key150"] == 150
+        cache = cache_patched._CACHES[db.database_name]
+        # Disconnected: the commit's invalidations do not reach the cache.
+        cache.invalidate = lambda tid, oids: None
+        writer["my.key150"] = -1
+        writer_tm.commit()
+        del cache.invalidate
+        reader_tm.begin()
+        assert reader["my.key150"] == 150
+        db._mvcc_storage.invalidateCache()
+        assert cache.values == {}
+        assert cache.watermark == db.lastTransaction()
+        reader_tm.begin()
+        assert reader["my.key150"] == -1
+
+    def test_unrelated_commit_keeps_cache(self, cache_patched, db):
+        reader_tm, _, reader = _open(db)
+        writer_tm, writer_connection, _ = _open(db)
+        assert reader["my.key010"] == 10
+        writer_connection.root()["other"]._p_changed = True
+        writer_tm.commit()
+        reader_tm.begin()
+        assert reader["my.key010"] == 10
+        assert cache_patched.STATS["invalidations"] == 0
+        assert cache_patched.STATS["hits"] == 1
+
+    def test_writer_reads_own_uncommitted_write(self, cache_patched, db):
+        _, _, reader = _open(db)
+        writer_tm, _, writer = _open(db)
+        assert reader["my.key003"] == 3
+        writer["my.key003"] = 33
+        assert writer["my.key003"] == 33
+        writer_tm.abort()
+        assert writer["my.key003"] == 3
+        assert reader["my.key003"] == 3
+
+    def test_stale_snapshot_does_not_fill(self, cache_patched, db):
+        stale_tm, _, stale = _open(db)
+        writer_tm, _, writer = _open(db)
+        writer["my.key004"] = 44
+        writer_tm.commit()
+        # ``stale`` has not started a new transaction yet
+        assert stale["my.key004"] == 4
+        assert cache_patched.STATS["fills"] == 0
+        stale_tm.begin()
+        assert stale["my.key004"] == 44
+        assert cache_patched.STATS["fills"] == 1
+
+    def test_missing_key(self, cache_patched, db):
+        _, _, reader = _open(db)
+        assert reader.get("no.such.key", "default") == "default"
+        with pytest.raises(KeyError):
+            reader["no.such.key"]
+
+    def test_overrides_take_precedence(self, cache_patched, db, _clean_overrides):
+        _, _, reader = _open(db)
+        assert reader["my.key005"] == 5
+        _clean_overrides.RAW_OVERRIDES["my.key005"] = "55"
+        assert reader["my.key005"] == 55
+
+    def test_transient_registry_not_cached(self, cache_patched, registry):
+        assert registry["my.textline"] == "original"
+        assert cache_patched.STATS["misses"] == 0
+
+    def test_storage_without_mvcc_adapter(self, cache_patched):
+        class _DB:
+            database_name = "relstorage"
+            _mvcc_storage = object()
+
+        assert cache_patched.watch(_DB()) is None
+        assert cache_patched._CACHES == {"relstorage": None}
+
+
+class TestValuePolicy:
+    def test_shared_does_not_cache_mutable(self, cache_patched, db):
+        _, _, first = _open(db)
+        _, _, second = _open(db)
+        first["my.list"].append("b")
+        assert second["my.list"] == ["a"]
+        assert cache_patched.STATS["fills"] == 0
+
+    def test_frozen(self, monkeypatch, cache_patched, db, _clean_overrides):
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "frozen")
+        _, _, first = _open(db)
+        _, _, second = _open(db)
+        assert first["my.list"] == ("a",)
+        assert second.get("my.list") == ("a",)
+        assert cache_patched.STATS["hits"] == 1
+
+    def test_copy(self, monkeypatch, cache_patched, db, _clean_overrides):
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "copy")
+        _, _, first = _open(db)
+        _, _, second = _open(db)
+        first["my.list"].append("b")
+        second.get("my.list").append("c")
+        assert first["my.list"] == second["my.list"] == ["a"]
+        assert cache_patched.STATS["hits"] == 3
+
+
+class TestTreeOids:
+    def test_covers_all_buckets(self, db):
+        from plone.registryfromenviron.cache import tree_oids
+
+        connection = db.open()
+        try:
+            values = connection.root()["registry"].records._values
+            oids = tree_oids(values)
+            bucket = values.__getstate__()[1]
+            buckets = 0
+            while bucket is not None:
+                assert bucket._p_oid in oids
+                buckets += 1
+                state = bucket.__getstate__()
+                bucket = state[1] if len(state) > 1 else None
+            assert buckets > 1
+            assert values._p_oid in oids
+        finally:
+            connection.close()
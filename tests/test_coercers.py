@@ -0,0 +1,202 @@
+"""Tests for the compiled per-field coercers."""
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from plone.registry import field as reg_field
+from zope.schema.interfaces import ValidationError
+
+import pytest
+
+
+class TestNestedTypes:
+    def test_list_of_int(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.List(value_type=reg_field.Int())
+        assert coerce('["1", 2]', field) == [1, 2]
+
+    def test_dict_with_int_keys_and_list_values(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.Dict(
+            key_type=reg_field.Int(),
+            value_type=reg_field.Tuple(value_type=reg_field.Float()),
+        )
+        assert coerce('{"1": [1, "2.5"]}', field) == {1: (1.0, 2.5)}
+
+    def test_nested_item_of_wrong_type(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.List(value_type=reg_field.Int())
+        with pytest.raises(TypeError):
+            coerce("[[1]]", field)
+
+    def test_json_of_wrong_shape(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        with pytest.raises(TypeError):
+            coerce('{"a": 1}', reg_field.List(value_type=reg_field.Int()))
+        with pytest.raises(TypeError):
+            coerce("[1]", reg_field.Dict())
+
+    def test_collection_without_value_type(self):
+        from plone.registryfromenviron.coercers import coerce
+        from zope.schema import List
+
+        assert coerce('[1, "a"]', List()) == [1, "a"]
+
+    def test_numbers_in_text_list(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.List(value_type=reg_field.TextLine())
+        assert coerce('["a", 1]', field) == ["a", "1"]
+
+
+class TestScalarTypes:
+    def test_datetime(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        assert coerce("2026-01-02T03:04:05", reg_field.Datetime()) == datetime(
+            2026, 1, 2, 3, 4, 5
+        )
+
+    def test_date(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        assert coerce("2026-01-02", reg_field.Date()) == date(2026, 1, 2)
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("90", timedelta(seconds=90)),
+            ("1.5", timedelta(seconds=1.5)),
+            ("1:30", timedelta(hours=1, minutes=30)),
+            ("01:02:03", timedelta(hours=1, minutes=2, seconds=3)),
+            ("P1DT2H30M", timedelta(days=1, hours=2, minutes=30)),
+            ("PT45S", timedelta(seconds=45)),
+            ("P2W", timedelta(weeks=2)),
+        ],
+    )
+    def test_timedelta(self, raw, expected):
+        from plone.registryfromenviron.coercers import coerce
+
+        assert coerce(raw, reg_field.Timedelta()) == expected
+
+    @pytest.mark.parametrize("raw", ["P", "1:2:3:4", "soon"])
+    def test_timedelta_invalid(self, raw):
+        from plone.registryfromenviron.coercers import coerce
+
+        with pytest.raises(ValueError):
+            coerce(raw, reg_field.Timedelta())
+
+    def test_bytes(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        assert coerce("grüß", reg_field.Bytes()) == "grüß".encode()
+        assert coerce("line", reg_field.BytesLine()) == b"line"
+
+    def test_choice_values(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.Choice(values=[1, 2, 3])
+        assert coerce("2", field) == 2
+        with pytest.raises(ValueError):
+            coerce("4", field)
+
+    def test_choice_named_vocabulary_without_site(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.Choice(vocabulary="no.such.vocabulary")
+        assert coerce("anything", field) == "anything"
+
+    def test_collection_of_named_vocabulary_without_site(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        choice = reg_field.Choice(vocabulary="no.such.vocabulary")
+        field = reg_field.Tuple(value_type=choice)
+        assert coerce('["a", "b"]', field) == ("a", "b")
+        field = reg_field.Dict(
+            key_type=reg_field.Choice(vocabulary="no.such.vocabulary"),
+            value_type=reg_field.List(value_type=choice),
+        )
+        assert coerce('{"a": ["b"]}', field) == {"a": ["b"]}
+
+    def test_collection_other_errors_still_raise(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.Dict(
+            key_type=reg_field.Choice(vocabulary="no.such.vocabulary"),
+            value_type=reg_field.TextLine(max_length=1),
+        )
+        with pytest.raises(ValidationError):
+            coerce('{"a": "long"}', field)
+
+    def test_bool_from_json(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.List(value_type=reg_field.Bool())
+        assert coerce('[true, 0, "yes"]', field) == [True, False, True]
+
+
+class TestValidation:
+    def test_int_range(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        with pytest.raises(ValidationError):
+            coerce("11", reg_field.Int(min=0, max=10))
+
+    def test_textline_newline(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        with pytest.raises(ValidationError):
+            coerce("two\nlines", reg_field.TextLine())
+
+    def test_collection_length(self):
+        from plone.registryfromenviron.coercers import coerce
+
+        field = reg_field.List(value_type=reg_field.Int(), max_length=1)
+        with pytest.raises(ValidationError):
+            coerce("[1, 2]", field)
+
+    def test_invalid_override_falls_back(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+
+        registry._records._fields["my.small"] = reg_field.Int(max=5)
+        registry._records._values["my.small"] = 1
+        _clean_overrides.RAW_OVERRIDES["my.small"] = "6"
+        assert get_override(registry, "my.small") is _MARKER
+
+
+class TestCompileCache:
+    def test_same_definition_shares_coercer(self):
+        from plone.registryfromenviron.coercers import compile_coercer
+
+        first = reg_field.List(value_type=reg_field.Int(), title="One")
+        second = reg_field.List(value_type=reg_field.Int(), title="Two")
+        assert compile_coercer(first) is compile_coercer(second)
+
+    def test_other_definition_other_coercer(self):
+        from plone.registryfromenviron.coercers import compile_coercer
+
+        assert compile_coercer(
+            reg_field.List(value_type=reg_field.Int())
+        ) is not compile_coercer(reg_field.List(value_type=reg_field.Float()))
+        assert compile_coercer(reg_field.Choice(values=[1])) is not compile_coercer(
+            reg_field.Choice(values=[2])
+        )
+
+    def test_definition_change_invalidates_override(
+        self, _clean_overrides, registry, subscribe
+    ):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+
+        subscribe(invalidate_added)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        assert get_override(registry, "my.number") == 7
+        registry.records["my.number"] = Record(reg_field.Int(max=5), 0)
+        assert get_override(registry, "my.number") is _MARKER
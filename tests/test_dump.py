@@ -0,0 +1,222 @@
+"""Tests for the effective registry dump."""
+
+from io import StringIO
+from plone.registry import field as reg_field
+
+import json
+import pytest
+import transaction
+
+
+@pytest.fixture
+def app(database):
+    """The Zope app of ``database`` with a few more records in ``/plone``."""
+    connection = database.open()
+    app = connection.root()["Application"]
+    registry = app.plone.portal_registry
+    registry.records._fields["my.textline"] = reg_field.TextLine()
+    registry.records._values["my.textline"] = "original"
+    registry.records._fields["my.tags"] = reg_field.Set(value_type=reg_field.TextLine())
+    registry.records._values["my.tags"] = {"b", "a"}
+    registry.records._fields["my.rate"] = reg_field.Float()
+    registry.records._values["my.rate"] = 0.5
+    transaction.commit()
+    yield app
+    transaction.abort()
+    connection.close()
+
+
+class TestIterEffective:
+    def test_sources(self, _clean_overrides, app):
+        from plone.registryfromenviron.dump import iter_effective
+
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"my.number": "5", "my.rate": "fast", "no.such.key": "x"}
+        )
+        rows = list(iter_effective(app.plone.portal_registry))
+        assert rows == [
+            ("my.number", 5, "env"),
+            ("my.rate", 0.5, "invalid"),
+            ("my.tags", {"a", "b"}, "zodb"),
+            ("my.textline", "original", "zodb"),
+        ]
+
+    @pytest.mark.parametrize("batch_size", [1, 500])
+    def test_hinted_without_record(self, _clean_overrides, app, batch_size):
+        from plone.registryfromenviron.dump import iter_effective
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+
+        original = swap_overrides(
+            OverrideTable(
+                {
+                    "addon.count": "3",
+                    "addon.count#type": "int",
+                    "my.rate": "1.5",
+                    "my.rate#type": "float",
+                    "my.ratf": "2",
+                    "my.ratf#type": "int",
+                    "zz.ids": '["1"]',
+                    "zz.ids#type": "json-list:int",
+                }
+            )
+        )
+        try:
+            rows = list(iter_effective(app.plone.portal_registry, batch_size))
+        finally:
+            swap_overrides(original)
+        assert [row for row in rows if row[2] != "zodb"] == [
+            ("addon.count", 3, "hint"),
+            ("my.rate", 1.5, "env"),
+            ("my.ratf", 2, "hint"),
+            ("zz.ids", [1], "hint"),
+        ]
+        assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+
+    def test_batches_minimize_cache(self, monkeypatch, app):
+        from plone.registryfromenviron.dump import iter_effective
+
+        connection = app._p_jar
+        calls = []
+        monkeypatch.setattr(
+            connection, "cacheMinimize", lambda: calls.append(len(calls))
+        )
+        names = [row[0] for row in iter_effective(app.plone.portal_registry, 3)]
+        assert names == ["my.number", "my.rate", "my.tags", "my.textline"]
+        assert calls == [0, 1]
+
+    def test_objects_are_ghosts_after_batch(self, app):
+        from plone.registryfromenviron.dump import iter_effective
+
+        site = app.plone
+        rows = iter_effective(site.portal_registry, 2)
+        next(rows)
+        next(rows)
+        assert site._p_changed is False
+        next(rows)
+        assert site._p_changed is None
+        assert next(rows)[0] == "my.textline"
+
+
+class TestDump:
+    def test_jsonl(self, _clean_overrides, app):
+        from plone.registryfromenviron.dump import dump
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        out = StringIO()
+        assert dump(app, out) == {"/plone": 4}
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert lines[0] == {
+            "site": "/plone",
+            "key": "my.number",
+            "source": "env",
+            "value": 5,
+        }
+        assert lines[2]["value"] == ["a", "b"]
+
+    def test_xml(self, _clean_overrides, app):
+        from plone.registryfromenviron.dump import dump
+        from xml.etree import ElementTree
+
+        _clean_overrides.RAW_OVERRIDES["my.textline"] = "<&>"
+        out = StringIO()
+        dump(app, out, "xml", site="plone")
+        root = ElementTree.fromstring(out.getvalue().encode("utf-8"))
+        assert root.tag == "registry"
+        assert root.get("site") == "/plone"
+        records = {record.get("name"): record for record in root}
+        assert records["my.textline"].get("source") == "env"
+        assert records["my.textline"].find("value").text == "<&>"
+        tags = records["my.tags"].find("value")
+        assert [element.text for element in tags] == ["a", "b"]
+
+    def test_unknown_site(self, app):
+        from plone.registryfromenviron.dump import dump
+
+        with pytest.raises(KeyError):
+            dump(app, StringIO(), site="/nope")
+
+
+class TestXmlValue:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            (None, "<value />"),
+            (True, "<value>True</value>"),
+            (b"x", "<value>x</value>"),
+            ({"k": 1}, '<value><element key="k">1</element></value>'),
+            (("a", "b"), "<value><element>a</element><element>b</element></value>"),
+        ],
+    )
+    def test_values(self, value, expected):
+        from plone.registryfromenviron.dump import _xml_value
+
+        assert _xml_value(value) == expected
+
+
+class TestMain:
+    @pytest.fixture
+    def zope(self, monkeypatch, database):
+        """Let ``main`` open ``database`` instead of configuring Zope."""
+        from plone.registryfromenviron import startup
+        from zope.event import notify
+        from zope.processlifetime import DatabaseOpenedWithRoot
+        from Zope2.Startup import run
+
+        import Zope2
+
+        configured = []
+
+        def make_wsgi_app(config, path):
+            configured.append(path)
+            notify(DatabaseOpenedWithRoot(database))
+
+        monkeypatch.setattr(startup, "SCRIPT", False)
+        monkeypatch.setattr(run, "make_wsgi_app", make_wsgi_app)
+        monkeypatch.setattr(Zope2, "app", lambda: database.open().root()["Application"])
+        return configured
+
+    def test_writes_output_file(self, zope, _clean_overrides, tmp_path):
+        from plone.registryfromenviron.dump import main
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        path = tmp_path / "dump.jsonl"
+        main(["zope.conf", "--output", str(path), "--batch-size", "1"])
+        assert zope == ["zope.conf"]
+        [line] = path.read_text().splitlines()
+        assert json.loads(line)["value"] == 5
+
+    def test_skips_startup_subscribers(
+        self, monkeypatch, zope, database, _clean_overrides, subscribe, tmp_path
+    ):
+        from plone.registryfromenviron import materialize
+        from plone.registryfromenviron import startup
+        from plone.registryfromenviron import warmup
+        from plone.registryfromenviron.dump import main
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "strict")
+        monkeypatch.setattr(materialize, "ENABLED", True)
+        monkeypatch.setattr(warmup, "ENABLED", True)
+        monkeypatch.setattr(warmup, "REPORT", None)
+        subscribe(
+            materialize.materialize_at_startup,
+            warmup.warm_up_database,
+            startup.eager_compile,
+        )
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "5", "no.such": "1"})
+        main(["zope.conf", "--output", str(tmp_path / "dump.jsonl")])
+        connection = database.open()
+        try:
+            registry = connection.root()["Application"].plone.portal_registry
+            assert registry.records._values["my.number"] == 0
+        finally:
+            connection.close()
+        assert warmup.REPORT is None
+
+    def test_unknown_site_exits(self, zope, capsys):
+        from plone.registryfromenviron.dump import main
+
+        with pytest.raises(SystemExit) as exc:
+            main(["zope.conf", "--site", "/nope", "--format", "xml"])
+        assert exc.value.code == 2
+        assert "No Plone site at /nope" in capsys.readouterr().err
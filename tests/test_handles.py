@@ -0,0 +1,264 @@
+"""Tests for pre-resolved record handles."""
+
+from plone.registry import field as reg_field
+
+import pytest
+import transaction
+
+
+@pytest.fixture
+def leaves(monkeypatch):
+    """Count bucket lookups, i.e. resolutions of a key in ZODB."""
+    from plone.registryfromenviron import handles
+
+    calls = []
+    leaf = handles._leaf
+
+    def counted(tree, name):
+        calls.append(name)
+        return leaf(tree, name)
+
+    monkeypatch.setattr(handles, "_leaf", counted)
+    return calls
+
+
+@pytest.fixture
+def site_registry(database):
+    """The ``/plone`` registry with enough records to split ``_values``."""
+    connection = database.open()
+    registry = connection.root()["Application"].plone.portal_registry
+    for i in range(300):
+        registry.records._fields[f"bulk.n{i:03}"] = reg_field.Int()
+        registry.records._values[f"bulk.n{i:03}"] = i
+    transaction.commit()
+    yield registry
+    transaction.abort()
+    connection.close()
+
+
+class TestOverride:
+    def test_resolved_once(self, monkeypatch, _clean_overrides, registry, patched):
+        from plone.registryfromenviron import handles
+        from plone.registryfromenviron.handles import RecordHandle
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        handle = RecordHandle("my.number")
+        assert handle.get(registry) == 5
+        monkeypatch.setattr(handles, "resolve_override", pytest.fail)
+        assert handle.get(registry) == 5
+
+    def test_value_policy(self, monkeypatch, _clean_overrides, registry, patched):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "copy")
+        _clean_overrides.RAW_OVERRIDES["my.items"] = '["a"]'
+        handle = RecordHandle("my.items")
+        handle.get(registry).append("b")
+        assert handle.get(registry) == ["a"]
+
+    def test_table_change(self, _clean_overrides, registry, patched):
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+        from plone.registryfromenviron.handles import RecordHandle
+
+        handle = RecordHandle("my.number")
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert handle.get(registry) == 5
+        original = swap_overrides(OverrideTable({"my.number": "7"}))
+        try:
+            assert handle.get(registry) == 7
+        finally:
+            swap_overrides(original)
+        del _clean_overrides.RAW_OVERRIDES["my.number"]
+        assert handle.get(registry) == registry["my.number"] == 0
+
+    def test_invalid_reads_zodb(self, _clean_overrides, registry, patched):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "x"
+        assert RecordHandle("my.number").get(registry) == 0
+
+    def test_unpatched_reads_zodb(self, _clean_overrides, registry):
+        from plone.registryfromenviron.handles import RecordHandle
+        from plone.registryfromenviron.patch import apply_patch
+        from plone.registryfromenviron.patch import unpatch
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        handle = RecordHandle("my.number")
+        unpatch()
+        assert handle.get(registry) == registry["my.number"] == 0
+        apply_patch()
+        try:
+            assert handle.get(registry) == registry["my.number"] == 5
+        finally:
+            unpatch()
+
+    def test_hinted(self, _clean_overrides, registry, patched):
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+        from plone.registryfromenviron.handles import RecordHandle
+
+        original = swap_overrides(
+            OverrideTable({"addon.count": "3", "addon.count#type": "int"})
+        )
+        try:
+            assert RecordHandle("addon.count").get(registry) == 3
+        finally:
+            swap_overrides(original)
+
+    def test_record_added_resets(self, _clean_overrides, registry, patched):
+        from plone.registry.events import RecordAddedEvent
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import invalidate_added
+        from plone.registryfromenviron.handles import invalidate_handles
+        from plone.registryfromenviron.handles import RecordHandle
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        handle = RecordHandle("my.number")
+        assert handle.get(registry) == 5
+        registry.records["my.number"] = Record(reg_field.TextLine(), "0")
+        event = RecordAddedEvent(registry.records["my.number"])
+        invalidate_added(event)
+        invalidate_handles(event)
+        assert handle.get(registry) == "5"
+
+
+class TestStored:
+    def test_bucket_reused(self, site_registry, leaves, patched):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        handle = RecordHandle("bulk.n150")
+        assert handle.get(site_registry) == 150
+        site_registry.records._values["bulk.n150"] = -1
+        assert handle.get(site_registry) == -1
+        transaction.abort()
+        assert handle.get(site_registry) == 150
+        assert leaves == ["bulk.n150"]
+
+    def test_other_connection_commit(self, database, site_registry):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        handle = RecordHandle("bulk.n010")
+        assert handle.get(site_registry) == 10
+        manager = transaction.TransactionManager()
+        connection = database.open(transaction_manager=manager)
+        registry = connection.root()["Application"].plone.portal_registry
+        registry.records._values["bulk.n010"] = 11
+        manager.commit()
+        connection.close()
+        transaction.abort()
+        assert handle.get(site_registry) == 11
+
+    def test_split_moves_key(self, site_registry, leaves):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        handle = RecordHandle("bulk.n299")
+        assert handle.get(site_registry) == 299
+        for i in range(300):
+            site_registry.records._values[f"bulk.n299.{i:03}"] = i
+        transaction.commit()
+        assert handle.get(site_registry) == 299
+        assert handle.get(site_registry) == 299
+        assert len(leaves) <= 2
+
+    def test_aborted_split_not_remembered(self, site_registry):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        handle = RecordHandle("bulk.n299.150")
+        for i in range(300):
+            site_registry.records._values[f"bulk.n299.{i:03}"] = i
+        assert handle.get(site_registry) == 150
+        transaction.abort()
+        with pytest.raises(KeyError):
+            handle.get(site_registry)
+
+    def test_missing(self, registry):
+        from plone.registryfromenviron.handles import RecordHandle
+
+        with pytest.raises(KeyError):
+            RecordHandle("no.such").get(registry)
+        assert RecordHandle("no.such", default=1).get(registry) == 1
+
+
+@pytest.fixture
+def utility():
+    """Register registries as the global IRegistry utility for one test."""
+    from plone.registry.interfaces import IRegistry
+    from zope.component import getGlobalSiteManager
+
+    site_manager = getGlobalSiteManager()
+    registered = []
+
+    def _register(registry):
+        site_manager.registerUtility(registry, IRegistry)
+        registered.append(registry)
+
+    yield _register
+    for registry in registered:
+        site_manager.unregisterUtility(registry, IRegistry)
+
+
+class TestHelper:
+    def test_interface_and_current_site(self, utility, registry):
+        from plone.registryfromenviron import handles
+        from zope import schema
+        from zope.interface import Interface
+
+        class ISettings(Interface):
+            textline = schema.TextLine()
+
+        registry.records._fields[f"{ISettings.__identifier__}.textline"] = (
+            reg_field.TextLine()
+        )
+        registry.records._values[f"{ISettings.__identifier__}.textline"] = "set"
+        utility(registry)
+        handle = handles.record_handle("textline", interface=ISettings)
+        assert handle.name == f"{ISettings.__identifier__}.textline"
+        assert handle.value == "set"
+        assert handles.record_handle("nope", default=None).value is None
+
+
+class TestCurrentRegistry:
+    def test_remembered(self, monkeypatch, utility, registry):
+        from plone.registryfromenviron import handles
+        from zope.component.globalregistry import BaseGlobalComponents
+
+        utility(registry)
+        assert handles.current_registry() is registry
+        monkeypatch.setattr(BaseGlobalComponents, "getUtility", pytest.fail)
+        assert handles.current_registry() is registry
+
+    def test_registration_change(self, utility, registry):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import handles
+
+        utility(registry)
+        assert handles.current_registry() is registry
+        other = Registry()
+        utility(other)
+        assert handles.current_registry() is other
+
+    def test_site_manager_change(self, utility, registry):
+        from plone.registry.interfaces import IRegistry
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import handles
+        from zope.component import getGlobalSiteManager
+        from zope.component.globalregistry import BaseGlobalComponents
+        from zope.component.hooks import setSite
+
+        utility(registry)
+        assert handles.current_registry() is registry
+        local = BaseGlobalComponents(bases=(getGlobalSiteManager(),))
+        other = Registry()
+        local.registerUtility(other, IRegistry)
+
+        class Site:
+            def getSiteManager(self):
+                return local
+
+        setSite(Site())
+        try:
+            assert handles.current_registry() is other
+        finally:
+            setSite(None)
+        assert handles.current_registry() is registry
@@ -0,0 +1,156 @@
+"""Tests for type-hinted overrides served without a record."""
+
+from plone.registry.registry import Registry
+
+import pytest
+
+
+@pytest.fixture
+def hinted(_clean_overrides):
+    """Swap in a table with hinted overrides for keys without a record."""
+    from plone.registryfromenviron.environ import OverrideTable
+    from plone.registryfromenviron.environ import swap_overrides
+
+    original = _clean_overrides.RAW_OVERRIDES
+    table = OverrideTable(
+        {
+            "addon.count": "3",
+            "addon.count#type": "int",
+            "addon.ids": '["1", 2]',
+            "addon.ids#type": "json-list:int",
+            "my.number": "5",
+        }
+    )
+    swap_overrides(table)
+    yield table
+    swap_overrides(original)
+
+
+class TestHintField:
+    @pytest.mark.parametrize(
+        "hint, raw, expected",
+        [
+            ("int", "3", 3),
+            ("bool", "on", True),
+            ("json-list", '["a"]', ["a"]),
+            ("json-set:int", '["1", 1]', {1}),
+            ("json-dict:bool", '{"a": "no"}', {"a": False}),
+            ("timedelta", "1:30", 5400.0),
+        ],
+    )
+    def test_coerce(self, hint, raw, expected):
+        from plone.registryfromenviron.coercers import coerce
+        from plone.registryfromenviron.coercers import hint_field
+
+        value = coerce(raw, hint_field(hint))
+        if hint == "timedelta":
+            value = value.total_seconds()
+        assert value == expected
+
+    @pytest.mark.parametrize("hint", ["integer", "int:int", "json-list:nope", 3])
+    def test_unknown(self, hint):
+        from plone.registryfromenviron.coercers import hint_field
+
+        with pytest.raises(ValueError):
+            hint_field(hint)
+
+
+class TestTable:
+    def test_scan(self, monkeypatch):
+        from plone.registryfromenviron.environ import scan_environ
+
+        monkeypatch.setenv("PLONE_REGISTRYTYPE_addon__count", "int")
+        assert scan_environ()["addon.count#type"] == "int"
+
+    def test_coerced_at_construction(self, hinted):
+        assert dict(hinted) == {
+            "addon.count": "3",
+            "addon.ids": '["1", 2]',
+            "my.number": "5",
+        }
+        assert hinted.hints == {"addon.count": "int", "addon.ids": "json-list:int"}
+        assert hinted.virtual == {"addon.count": 3, "addon.ids": [1, 2]}
+
+    def test_invalid_value_and_unknown_hint(self, caplog):
+        from plone.registryfromenviron.environ import OverrideTable
+
+        table = OverrideTable(
+            {"a": "x", "a#type": "int", "b": "1", "b#type": "integer"}
+        )
+        assert table.virtual == {}
+        assert table.hints == {"a": "int"}
+        assert "type hint: a" in caplog.text
+        assert "'integer'" in caplog.text
+
+    def test_change_recoerces(self, hinted):
+        hinted["addon.count"] = "4"
+        assert hinted.virtual["addon.count"] == 4
+
+    def test_scoped_value(self, hinted):
+        from plone.registryfromenviron.environ import OverrideTable
+
+        table = OverrideTable(
+            {"addon.count": "1", "/plone:addon.count": "2", "addon.count#type": "int"}
+        )
+        assert table.virtual == {"addon.count": 1}
+        assert table.for_site("/plone").virtual == {"addon.count": 2}
+
+
+class TestResolve:
+    def test_without_record(self, monkeypatch, hinted, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(registry._records, "_getField", pytest.fail)
+        assert get_override(registry, "addon.count") == 3
+        assert get_override(registry, "addon.ids") == [1, 2]
+
+    def test_hint_wins_over_field(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+
+        original = swap_overrides(
+            OverrideTable({"my.textline": "7", "my.textline#type": "int"})
+        )
+        try:
+            assert get_override(registry, "my.textline") == 7
+        finally:
+            swap_overrides(original)
+
+    def test_compile_applies(self, hinted):
+        from plone.registryfromenviron.environ import compile_overrides
+
+        table, report = compile_overrides(Registry())
+        assert report == {
+            "applied": ["addon.count", "addon.ids"],
+            "unknown": ["my.number"],
+            "invalid": [],
+        }
+        assert table["addon.count"] == 3
+
+
+class TestAccessors:
+    def test_served_without_record(self, hinted, registry, patched):
+        assert registry["addon.count"] == 3
+        assert registry.get("addon.ids") == [1, 2]
+        assert "addon.count" in registry
+        assert "addon.other" not in registry
+        assert "my.textline" in registry
+        assert registry["my.number"] == 5
+
+    def test_proxy_check_passes(self, hinted, registry, patched):
+        from zope import schema
+        from zope.interface import Interface
+
+        class IAddon(Interface):
+            count = schema.Int()
+
+        assert registry.forInterface(IAddon, prefix="addon").count == 3
+
+    def test_default_unchanged(self, _clean_overrides, registry, patched):
+        from plone.registryfromenviron.patch import _originals
+
+        _clean_overrides.RAW_OVERRIDES["addon.count"] = "3"
+        assert registry.get("addon.count", "default") == "default"
+        assert "addon.count" not in registry
+        assert Registry.__contains__ is _originals["__contains__"]
@@ -0,0 +1,354 @@
+"""Tests for materialize mode."""
+
+from plone.registry import field as reg_field
+from plone.registry.interfaces import IRecordModifiedEvent
+from ZODB.POSException import ConflictError
+from zope.component import adapter
+from zope.processlifetime import DatabaseOpenedWithRoot
+
+import json
+import pytest
+import transaction
+
+
+@pytest.fixture
+def materialize(monkeypatch):
+    """The materialize module, enabled."""
+    from plone.registryfromenviron import materialize
+
+    monkeypatch.setattr(materialize, "ENABLED", True)
+    return materialize
+
+
+def _site_value(database, name):
+    connection = database.open()
+    try:
+        registry = connection.root()["Application"].plone.portal_registry
+        return registry.records._values[name]
+    finally:
+        connection.close()
+
+
+class TestMaterializeRegistry:
+    def test_writes_only_differences(
+        self, materialize, _clean_overrides, registry, subscribe
+    ):
+        events = []
+
+        @adapter(IRecordModifiedEvent)
+        def modified(event):
+            events.append(event)
+
+        subscribe(modified)
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"my.number": "5", "my.textline": "original", "my.items": '["a"]'}
+        )
+        report = materialize.materialize_registry(registry)
+        assert report["written"] == ["my.items", "my.number"]
+        assert report["unchanged"] == ["my.textline"]
+        assert registry.records._values["my.number"] == 5
+        assert [event.record.__name__ for event in events] == ["my.items", "my.number"]
+        assert dict(registry._registryfromenviron_owned) == {
+            "my.items": (["a"], []),
+            "my.number": (5, 0),
+            "my.textline": ("original", "original"),
+        }
+        report = materialize.materialize_registry(registry)
+        assert report["written"] == []
+        assert len(events) == 2
+
+    def test_unknown_invalid_and_hinted(self, materialize, _clean_overrides, registry):
+        original = _clean_overrides.swap_overrides(
+            _clean_overrides.OverrideTable(
+                {"my.number": "x", "no.such": "1", "addon.count": "3"}
+                | {"addon.count#type": "int"}
+            )
+        )
+        try:
+            report = materialize.materialize_registry(registry)
+        finally:
+            _clean_overrides.swap_overrides(original)
+        assert report["invalid"] == ["my.number"]
+        assert report["unknown"] == ["addon.count", "no.such"]
+        assert registry.records._values["my.number"] == 0
+
+    def test_drift(self, materialize, _clean_overrides, registry):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        materialize.materialize_registry(registry)
+        registry.records._values["my.number"] = 7
+        assert materialize.drift(registry) == {
+            "my.number": {"materialized": 5, "current": 7}
+        }
+        report = materialize.materialize_registry(registry)
+        assert report["drifted"] == ["my.number"]
+        assert report["written"] == ["my.number"]
+        assert registry.records._values["my.number"] == 5
+        assert materialize.drift(registry) == {}
+
+    def test_removed_override_restores(self, materialize, _clean_overrides, registry):
+        overrides = _clean_overrides.RAW_OVERRIDES
+        overrides.update({"my.number": "5", "my.flag": "true"})
+        materialize.materialize_registry(registry)
+        overrides.update({"my.number": "6"})
+        materialize.materialize_registry(registry)
+        registry.records._values["my.flag"] = False
+        overrides.clear()
+        report = materialize.materialize_registry(registry)
+        assert report["restored"] == ["my.number"]
+        assert report["released"] == ["my.flag"]
+        assert registry.records._values["my.number"] == 0
+        assert registry.records._values["my.flag"] is False
+        assert not registry._registryfromenviron_owned
+
+    def test_dry_run(self, materialize, _clean_overrides, registry):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        report = materialize.materialize_registry(registry, dry_run=True)
+        assert report["written"] == ["my.number"]
+        assert registry.records._values["my.number"] == 0
+        assert not hasattr(registry, "_registryfromenviron_owned")
+
+    def test_frozen_value_policy(
+        self, monkeypatch, materialize, _clean_overrides, registry
+    ):
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "frozen")
+        _clean_overrides.RAW_OVERRIDES.update(
+            {
+                "my.items": '["a"]',
+                "my.tags": '["b"]',
+                "my.mapping": '{"c": "d"}',
+            }
+        )
+        report = materialize.materialize_registry(registry)
+        assert report["written"] == ["my.items", "my.mapping", "my.tags"]
+        assert report["failed"] == []
+        values = registry.records._values
+        assert values["my.items"] == ["a"]
+        assert values["my.tags"] == {"b"}
+        assert values["my.mapping"] == {"c": "d"}
+        assert type(values["my.mapping"]) is dict
+        assert materialize.materialize_registry(registry)["written"] == []
+
+    def test_failed_write_reported(
+        self, monkeypatch, materialize, _clean_overrides, registry
+    ):
+        from zope.schema.interfaces import WrongType
+
+        write = materialize._write
+
+        def refusing(registry, name, value):
+            if name == "my.items":
+                raise WrongType(value, list, name)
+            write(registry, name, value)
+
+        monkeypatch.setattr(materialize, "_write", refusing)
+        _clean_overrides.RAW_OVERRIDES.update({"my.items": '["a"]', "my.number": "5"})
+        report = materialize.materialize_registry(registry)
+        assert report["failed"] == ["my.items"]
+        assert report["written"] == ["my.number"]
+        assert registry.records._values["my.number"] == 5
+        assert "my.items" not in registry._registryfromenviron_owned
+
+    def test_write_bypasses_policy(self, monkeypatch, materialize, patched, registry):
+        from plone.registryfromenviron import records
+
+        monkeypatch.setattr(records, "WRITE_POLICY", "raise")
+        patched.RAW_OVERRIDES["my.number"] = "5"
+        materialize.materialize_registry(registry)
+        assert registry.records._values["my.number"] == 5
+
+
+class TestMaterialize:
+    def test_commits_all_sites(self, materialize, _clean_overrides, database):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        reports = materialize.materialize(database)
+        assert reports["/plone"]["written"] == ["my.number"]
+        assert _site_value(database, "my.number") == 5
+        assert materialize.materialize(database)["/plone"]["written"] == []
+
+    def test_retries_conflict(
+        self, monkeypatch, materialize, _clean_overrides, database
+    ):
+        commit = transaction.TransactionManager.commit
+        calls = []
+
+        def conflicting(self):
+            calls.append(self)
+            if len(calls) == 1:
+                raise ConflictError()
+            return commit(self)
+
+        monkeypatch.setattr(transaction.TransactionManager, "commit", conflicting)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        reports = materialize.materialize(database)
+        assert len(calls) == 2
+        assert reports["/plone"]["written"] == ["my.number"]
+        assert _site_value(database, "my.number") == 5
+
+    def test_gives_up(self, monkeypatch, materialize, _clean_overrides, database):
+        def conflicting(self):
+            raise ConflictError()
+
+        monkeypatch.setattr(transaction.TransactionManager, "commit", conflicting)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        with pytest.raises(ConflictError):
+            materialize.materialize(database, attempts=2)
+        assert _site_value(database, "my.number") == 0
+
+    def test_dry_run_and_unknown_site(self, materialize, _clean_overrides, database):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        reports = materialize.materialize(database, site="plone", dry_run=True)
+        assert reports["/plone"]["written"] == ["my.number"]
+        assert _site_value(database, "my.number") == 0
+        with pytest.raises(KeyError):
+            materialize.materialize(database, site="/nope")
+
+
+class TestStartup:
+    def test_disabled_by_default(
+        self, monkeypatch, materialize, _clean_overrides, database
+    ):
+        monkeypatch.setattr(materialize, "ENABLED", False)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        materialize.materialize_at_startup(DatabaseOpenedWithRoot(database))
+        assert _site_value(database, "my.number") == 0
+
+    def test_writes_and_reports_drift(
+        self, materialize, _clean_overrides, database, caplog
+    ):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        materialize.materialize_at_startup(DatabaseOpenedWithRoot(database))
+        assert _site_value(database, "my.number") == 5
+        connection = database.open()
+        connection.root()["Application"].plone.portal_registry.records._values[
+            "my.number"
+        ] = 7
+        transaction.commit()
+        connection.close()
+        materialize.materialize_at_startup(DatabaseOpenedWithRoot(database))
+        assert "changed in ZODB since materialized in /plone: my.number" in (
+            caplog.text
+        )
+        assert _site_value(database, "my.number") == 5
+
+    def test_patch_not_applied(self, materialize, _clean_overrides):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import _maybe_activate
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        getitem = Registry.__getitem__
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        try:
+            _maybe_activate()
+            assert Registry.__getitem__ is getitem
+        finally:
+            unpatch()
+
+    def test_memo_wraps_without_overrides(
+        self, monkeypatch, materialize, _clean_overrides, registry
+    ):
+        from plone.registry.registry import _Records
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import _maybe_activate
+        from plone.registryfromenviron import memo
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        monkeypatch.setattr(memo, "ENABLED", True)
+        for_interface = Registry.forInterface
+        records_getitem = _Records.__getitem__
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        try:
+            _maybe_activate()
+            assert _originals
+            assert Registry.forInterface is for_interface
+            assert _Records.__getitem__ is records_getitem
+            assert registry["my.number"] == 0
+            assert registry.records["my.number"].value == 0
+        finally:
+            unpatch()
+
+    def test_reload_does_not_look_up(self, materialize, patched, registry):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron.patch import rebind
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        getitem = Registry.__getitem__
+        patched.RAW_OVERRIDES["my.number"] = "5"
+        rebind()
+        assert registry["my.number"] == 0
+        assert registry.get("my.number") == 0
+        rebind()
+        assert registry["my.number"] == 0
+        unpatch()
+        assert Registry.__getitem__ is getitem
+
+
+class TestMain:
+    @pytest.fixture
+    def zope(self, monkeypatch, database):
+        """Let ``main`` open ``database`` instead of configuring Zope."""
+        from plone.registryfromenviron import startup
+        from zope.event import notify
+        from Zope2.Startup import run
+
+        import Zope2
+
+        monkeypatch.setattr(startup, "SCRIPT", False)
+        monkeypatch.setattr(
+            run,
+            "make_wsgi_app",
+            lambda config, path: notify(DatabaseOpenedWithRoot(database)),
+        )
+        monkeypatch.setattr(Zope2, "app", lambda: database.open().root()["Application"])
+        return database
+
+    def test_check(self, zope, materialize, _clean_overrides, capsys):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert materialize.main(["zope.conf", "--check"]) == 1
+        document = json.loads(capsys.readouterr().out)
+        assert document["sites"]["/plone"]["written"] == ["my.number"]
+        assert document["drift"] == {"/plone": {}}
+        assert _site_value(zope, "my.number") == 0
+
+    def test_check_skips_startup_subscribers(
+        self, monkeypatch, zope, materialize, _clean_overrides, subscribe, capsys
+    ):
+        from plone.registryfromenviron import startup
+        from plone.registryfromenviron import warmup
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "strict")
+        monkeypatch.setattr(warmup, "ENABLED", True)
+        monkeypatch.setattr(warmup, "REPORT", None)
+        subscribe(
+            materialize.materialize_at_startup,
+            warmup.warm_up_database,
+            startup.eager_compile,
+        )
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "5", "no.such": "1"})
+        assert materialize.main(["zope.conf", "--check"]) == 1
+        assert _site_value(zope, "my.number") == 0
+        assert warmup.REPORT is None
+
+    def test_write(self, zope, materialize, _clean_overrides, capsys):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert materialize.main(["zope.conf"]) == 0
+        assert _site_value(zope, "my.number") == 5
+        assert materialize.main(["zope.conf", "--check"]) == 0
+
+    def test_unknown_site_exits(self, zope, materialize, capsys):
+        with pytest.raises(SystemExit) as exc:
+            materialize.main(["zope.conf", "--site", "/nope"])
+        assert exc.value.code == 2
+
+
+def test_field_validates(materialize, _clean_overrides, registry):
+    """Writes go through the field, like ``registry[name] = value``."""
+    from zope.schema.interfaces import TooLong
+
+    registry.records._fields["my.short"] = reg_field.TextLine(max_length=2)
+    registry.records._values["my.short"] = ""
+    with pytest.raises(TooLong):
+        materialize._write(registry, "my.short", "toolong")
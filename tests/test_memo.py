@@ -0,0 +1,124 @@
+"""Tests for the request-scoped registry read memo."""
+
+from zope.globalrequest import clearRequest
+from zope.globalrequest import setRequest
+
+import pytest
+
+
+class _Request:
+    def __init__(self):
+        self.other = {}
+
+
+class _CountingValues(dict):
+    """Stands in for the ``_values`` BTree and counts lookups."""
+
+    lookups = 0
+
+    def __getitem__(self, name):
+        self.lookups += 1
+        return super().__getitem__(name)
+
+    def get(self, name, default=None):
+        self.lookups += 1
+        return super().get(name, default)
+
+
+@pytest.fixture
+def memo_patched(monkeypatch, patched):
+    from plone.registryfromenviron import memo
+    from plone.registryfromenviron.patch import rebind
+
+    monkeypatch.setattr(memo, "ENABLED", True)
+    rebind()
+    request = _Request()
+    setRequest(request)
+    yield request
+    clearRequest()
+
+
+@pytest.fixture
+def counted(registry):
+    values = _CountingValues(registry._records._values.items())
+    registry._records._values = values
+    return values
+
+
+class TestRequestMemo:
+    def test_repeated_reads_hit_zodb_once(self, memo_patched, registry, counted):
+        for _ in range(5):
+            assert registry["my.textline"] == "original"
+            assert registry.get("my.textline") == "original"
+        assert counted.lookups == 1
+
+    def test_memo_per_registry(self, memo_patched, registry):
+        from plone.registry.registry import Registry
+
+        other = Registry()
+        other._records._fields["my.textline"] = registry._records._fields["my.textline"]
+        other._records._values["my.textline"] = "other"
+        assert registry["my.textline"] == "original"
+        assert other["my.textline"] == "other"
+
+    def test_missing_keys(self, memo_patched, registry):
+        assert registry.get("no.such.key", "default") == "default"
+        assert registry.get("no.such.key") is None
+        with pytest.raises(KeyError):
+            registry["no.such.key"]
+
+    def test_overrides_not_memoized(self, memo_patched, registry, _clean_overrides):
+        from plone.registryfromenviron.memo import request_memo
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert registry["my.number"] == 5
+        assert "my.number" not in request_memo(registry)
+
+    def test_no_request_no_memo(self, memo_patched, registry, counted):
+        clearRequest()
+        registry["my.textline"]
+        registry["my.textline"]
+        assert counted.lookups == 2
+
+    def test_write_invalidates(self, memo_patched, registry, subscribe):
+        from plone.registryfromenviron.memo import invalidate_memo
+
+        subscribe(invalidate_memo)
+        assert registry["my.textline"] == "original"
+        registry["my.textline"] = "changed"
+        assert registry["my.textline"] == "changed"
+        registry.records["my.textline"].value = "again"
+        assert registry.get("my.textline") == "again"
+
+    def test_removal_invalidates(self, memo_patched, registry, subscribe):
+        from plone.registryfromenviron.memo import invalidate_memo
+
+        subscribe(invalidate_memo)
+        assert registry["my.textline"] == "original"
+        del registry.records["my.textline"]
+        assert registry.get("my.textline") is None
+
+    def test_memo_lives_in_request_other(self, memo_patched, registry):
+        from plone.registryfromenviron.memo import MEMO_KEY
+
+        registry["my.textline"]
+        assert list(memo_patched.other[MEMO_KEY].values()) == [
+            {"my.textline": "original"}
+        ]
+
+
+class TestActivation:
+    def test_memo_alone_activates_patch(self, monkeypatch, _clean_overrides):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import _maybe_activate
+        from plone.registryfromenviron import memo
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        original = Registry.get
+        monkeypatch.setattr(memo, "ENABLED", True)
+        try:
+            _maybe_activate()
+            assert Registry.get is not original
+        finally:
+            unpatch()
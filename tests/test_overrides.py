@@ -1,71 +1,11 @@
 """Tests for plone.registryfromenviron."""
 
 from plone.registry import field as reg_field
-from plone.registry.registry import Registry
 
+import logging
 import pytest
-
-
-# ── Fixtures ──────────────────────────────────────────────────────
-
-
-@pytest.fixture(autouse=True)
-def _clean_overrides():
-    """Reset module-level override dicts before/after each test."""
-    from plone.registryfromenviron import environ
-
-    orig_raw = environ.RAW_OVERRIDES.copy()
-    orig_coerced = environ._COERCED.copy()
-    environ.RAW_OVERRIDES.clear()
-    environ._COERCED.clear()
-    yield environ
-    environ.RAW_OVERRIDES.clear()
-    environ.RAW_OVERRIDES.update(orig_raw)
-    environ._COERCED.clear()
-    environ._COERCED.update(orig_coerced)
-
-
-@pytest.fixture
-def registry():
-    """A plain plone.registry Registry with test records for each field type."""
-    reg = Registry()
-    reg._records._fields["my.textline"] = reg_field.TextLine(title="A text")
-    reg._records._values["my.textline"] = "original"
-    reg._records._fields["my.text"] = reg_field.Text(title="A text block")
-    reg._records._values["my.text"] = "original text"
-    reg._records._fields["my.number"] = reg_field.Int(title="A number")
-    reg._records._values["my.number"] = 0
-    reg._records._fields["my.flag"] = reg_field.Bool(title="A flag")
-    reg._records._values["my.flag"] = False
-    reg._records._fields["my.rate"] = reg_field.Float(title="A rate")
-    reg._records._values["my.rate"] = 0.0
-    reg._records._fields["my.items"] = reg_field.List(
-        title="Items",
-        value_type=reg_field.TextLine(),
-    )
-    reg._records._values["my.items"] = []
-    reg._records._fields["my.pair"] = reg_field.Tuple(
-        title="Pair",
-        value_type=reg_field.TextLine(),
-    )
-    reg._records._values["my.pair"] = ()
-    reg._records._fields["my.tags"] = reg_field.Set(
-        title="Tags",
-        value_type=reg_field.TextLine(),
-    )
-    reg._records._values["my.tags"] = set()
-    reg._records._fields["my.frozen"] = reg_field.FrozenSet(
-        title="Frozen",
-        value_type=reg_field.TextLine(),
-    )
-    reg._records._values["my.frozen"] = frozenset()
-    reg._records._fields["my.mapping"] = reg_field.Dict(
-        title="Mapping",
-        key_type=reg_field.TextLine(),
-        value_type=reg_field.TextLine(),
-    )
-    reg._records._values["my.mapping"] = {}
-    return reg
+import threading
+import time
 
 
 # ── coerce_value tests ───────────────────────────────────────────
@@ -194,10 +134,11 @@ class TestGetOverride:
     def test_override_cached_on_second_call(self, _clean_overrides, registry):
         from plone.registryfromenviron.environ import _COERCED
         from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import registry_key
 
         _clean_overrides.RAW_OVERRIDES["my.number"] = "99"
         assert get_override(registry, "my.number") == 99
-        assert "my.number" in _COERCED
+        assert "my.number" in _COERCED[registry_key(registry)]
         # second call hits cache
         assert get_override(registry, "my.number") == 99
 
@@ -226,6 +167,389 @@ class TestGetOverride:
         assert get_override(registry, "my.alias") == 77
 
 
+class TestCoercionCache:
+    """The coercion cache is per registry and follows field changes."""
+
+    def test_registries_do_not_share_values(self, _clean_overrides, registry):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron.environ import get_override
+
+        other = Registry()
+        other._records._fields["my.number"] = reg_field.TextLine()
+        other._records._values["my.number"] = "0"
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        assert get_override(registry, "my.number") == 7
+        assert get_override(other, "my.number") == "7"
+
+    def test_persistent_key_is_shared_across_connections(self):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron.environ import registry_key
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        import transaction
+
+        db = DB(MappingStorage())
+        try:
+            conn1 = db.open()
+            conn1.root()["registry"] = Registry()
+            transaction.commit()
+            conn2 = db.open()
+            reg1 = conn1.root()["registry"]
+            reg2 = conn2.root()["registry"]
+            assert reg1 is not reg2
+            assert registry_key(reg1) == registry_key(reg2)
+            assert registry_key(reg1) == ("unnamed", reg1._p_oid)
+        finally:
+            transaction.abort()
+            db.close()
+
+    def test_changed_field_invalidates(self, _clean_overrides, registry, subscribe):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+
+        subscribe(invalidate_added)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        assert get_override(registry, "my.number") == 7
+        registry.records["my.number"] = Record(reg_field.TextLine(), "0")
+        assert get_override(registry, "my.number") == "7"
+
+    def test_same_field_keeps_entry(self, _clean_overrides, registry, subscribe):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import _COERCED
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+        from plone.registryfromenviron.environ import registry_key
+
+        subscribe(invalidate_added)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        get_override(registry, "my.number")
+        entry = _COERCED[registry_key(registry)]["my.number"]
+        registry.records["my.number"] = Record(reg_field.Int(), 1)
+        assert _COERCED[registry_key(registry)]["my.number"] is entry
+
+    def test_removed_record_invalidates(self, _clean_overrides, registry, subscribe):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_removed
+
+        subscribe(invalidate_removed)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        assert get_override(registry, "my.number") == 7
+        del registry.records["my.number"]
+        assert get_override(registry, "my.number") is _MARKER
+
+    def test_bounded_number_of_registries(self, monkeypatch, _clean_overrides):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import environ
+
+        monkeypatch.setattr(environ, "MAX_REGISTRIES", 2)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        registries = []
+        for _ in range(5):
+            reg = Registry()
+            reg._records._fields["my.number"] = reg_field.Int()
+            reg._records._values["my.number"] = 0
+            registries.append(reg)
+            assert environ.get_override(reg, "my.number") == 7
+        assert len(environ._COERCED) == 2
+
+
+class TestNegativeCache:
+    """Unknown keys and invalid values are cached and logged rate-limited."""
+
+    @pytest.fixture
+    def calls(self, monkeypatch, _clean_overrides):
+        calls = []
+        original = _clean_overrides._coerce_override
+
+        def counting(registry, name, overrides):
+            calls.append(name)
+            return original(registry, name, overrides)
+
+        monkeypatch.setattr(_clean_overrides, "_coerce_override", counting)
+        return calls
+
+    def test_unknown_key_resolved_once(self, calls, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES["no.such.key"] = "x"
+        for _ in range(3):
+            assert get_override(registry, "no.such.key") is _MARKER
+        assert calls == ["no.such.key"]
+
+    def test_invalid_value_coerced_once(self, calls, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "nope"
+        for _ in range(3):
+            assert get_override(registry, "my.number") is _MARKER
+        assert calls == ["my.number"]
+
+    def test_retry_after_interval(self, monkeypatch, calls, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(_clean_overrides, "RETRY_INTERVAL", 0)
+        _clean_overrides.RAW_OVERRIDES["my.later"] = "5"
+        get_override(registry, "my.later")
+        registry._records._fields["my.later"] = reg_field.Int()
+        registry._records._values["my.later"] = 0
+        assert get_override(registry, "my.later") == 5
+        assert calls == ["my.later", "my.later"]
+
+    def test_added_record_retries_at_once(self, _clean_overrides, registry, subscribe):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+
+        subscribe(invalidate_added)
+        _clean_overrides.RAW_OVERRIDES["my.later"] = "5"
+        assert get_override(registry, "my.later") is _MARKER
+        registry.records["my.later"] = Record(reg_field.Int(), 0)
+        assert get_override(registry, "my.later") == 5
+
+    def test_changed_field_retries_invalid_value(
+        self, _clean_overrides, registry, subscribe
+    ):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+
+        subscribe(invalidate_added)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "many"
+        assert get_override(registry, "my.number") is _MARKER
+        registry.records["my.number"] = Record(reg_field.TextLine(), "0")
+        assert get_override(registry, "my.number") == "many"
+
+    def test_log_is_rate_limited(self, monkeypatch, caplog, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(_clean_overrides, "RETRY_INTERVAL", 0)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "nope"
+        with caplog.at_level(logging.WARNING, "plone.registryfromenviron.environ"):
+            for _ in range(5):
+                get_override(registry, "my.number")
+            assert len(caplog.records) == 1
+            assert caplog.records[0].exc_info
+            monkeypatch.setattr(_clean_overrides, "LOG_INTERVAL", 0)
+            _clean_overrides._LOGGED["my.number"][0] = 0
+            get_override(registry, "my.number")
+        assert len(caplog.records) == 2
+        assert "(4 more failures since last logged)" in caplog.records[1].message
+        assert not caplog.records[1].exc_info
+
+    def test_fallbacks_counted_per_read(self, monkeypatch, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.stats import KeyStats
+
+        monkeypatch.setattr(_clean_overrides, "STATS", KeyStats())
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "nope"
+        for _ in range(3):
+            get_override(registry, "my.number")
+        counters = _clean_overrides.STATS.snapshot()["my.number"]
+        assert counters["fallbacks"] == 3
+        assert counters["coercion_failures"] == 1
+
+    def test_compile_caches_failures(self, calls, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import compile_overrides
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "x", "no.such": "y"})
+        table, _ = compile_overrides(registry)
+        assert dict(table) == {}
+        assert get_override(registry, "my.number") is _MARKER
+        assert get_override(registry, "no.such") is _MARKER
+        assert sorted(calls) == ["my.number", "no.such"]
+
+
+_POLICY_CASES = [
+    # key, raw override, expected value (shared), expected value (frozen)
+    ("my.textline", "hello", "hello", "hello"),
+    ("my.text", "multi\nline", "multi\nline", "multi\nline"),
+    ("my.number", "42", 42, 42),
+    ("my.flag", "on", True, True),
+    ("my.rate", "2.5", 2.5, 2.5),
+    ("my.items", '["a", "b"]', ["a", "b"], ("a", "b")),
+    ("my.pair", '["a", "b"]', ("a", "b"), ("a", "b")),
+    ("my.tags", '["a", "b"]', {"a", "b"}, frozenset({"a", "b"})),
+    ("my.frozen", '["a", "b"]', frozenset({"a", "b"}), frozenset({"a", "b"})),
+    ("my.mapping", '{"k": "v"}', {"k": "v"}, {"k": "v"}),
+]
+
+
+class TestSingleFlight:
+    """Concurrent misses of one key coerce it once."""
+
+    def _race(self, monkeypatch, environ, registry, name, threads=8):
+        started = threading.Barrier(threads)
+        calls = []
+        original = environ.coerce_value
+
+        def slow(raw, field):
+            calls.append(raw)
+            time.sleep(0.01)
+            return original(raw, field)
+
+        def read():
+            started.wait()
+            results.append(environ.get_override(registry, name))
+
+        monkeypatch.setattr(environ, "coerce_value", slow)
+        results = []
+        workers = [threading.Thread(target=read) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return calls, results
+
+    def test_coerced_once(self, monkeypatch, _clean_overrides, registry):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "7"
+        calls, results = self._race(
+            monkeypatch, _clean_overrides, registry, "my.number"
+        )
+        assert calls == ["7"]
+        assert results == [7] * 8
+        assert not _clean_overrides._IN_FLIGHT
+
+    def test_failure_logged_once(self, monkeypatch, caplog, _clean_overrides, registry):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "nope"
+        calls, results = self._race(
+            monkeypatch, _clean_overrides, registry, "my.number"
+        )
+        assert calls == ["nope"]
+        assert all(result is _clean_overrides._MARKER for result in results)
+        assert caplog.text.count("Invalid env override value for key") == 1
+
+
+class TestValuePolicy:
+    """VALUE_POLICY controls whether callers can mutate cached overrides."""
+
+    @pytest.mark.parametrize("key, raw, shared, frozen", _POLICY_CASES)
+    def test_shared(
+        self, monkeypatch, _clean_overrides, registry, key, raw, shared, frozen
+    ):
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "shared")
+        _clean_overrides.RAW_OVERRIDES[key] = raw
+        first = get_override(registry, key)
+        assert first == shared
+        assert type(first) is type(shared)
+        assert get_override(registry, key) is first
+
+    @pytest.mark.parametrize("key, raw, shared, frozen", _POLICY_CASES)
+    def test_frozen(
+        self, monkeypatch, _clean_overrides, registry, key, raw, shared, frozen
+    ):
+        from collections.abc import Hashable
+        from collections.abc import MutableMapping
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "frozen")
+        _clean_overrides.RAW_OVERRIDES[key] = raw
+        value = get_override(registry, key)
+        assert value == frozen
+        assert get_override(registry, key) is value
+        if isinstance(frozen, dict):
+            assert not isinstance(value, MutableMapping)
+            with pytest.raises(TypeError):
+                value["k"] = "changed"
+        else:
+            assert isinstance(value, Hashable)
+
+    @pytest.mark.parametrize("key, raw, shared, frozen", _POLICY_CASES)
+    def test_copy(
+        self, monkeypatch, _clean_overrides, registry, key, raw, shared, frozen
+    ):
+        from plone.registryfromenviron.environ import get_override
+
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "copy")
+        _clean_overrides.RAW_OVERRIDES[key] = raw
+        first = get_override(registry, key)
+        assert first == shared
+        assert type(first) is type(shared)
+        if isinstance(first, (list, set, dict)):
+            assert get_override(registry, key) is not first
+            first.clear()
+            assert get_override(registry, key) == shared
+
+    def test_frozen_nested(self):
+        from plone.registryfromenviron.environ import freeze
+
+        value = freeze({"a": [1, {"b": [2]}], "c": {3}})
+        assert value == {"a": (1, {"b": (2,)}), "c": frozenset({3})}
+        with pytest.raises(TypeError):
+            value["a"][1]["b"] = ()
+
+    def test_copy_nested_is_deep(self, monkeypatch, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        registry._records._fields["my.nested"] = reg_field.Dict(
+            key_type=reg_field.TextLine(),
+            value_type=reg_field.List(value_type=reg_field.TextLine()),
+        )
+        registry._records._values["my.nested"] = {}
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", "copy")
+        _clean_overrides.RAW_OVERRIDES["my.nested"] = '{"k": ["v"]}'
+        get_override(registry, "my.nested")["k"].append("w")
+        assert get_override(registry, "my.nested") == {"k": ["v"]}
+
+
+class TestPrefixIndex:
+    """RAW_OVERRIDES answers prefix queries from a sorted key index."""
+
+    def test_under_prefix(self, _clean_overrides):
+        from plone.registryfromenviron.environ import overrides_under
+
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"b.x": "1", "a.y": "2", "a.x": "3", "ab.z": "4", "a": "5"}
+        )
+        assert overrides_under("a.") == ["a.x", "a.y"]
+        assert overrides_under("a") == ["a", "a.x", "a.y", "ab.z"]
+        assert overrides_under("c.") == []
+        assert overrides_under("") == ["a", "a.x", "a.y", "ab.z", "b.x"]
+
+    def test_mutation_rebuilds_index(self, _clean_overrides):
+        from plone.registryfromenviron.environ import overrides_under
+
+        overrides = _clean_overrides.RAW_OVERRIDES
+        generation = overrides.generation
+        overrides["a.x"] = "1"
+        assert overrides_under("a.") == ["a.x"]
+        overrides["a.y"] = "2"
+        assert overrides_under("a.") == ["a.x", "a.y"]
+        del overrides["a.x"]
+        assert overrides_under("a.") == ["a.y"]
+        overrides.pop("a.y")
+        assert overrides_under("a.") == []
+        assert overrides.generation == generation + 4
+
+    def test_get_overrides(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_overrides
+
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"my.number": "7", "my.flag": "yes", "my.rate": "fast", "my.none": "1"}
+        )
+        values = get_overrides(
+            registry, ["my.number", "my.flag", "my.rate", "my.none", "my.text"]
+        )
+        assert values == {"my.number": 7, "my.flag": True}
+
+    def test_get_overrides_under(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_overrides_under
+
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "7", "other.key": "x"})
+        assert get_overrides_under(registry, "my.") == {"my.number": 7}
+        assert get_overrides_under(registry, "other.") == {}
+
+
 # ── patch tests ──────────────────────────────────────────────────
 
 
@@ -270,18 +594,121 @@ class TestPatch:
         unpatch()  # still safe
 
 
-class TestPatchedRegistry:
-    """Test the patched Registry behavior — replaces v1.x TestEnvOverrideRegistry."""
+class TestSpecializedAccessors:
+    """The patched accessors bind their collaborators at apply time."""
 
-    @pytest.fixture
-    def patched(self, _clean_overrides):
-        """Apply the patch for the duration of the test."""
+    def test_no_global_lookups(self, _clean_overrides):
+        from plone.registry.registry import Registry as BaseRegistry
         from plone.registryfromenviron.patch import apply_patch
         from plone.registryfromenviron.patch import unpatch
 
-        apply_patch()
-        yield _clean_overrides
         unpatch()
+        try:
+            apply_patch()
+            for accessor in (BaseRegistry.__getitem__, BaseRegistry.get):
+                assert accessor.__code__.co_names == ()
+                assert _clean_overrides.RAW_OVERRIDES in [
+                    cell.cell_contents for cell in accessor.__closure__
+                ]
+        finally:
+            unpatch()
+
+    def test_miss_does_not_resolve(self, monkeypatch, _clean_overrides, registry):
+        from plone.registryfromenviron.patch import apply_patch
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        calls = []
+        monkeypatch.setattr(
+            "plone.registryfromenviron.patch.resolve_override",
+            lambda registry, name, overrides: calls.append(name),
+        )
+        try:
+            apply_patch()
+            _clean_overrides.RAW_OVERRIDES["my.number"] = "1"
+            assert registry["my.textline"] == "original"
+            assert registry.get("my.textline") == "original"
+            assert calls == []
+            registry.get("my.number")
+            assert calls == ["my.number"]
+        finally:
+            unpatch()
+
+
+class TestRetirePatch:
+    def _reports(self, **per_site):
+        base = {"applied": [], "unknown": [], "invalid": []}
+        return {path: dict(base, **report) for path, report in per_site.items()}
+
+    def test_all_invalid_unpatches(self, patched):
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import retire_if_all_invalid
+
+        reports = self._reports(a={"invalid": ["x"]}, b={"invalid": ["x"]})
+        assert retire_if_all_invalid(reports) is True
+        assert not _originals
+
+    @pytest.mark.parametrize("feature", ["memo", "cache", "profile"])
+    def test_all_invalid_keeps_read_features(
+        self, monkeypatch, patched, registry, feature
+    ):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron import patch
+
+        import importlib
+
+        module = importlib.import_module(f"plone.registryfromenviron.{feature}")
+        monkeypatch.setattr(module, "ENABLED", True)
+        patch.rebind()
+        patched.RAW_OVERRIDES["my.number"] = "x"
+        reports = self._reports(a={"invalid": ["my.number"]})
+        assert patch.retire_if_all_invalid(reports) is True
+        assert patch._originals
+        assert Registry.get is not patch._originals["get"]
+        assert Registry.forInterface is patch._originals["forInterface"]
+        monkeypatch.setattr(patch, "resolve_override", pytest.fail)
+        assert registry["my.number"] == registry.get("my.number") == 0
+
+    @pytest.mark.parametrize(
+        "report",
+        [{"applied": ["x"]}, {"unknown": ["x"]}],
+    )
+    def test_keeps_patch_when_anything_may_apply(self, patched, report):
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import retire_if_all_invalid
+
+        reports = self._reports(a={"invalid": ["x"]}, b=report)
+        assert retire_if_all_invalid(reports) is False
+        assert _originals
+
+    def test_retires_once(self, monkeypatch, patched):
+        from plone.registryfromenviron import memo
+        from plone.registryfromenviron import patch
+
+        monkeypatch.setattr(memo, "ENABLED", True)
+        patch.rebind()
+        reports = self._reports(a={"invalid": ["x"]})
+        assert patch.retire_if_all_invalid(reports) is True
+        assert patch.retire_if_all_invalid(reports) is False
+        assert patch._originals
+
+    def test_nothing_invalid_keeps_patch(self, patched):
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import retire_if_all_invalid
+
+        assert retire_if_all_invalid(self._reports(a={}, b={})) is False
+        assert _originals
+
+    def test_no_sites_keeps_patch(self, patched):
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import retire_if_all_invalid
+
+        assert retire_if_all_invalid({}) is False
+        assert _originals
+
+
+class TestPatchedRegistry:
+    """Test the patched Registry behavior — replaces v1.x TestEnvOverrideRegistry."""
 
     def test_getitem_with_override(self, patched, registry):
         patched.RAW_OVERRIDES["my.textline"] = "from_env"
@@ -323,6 +750,39 @@ class TestPatchedRegistry:
         patched.RAW_OVERRIDES["my.mapping"] = '{"a": "1"}'
         assert registry["my.mapping"] == {"a": "1"}
 
+    def test_record_value_with_override(self, patched, registry):
+        from plone.registryfromenviron.records import OverrideRecord
+
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        record = registry.records["my.number"]
+        assert type(record) is OverrideRecord
+        assert record.value == 42
+        assert registry.records.get("my.number").value == 42
+        assert dict(registry.records.items())["my.number"].value == 42
+
+    def test_record_without_override_is_plain(self, patched, registry):
+        from plone.registry.record import Record
+
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        record = registry.records["my.textline"]
+        assert type(record) is Record
+        assert record.value == "original"
+
+    def test_record_invalid_override_falls_back(self, patched, registry):
+        patched.RAW_OVERRIDES["my.number"] = "many"
+        assert registry.records["my.number"].value == 0
+
+    def test_record_write_goes_to_zodb(self, patched, registry):
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        registry.records["my.number"].value = 7
+        assert registry.records._values["my.number"] == 7
+        assert registry.records["my.number"].value == 42
+
+    def test_record_missing_raises(self, patched, registry):
+        patched.RAW_OVERRIDES["no.such.key"] = "x"
+        with pytest.raises(KeyError):
+            registry.records["no.such.key"]
+
     def test_patch_affects_app_registry_subclass(self, patched):
         """plone.app.registry.registry.Registry inherits the patched methods."""
         from plone.app.registry.registry import Registry as AppRegistry
@@ -332,6 +792,203 @@ class TestPatchedRegistry:
         assert AppRegistry.get is BaseRegistry.get
 
 
+class TestWritePolicy:
+    """Writes to overridden keys follow records.WRITE_POLICY."""
+
+    @pytest.fixture
+    def policy(self, monkeypatch):
+        from plone.registryfromenviron import records
+
+        def _policy(name):
+            monkeypatch.setattr(records, "WRITE_POLICY", name)
+
+        return _policy
+
+    def test_passthrough_is_default(self, patched, registry):
+        from plone.registryfromenviron import records
+
+        assert records.WRITE_POLICY == "passthrough"
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        registry["my.number"] = 7
+        assert registry.records._values["my.number"] == 7
+
+    def test_skip(self, patched, policy, registry, subscribe):
+        from plone.registry.interfaces import IRecordModifiedEvent
+        from zope.component import adapter
+
+        events = []
+
+        @adapter(IRecordModifiedEvent)
+        def modified(event):
+            events.append(event)
+
+        subscribe(modified)
+        policy("skip")
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        registry["my.number"] = 7
+        registry.records["my.number"].value = 8
+        assert registry.records._values["my.number"] == 0
+        assert registry["my.number"] == 42
+        assert events == []
+
+    def test_raise(self, patched, policy, registry):
+        from plone.registryfromenviron.records import OverriddenRecordError
+
+        policy("raise")
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        with pytest.raises(OverriddenRecordError, match=r"my\.number"):
+            registry["my.number"] = 7
+        with pytest.raises(OverriddenRecordError):
+            registry.records["my.number"].value = 7
+        assert registry.records._values["my.number"] == 0
+
+    def test_other_keys_are_written(self, patched, policy, registry):
+        policy("raise")
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        registry["my.textline"] = "changed"
+        assert registry["my.textline"] == "changed"
+
+    def test_invalid_override_is_written(self, patched, policy, registry):
+        policy("raise")
+        patched.RAW_OVERRIDES["my.number"] = "many"
+        registry["my.number"] = 7
+        assert registry["my.number"] == 7
+
+    @pytest.mark.parametrize("name, writes", [("passthrough", True), ("skip", False)])
+    def test_control_panel_save(self, patched, policy, database, name, writes):
+        from zope import schema
+        from zope.interface import Interface
+
+        import transaction
+
+        class ISettings(Interface):
+            number = schema.Int(title="A number")
+
+        policy(name)
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        connection = database.open()
+        try:
+            registry = connection.root()["Application"].plone.portal_registry
+            settings = registry.forInterface(ISettings, prefix="my")
+            before = database.lastTransaction()
+            # What a control panel save does for every changed field.
+            for value in (1, 2, 3):
+                settings.number = value
+                transaction.commit()
+            assert settings.number == 42
+            stored = [
+                len(list(txn))
+                for txn in database.storage.iterator(before)
+                if txn.tid != before
+            ]
+            # One transaction storing the registry's values BTree per save.
+            assert stored == ([1, 1, 1] if writes else [])
+        finally:
+            transaction.abort()
+            connection.close()
+
+
+class TestRegistryMaintenance:
+    """registerInterface and registry.xml imports keep the ZODB values."""
+
+    @pytest.fixture
+    def persistent_fields(self):
+        """Register plone.registry's persistent field adapter."""
+        from plone.registry.fieldfactory import persistentFieldAdapter
+        from zope.component import getGlobalSiteManager
+
+        registry = getGlobalSiteManager()
+        registry.registerAdapter(persistentFieldAdapter)
+        yield
+        registry.unregisterAdapter(persistentFieldAdapter)
+
+    @pytest.fixture
+    def settings(self, persistent_fields, patched, registry):
+        from zope import schema
+        from zope.interface import Interface
+
+        class ISettings(Interface):
+            smtp_host = schema.TextLine(default="")
+            hosts = schema.List(value_type=schema.TextLine(), default=[])
+            headers = schema.Dict(
+                key_type=schema.TextLine(),
+                value_type=schema.TextLine(),
+                default={},
+            )
+
+        registry.registerInterface(ISettings)
+        prefix = ISettings.__identifier__
+        values = registry.records._values
+        values[f"{prefix}.smtp_host"] = "stored.example.com"
+        values[f"{prefix}.hosts"] = ["stored-a", "stored-b"]
+        values[f"{prefix}.headers"] = {"a": "stored"}
+        patched.RAW_OVERRIDES.update(
+            {
+                f"{prefix}.smtp_host": "secret.example.com",
+                f"{prefix}.hosts": '["env"]',
+                f"{prefix}.headers": '{"b": "env"}',
+            }
+        )
+        return ISettings
+
+    @pytest.mark.parametrize("policy", ["shared", "frozen"])
+    def test_register_interface(
+        self, monkeypatch, _clean_overrides, settings, registry, policy
+    ):
+        monkeypatch.setattr(_clean_overrides, "VALUE_POLICY", policy)
+        prefix = settings.__identifier__
+        assert registry[f"{prefix}.smtp_host"] == "secret.example.com"
+        registry.registerInterface(settings)
+        values = registry.records._values
+        assert values[f"{prefix}.smtp_host"] == "stored.example.com"
+        assert values[f"{prefix}.hosts"] == ["stored-a", "stored-b"]
+        assert registry[f"{prefix}.smtp_host"] == "secret.example.com"
+        assert list(registry[f"{prefix}.hosts"]) == ["env"]
+
+    def test_registry_xml_import(self, settings, registry):
+        from plone.app.registry.exportimport.handler import RegistryImporter
+
+        class Environ:
+            def getLogger(self, name):
+                return logging.getLogger(name)
+
+            def shouldPurge(self):
+                return False
+
+        prefix = settings.__identifier__
+        coerced = registry[f"{prefix}.headers"]
+        RegistryImporter(registry, Environ()).importDocument(
+            f"""<registry>
+              <record name="{prefix}.headers">
+                <value purge="false"><element key="c">profile</element></value>
+              </record>
+              <record name="{prefix}.hosts">
+                <value purge="false"><element>profile</element></value>
+              </record>
+            </registry>"""
+        )
+        values = registry.records._values
+        assert values[f"{prefix}.headers"] == {"a": "stored", "c": "profile"}
+        assert values[f"{prefix}.hosts"] == ["stored-a", "stored-b", "profile"]
+        assert coerced == {"b": "env"}
+        assert registry[f"{prefix}.headers"] == {"b": "env"}
+
+    def test_unpatch_restores(self, patched):
+        from plone.app.registry.exportimport.handler import RegistryExporter
+        from plone.app.registry.exportimport.handler import RegistryImporter
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import unpatch
+
+        register = _originals["Registry.registerInterface"]
+        import_document = _originals["RegistryImporter.importDocument"]
+        export_document = _originals["RegistryExporter.exportDocument"]
+        unpatch()
+        assert Registry.registerInterface is register
+        assert RegistryImporter.importDocument is import_document
+        assert RegistryExporter.exportDocument is export_document
+
+
 # ── EnvOverrideRegistry alias tests ─────────────────────────────
 
 
@@ -0,0 +1,209 @@
+"""Tests for pattern overrides."""
+
+from plone.registry import field as reg_field
+from zope.processlifetime import DatabaseOpenedWithRoot
+
+import pytest
+import transaction
+
+
+class TestPatternTrie:
+    @pytest.mark.parametrize(
+        "pattern, name, matches",
+        [
+            (
+                "*.IThemeSettings.enabled",
+                "plone.app.theming.IThemeSettings.enabled",
+                True,
+            ),
+            ("*.IThemeSettings.enabled", "x.IThemeSettings.enabled", True),
+            ("*.IThemeSettings.enabled", "IThemeSettings.enabled", False),
+            ("*.IThemeSettings.enabled", "a.IThemeSettings.enabled.b", False),
+            ("plone.app.theming.*", "plone.app.theming.a.b", True),
+            ("plone.app.theming.*", "plone.app.theming", False),
+            ("plone.*.enabled", "plone.x.y.enabled", True),
+            ("plone.*.enabled", "plone.enabled", False),
+            ("*.a.*", "x.a.y", True),
+            ("*.a.*", "x.a", False),
+        ],
+    )
+    def test_match(self, pattern, name, matches):
+        from plone.registryfromenviron.patterns import PatternTrie
+
+        trie = PatternTrie({pattern: "v"})
+        assert (trie.match(name) is not None) is matches
+
+    def test_literal_segments_win(self):
+        from plone.registryfromenviron.patterns import PatternTrie
+
+        trie = PatternTrie(
+            {"plone.*": "any", "plone.app.*": "app", "*.enabled": "enabled"}
+        )
+        assert trie.match("plone.app.x.enabled") == ("plone.app.*", "app")
+        assert trie.match("plone.x") == ("plone.*", "any")
+        assert trie.match("other.enabled") == ("*.enabled", "enabled")
+        assert trie.match("other.x") is None
+
+    def test_empty(self):
+        from plone.registryfromenviron.patterns import PatternTrie
+
+        trie = PatternTrie()
+        assert not trie
+        assert trie.match("a.b") is None
+
+    @pytest.mark.parametrize(
+        "value", ["no-assignment", "plone.smtp_host=x", "plone..*=x", "a.b*=x"]
+    )
+    def test_parse_invalid(self, value):
+        from plone.registryfromenviron.patterns import parse_pattern
+
+        with pytest.raises(ValueError):
+            parse_pattern(value)
+
+    def test_parse(self):
+        from plone.registryfromenviron.patterns import parse_pattern
+
+        assert parse_pattern(" *.enabled =a=b") == ("*.enabled", "a=b")
+
+
+class TestScan:
+    def test_scan_environ(self, monkeypatch, caplog):
+        from plone.registryfromenviron.environ import scan_environ
+
+        monkeypatch.setenv("PLONE_REGISTRYPATTERN_THEMES", "*.IThemeSettings.enabled=0")
+        monkeypatch.setenv("PLONE_REGISTRYPATTERN_BROKEN", "nothing")
+        overrides = scan_environ()
+        assert overrides["*.IThemeSettings.enabled"] == "0"
+        assert "PLONE_REGISTRYPATTERN_BROKEN" in caplog.text
+
+    def test_scan_env_file(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_env_file
+
+        path = tmp_path / "overrides.env"
+        path.write_text(
+            "PLONE_REGISTRYPATTERN_1='my.*=x'\nPLONE_REGISTRY_my__number=1\n"
+        )
+        assert scan_env_file(path) == {"my.*": "x", "my.number": "1"}
+
+    def test_table_splits_patterns(self):
+        from plone.registryfromenviron.environ import OverrideTable
+
+        table = OverrideTable({"my.*": "x", "my.number": "1"})
+        assert dict(table) == {"my.number": "1"}
+        assert dict(table.patterns.items()) == {"my.*": "x"}
+
+
+class TestExpand:
+    @pytest.fixture
+    def patterned(self, _clean_overrides):
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+
+        original = _clean_overrides.RAW_OVERRIDES
+        table = OverrideTable({"my.*": "1", "*.flag": "on", "my.textline": "exact"})
+        swap_overrides(table)
+        yield table
+        swap_overrides(original)
+
+    def test_exact_keys_win(self, patterned, registry):
+        from plone.registryfromenviron.environ import expand_patterns
+        from plone.registryfromenviron.environ import get_override
+
+        added = expand_patterns(registry)
+        assert "my.textline" not in added
+        assert get_override(registry, "my.textline") == "exact"
+        assert get_override(registry, "my.number") == 1
+        assert get_override(registry, "my.flag") is True
+        assert patterned.matched["my.flag"] == "my.*"
+        assert "my.textline" not in patterned.matched
+
+    def test_expand_bumps_generation(self, patterned, registry):
+        from plone.registryfromenviron.environ import expand_patterns
+
+        generation = patterned.generation
+        expand_patterns(registry)
+        assert patterned.generation != generation
+        generation = patterned.generation
+        assert expand_patterns(registry) == []
+        assert patterned.generation == generation
+
+    def test_exact_assignment_drops_match(self, patterned):
+        patterned.expand(["my.rate"])
+        patterned["my.rate"] = "2"
+        assert "my.rate" not in patterned.matched
+
+    def test_added_record_matches(self, patterned, registry, subscribe):
+        from plone.registry.record import Record
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import invalidate_added
+
+        subscribe(invalidate_added)
+        registry.records["my.late"] = Record(reg_field.Int(), 0)
+        assert get_override(registry, "my.late") == 1
+
+    def test_miss_does_not_match(self, monkeypatch, patterned, registry):
+        from plone.registryfromenviron.patch import apply_patch
+        from plone.registryfromenviron.patch import unpatch
+
+        unpatch()
+        apply_patch()
+        try:
+            patterned.expand(["my.number"])
+            monkeypatch.setattr(patterned.patterns, "match", pytest.fail, raising=False)
+            assert registry["my.number"] == 1
+            assert registry.get("other.key", "default") == "default"
+        finally:
+            unpatch()
+
+
+class TestStartup:
+    def test_database_open_expands(self, monkeypatch, _clean_overrides, database):
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+        from plone.registryfromenviron.startup import prepare_sites
+
+        monkeypatch.delenv("PLONE_REGISTRYFROMENVIRON_EAGER", raising=False)
+        original = swap_overrides(OverrideTable({"*.number": "3"}))
+        try:
+            prepare_sites(DatabaseOpenedWithRoot(database))
+            assert _clean_overrides.RAW_OVERRIDES.matched == {"my.number": "*.number"}
+        finally:
+            swap_overrides(original)
+
+    def test_eager_compile_expands(self, monkeypatch, _clean_overrides, database):
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import OverrideTable
+        from plone.registryfromenviron.environ import swap_overrides
+        from plone.registryfromenviron.startup import eager_compile
+        from plone.registryfromenviron.startup import prepare_sites
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "strict")
+        original = swap_overrides(OverrideTable({"*.number": "3"}))
+        try:
+            prepare_sites(DatabaseOpenedWithRoot(database))
+            assert not _clean_overrides.RAW_OVERRIDES.matched
+            eager_compile(DatabaseOpenedWithRoot(database))
+            assert _clean_overrides.RAW_OVERRIDES.matched == {"my.number": "*.number"}
+            connection = database.open()
+            registry = connection.root()["Application"].plone.portal_registry
+            assert get_override(registry, "my.number") == 3
+            transaction.abort()
+            connection.close()
+        finally:
+            swap_overrides(original)
+
+
+class TestStats:
+    def test_pattern_label(self):
+        from plone.registryfromenviron.stats import KeyStats
+        from plone.registryfromenviron.stats import render
+
+        stats = KeyStats()
+        stats.hit("my.number")
+        stats.hit("my.rate")
+        text = render(stats.snapshot(), patterns={"my.number": "my.*"})
+        assert (
+            'plone_registryfromenviron_override_hits_total{key="my.number",'
+            'pattern="my.*"} 1'
+        ) in text
+        assert 'override_hits_total{key="my.rate"} 1' in text
@@ -0,0 +1,104 @@
+"""Tests for registry read profiling."""
+
+from io import BytesIO
+from zope.globalrequest import clearRequest
+from zope.globalrequest import setRequest
+from ZPublisher.HTTPRequest import HTTPRequest
+from ZPublisher.HTTPResponse import HTTPResponse
+from ZPublisher.pubevents import PubSuccess
+
+import json
+import pytest
+
+
+@pytest.fixture
+def profiled(monkeypatch, patched):
+    """Patch with profiling enabled and fresh profile state."""
+    from plone.registryfromenviron import patch
+    from plone.registryfromenviron import profile
+    from plone.registryfromenviron.stats import ThreadTables
+
+    monkeypatch.setattr(profile, "ENABLED", True)
+    monkeypatch.setattr(profile, "_KEYS", ThreadTables(3))
+    monkeypatch.setattr(profile, "_dumped", {})
+    monkeypatch.setattr(profile, "_requests", [])
+    patch.rebind()
+    return profile
+
+
+def _request(path):
+    request = HTTPRequest(
+        BytesIO(),
+        {"SERVER_NAME": "x", "SERVER_PORT": "80", "PATH_INFO": path},
+        HTTPResponse(),
+    )
+    setRequest(request)
+    return request
+
+
+class TestProfile:
+    def test_counts_reads_and_zodb_reads(self, profiled, _clean_overrides, registry):
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert registry["my.number"] == 5
+        assert registry.get("my.number") == 5
+        assert registry["my.textline"] == "original"
+        assert registry.get("no.such.key", 1) == 1
+        keys = profiled.collect()["keys"]
+        assert keys["my.number"][:2] == [2, 0]
+        assert keys["my.textline"][:2] == [1, 1]
+        assert keys["no.such.key"][:2] == [1, 1]
+        assert keys["my.textline"][2] >= 0
+
+    def test_collect_returns_interval_deltas(self, profiled, registry):
+        registry.get("my.textline")
+        assert profiled.collect()["keys"]["my.textline"][:2] == [1, 1]
+        assert profiled.collect()["keys"] == {}
+        registry.get("my.textline")
+        assert profiled.collect()["keys"]["my.textline"][:2] == [1, 1]
+
+    def test_per_request_summary(self, profiled, registry):
+        request = _request("/plone/front-page")
+        try:
+            for _ in range(3):
+                registry.get("my.textline")
+            registry.get("my.number")
+        finally:
+            clearRequest()
+        profiled.request_finished(PubSuccess(request))
+        assert profiled.PROFILE_KEY not in request.other
+        [summary] = profiled.collect()["requests"]
+        url, reads, distinct, zodb_reads, zodb_ms, top = summary
+        assert zodb_ms >= 0
+        assert url.endswith("/plone/front-page")
+        assert (reads, distinct, zodb_reads) == (4, 2, 4)
+        assert top == [["my.textline", 3], ["my.number", 1]]
+
+    def test_keeps_slowest_requests(self, monkeypatch, profiled):
+        monkeypatch.setattr(profiled, "MAX_REQUESTS", 2)
+        for path, seconds in (("/a", 0.1), ("/b", 0.3), ("/c", 0.2)):
+            request = _request(path)
+            clearRequest()
+            request.other[profiled.PROFILE_KEY] = {"k": [1, 1, seconds]}
+            profiled.request_finished(PubSuccess(request))
+        requests = profiled.collect()["requests"]
+        assert [summary[0][-2:] for summary in requests] == ["/b", "/c"]
+
+    def test_dump_appends_json_lines(self, profiled, registry, tmp_path):
+        path = tmp_path / "profile.jsonl"
+        registry.get("my.textline")
+        profiled.dump(path)
+        profiled.dump(path)
+        first, second = (json.loads(line) for line in path.read_text().splitlines())
+        assert first["keys"]["my.textline"][:2] == [1, 1]
+        assert second["keys"] == {}
+        assert {"time", "pid", "seconds", "requests"} <= first.keys()
+
+    def test_disabled_ignores_request_end(self, monkeypatch):
+        from plone.registryfromenviron import profile
+
+        monkeypatch.setattr(profile, "ENABLED", False)
+        request = _request("/")
+        clearRequest()
+        request.other[profile.PROFILE_KEY] = {"k": [1, 0, 0.0]}
+        profile.request_finished(PubSuccess(request))
+        assert profile.PROFILE_KEY in request.other
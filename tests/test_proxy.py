@@ -0,0 +1,149 @@
+"""Tests for the override-aware forInterface / RecordsProxy."""
+
+from zope import schema
+from zope.interface import Interface
+
+import pytest
+
+
+class ISettings(Interface):
+    number = schema.Int(title="A number")
+    textline = schema.TextLine(title="A text")
+    flag = schema.Bool(title="A flag")
+
+
+class IMissing(Interface):
+    number = schema.Int(title="A number")
+    absent = schema.TextLine(title="Not in the registry")
+
+
+class TestForInterface:
+    def test_reads_zodb_and_overrides(self, patched, registry):
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        settings = registry.forInterface(ISettings, prefix="my")
+        assert settings.number == 42
+        assert settings.textline == "original"
+        assert settings.flag is False
+        assert ISettings.providedBy(settings)
+
+    def test_state_is_cached(self, monkeypatch, patched, registry):
+        from plone.registryfromenviron import proxy
+
+        first = registry.forInterface(ISettings, prefix="my")
+        omitted = registry.forInterface(ISettings, prefix="my", omit=("flag",))
+        assert omitted.__dict__["__keys__"] is not first.__dict__["__keys__"]
+        monkeypatch.setattr(proxy, "getFieldNames", pytest.fail)
+        second = registry.forInterface(ISettings, prefix="my.")
+        assert second is not first
+        assert second.__dict__["__keys__"] is first.__dict__["__keys__"]
+        assert ISettings.providedBy(second)
+        patched.RAW_OVERRIDES["my.number"] = "42"
+        assert first.number == second.number == 42
+
+    def test_keeps_acquisition_chain(self, patched):
+        from Acquisition import aq_base
+        from Acquisition import aq_parent
+        from OFS.Folder import Folder
+        from plone.app.registry.registry import Registry
+        from plone.registry import field as reg_field
+
+        app = Folder("")
+        app._setObject("plone", Folder("plone"))
+        app.plone._setObject("portal_registry", Registry("portal_registry"))
+        site = app.plone
+        records = site.portal_registry.records
+        for name in ("number", "textline", "flag"):
+            records._fields[f"my.{name}"] = reg_field.Int()
+            records._values[f"my.{name}"] = 0
+        for _ in range(2):
+            settings = site.portal_registry.forInterface(ISettings, prefix="my")
+            registry = aq_parent(settings)
+            assert aq_base(registry) is aq_base(site.portal_registry)
+            assert aq_base(aq_parent(registry)) is aq_base(site)
+
+    def test_missing_record_raises(self, patched, registry):
+        with pytest.raises(KeyError, match="absent"):
+            registry.forInterface(IMissing, prefix="my")
+
+    def test_unchecked_proxy_for_missing_record(self, patched, registry):
+        settings = registry.forInterface(IMissing, check=False, prefix="my")
+        assert settings.absent is None
+
+    def test_check_cached_per_process(self, patched, registry, monkeypatch):
+        from plone.registryfromenviron import proxy
+
+        registry.forInterface(ISettings, prefix="my")
+        calls = []
+        monkeypatch.setattr(proxy, "_check", lambda *args: calls.append(args))
+        delattr(registry, proxy._CACHE_ATTR)
+        registry.forInterface(ISettings, prefix="my")
+        assert calls == []
+
+    def test_override_covers_check(self, patched, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        del registry._records._values["my.number"]
+        patched.RAW_OVERRIDES["my.number"] = "5"
+        # the override was coerced while the record still existed
+        registry._records._values["my.number"] = 0
+        get_override(registry, "my.number")
+        del registry._records._values["my.number"]
+        assert registry.forInterface(ISettings, prefix="my").number == 5
+
+    def test_cached_proxy_sees_new_overrides(self, patched, registry):
+        settings = registry.forInterface(ISettings, prefix="my")
+        assert settings.number == 0
+        patched.RAW_OVERRIDES["my.number"] = "8"
+        assert settings.number == 8
+        del patched.RAW_OVERRIDES["my.number"]
+        assert settings.number == 0
+
+    def test_collection_of_interface(self, patched, registry):
+        from plone.registry import field as reg_field
+
+        records = registry._records
+        records._fields["coll/one.number"] = reg_field.Int()
+        records._values["coll/one.number"] = 1
+        records._fields["coll/one.textline"] = reg_field.TextLine()
+        records._values["coll/one.textline"] = "one"
+        records._fields["coll/one.flag"] = reg_field.Bool()
+        records._values["coll/one.flag"] = False
+        patched.RAW_OVERRIDES["coll/one.number"] = "11"
+        collection = registry.collectionOfInterface(ISettings, prefix="coll")
+        assert collection.keys() == ["one"]
+        assert collection["one"].number == 11
+        assert collection["one"].flag is False
+
+    def test_removal_invalidates(self, patched, registry, subscribe):
+        from plone.registryfromenviron.proxy import invalidate_proxies
+
+        subscribe(invalidate_proxies)
+        registry.forInterface(ISettings, prefix="my")
+        del registry.records["my.textline"]
+        with pytest.raises(KeyError, match="textline"):
+            registry.forInterface(ISettings, prefix="my")
+
+    def test_custom_factory(self, patched, registry):
+        from plone.registry.recordsproxy import RecordsProxy
+
+        class MyProxy(RecordsProxy):
+            pass
+
+        settings = registry.forInterface(ISettings, prefix="my", factory=MyProxy)
+        assert type(settings) is MyProxy
+        assert settings.__parent__ is registry
+
+    def test_write_through_proxy(self, patched, registry):
+        settings = registry.forInterface(ISettings, prefix="my")
+        settings.number = 3
+        assert registry.records._values["my.number"] == 3
+        assert settings.number == 3
+
+    def test_unpatch_restores_for_interface(self, patched):
+        from plone.registry.registry import Registry
+        from plone.registryfromenviron.patch import _originals
+        from plone.registryfromenviron.patch import unpatch
+
+        original = _originals["forInterface"]
+        unpatch()
+        assert Registry.forInterface is original
@@ -0,0 +1,293 @@
+"""Tests for live reload of overrides."""
+
+from io import BytesIO
+from ZPublisher.HTTPRequest import HTTPRequest
+from ZPublisher.HTTPResponse import HTTPResponse
+
+import json
+import os
+import pytest
+import signal
+import threading
+import transaction
+
+
+@pytest.fixture
+def reloadable(monkeypatch, tmp_path, _clean_overrides):
+    """An ENV_FILE source; restores the override table and the patch."""
+    from plone.registryfromenviron import patch
+    from plone.registryfromenviron import proxy
+
+    environ = _clean_overrides
+    original = environ.RAW_OVERRIDES
+    was_patched = bool(patch._originals)
+    for name in list(os.environ):
+        if name.startswith(environ.PREFIX):
+            monkeypatch.delenv(name)
+    env_file = tmp_path / "overrides.env"
+    env_file.write_text("")
+    monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_ENV_FILE", str(env_file))
+    patch.unpatch()
+    patch.apply_patch()
+    yield env_file
+    environ.swap_overrides(original)
+    patch.unpatch()
+    if was_patched:
+        patch.apply_patch()
+    proxy.reset()
+
+
+@pytest.fixture
+def site_registry(database):
+    connection = database.open()
+    yield connection.root()["Application"].plone.portal_registry
+    transaction.abort()
+    connection.close()
+
+
+class TestScanEnvFile:
+    def test_parses_assignments(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_env_file
+
+        path = tmp_path / "overrides.env"
+        path.write_text(
+            "# comment\n"
+            "\n"
+            "PLONE_REGISTRY_plone__smtp_host=mail.example.com\n"
+            'PLONE_REGISTRY_my__items = ["a", "b"]\n'
+            "PLONE_REGISTRY_my__quoted='a b'\n"
+            "OTHER=ignored\n"
+            "no assignment\n"
+        )
+        assert scan_env_file(path) == {
+            "plone.smtp_host": "mail.example.com",
+            "my.items": '["a", "b"]',
+            "my.quoted": "a b",
+        }
+
+    def test_file_wins_over_environment(self, monkeypatch, tmp_path):
+        from plone.registryfromenviron.environ import read_overrides
+
+        path = tmp_path / "overrides.env"
+        path.write_text("PLONE_REGISTRY_my__number=2\n")
+        monkeypatch.setenv("PLONE_REGISTRY_my__number", "1")
+        monkeypatch.setenv("PLONE_REGISTRY_my__flag", "true")
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_ENV_FILE", str(path))
+        overrides = read_overrides()
+        assert overrides["my.number"] == "2"
+        assert overrides["my.flag"] == "true"
+
+
+class TestReloadOverrides:
+    def test_swaps_and_precompiles(self, reloadable, database, site_registry):
+        from plone.registryfromenviron import environ
+        from plone.registryfromenviron.reload import reload_overrides
+
+        reloadable.write_text("PLONE_REGISTRY_my__number=5\n")
+        report = reload_overrides(database)
+        assert report["added"] == ["my.number"]
+        assert report["sites"]["/plone"]["applied"] == ["my.number"]
+        assert [
+            {name: entry[1] for name, entry in table.items()}
+            for table in environ.RAW_OVERRIDES.coerced.values()
+        ] == [{"my.number": 5}]
+        assert site_registry["my.number"] == 5
+
+        reloadable.write_text("PLONE_REGISTRY_my__number=6\n")
+        assert reload_overrides(database)["changed"] == ["my.number"]
+        assert site_registry.get("my.number") == 6
+        assert site_registry.records["my.number"].value == 6
+
+        reloadable.write_text("")
+        assert reload_overrides(database)["removed"] == ["my.number"]
+        assert site_registry["my.number"] == 0
+
+    def test_invalid_value_rejects_whole_reload(
+        self, reloadable, database, site_registry
+    ):
+        from plone.registryfromenviron import environ
+        from plone.registryfromenviron.reload import reload_overrides
+        from plone.registryfromenviron.startup import InvalidOverrides
+
+        reloadable.write_text("PLONE_REGISTRY_my__number=5\n")
+        reload_overrides(database)
+        current = environ.RAW_OVERRIDES
+        reloadable.write_text(
+            "PLONE_REGISTRY_my__number=many\nPLONE_REGISTRY_no__such__key=x\n"
+        )
+        with pytest.raises(InvalidOverrides, match=r"my\.number"):
+            reload_overrides(database)
+        assert environ.RAW_OVERRIDES is current
+        assert site_registry["my.number"] == 5
+
+    def test_unreadable_source_rejects(self, reloadable, database):
+        from plone.registryfromenviron import environ
+        from plone.registryfromenviron.reload import reload_overrides
+
+        current = environ.RAW_OVERRIDES
+        reloadable.unlink()
+        with pytest.raises(OSError):
+            reload_overrides(database)
+        assert environ.RAW_OVERRIDES is current
+
+    def test_without_database_swaps_unvalidated(self, reloadable, registry):
+        from plone.registryfromenviron.reload import reload_overrides
+
+        reloadable.write_text("PLONE_REGISTRY_my__textline=reloaded\n")
+        assert reload_overrides()["sites"] == {}
+        assert registry["my.textline"] == "reloaded"
+
+    def test_applies_patch_when_unpatched(self, reloadable, registry):
+        from plone.registryfromenviron import patch
+        from plone.registryfromenviron.reload import reload_overrides
+
+        patch.unpatch()
+        reloadable.write_text("PLONE_REGISTRY_my__textline=reloaded\n")
+        reload_overrides()
+        assert patch._originals
+        assert registry["my.textline"] == "reloaded"
+
+    def test_restores_retired_lookups(self, monkeypatch, reloadable, registry):
+        from plone.registryfromenviron import memo
+        from plone.registryfromenviron import patch
+        from plone.registryfromenviron.reload import reload_overrides
+
+        monkeypatch.setattr(memo, "ENABLED", True)
+        patch.rebind()
+        assert patch.retire_if_all_invalid(
+            {"/plone": {"applied": [], "unknown": [], "invalid": ["x"]}}
+        )
+        reloadable.write_text("PLONE_REGISTRY_my__textline=reloaded\n")
+        reload_overrides()
+        assert registry["my.textline"] == "reloaded"
+
+    def test_cached_proxy_follows_reload(self, reloadable, database, site_registry):
+        from plone.registryfromenviron.reload import reload_overrides
+        from zope import schema
+        from zope.interface import Interface
+
+        class INumber(Interface):
+            number = schema.Int()
+
+        settings = site_registry.forInterface(INumber, prefix="my")
+        assert settings.number == 0
+        reloadable.write_text("PLONE_REGISTRY_my__number=9\n")
+        reload_overrides(database)
+        assert site_registry.forInterface(INumber, prefix="my") is not settings
+        assert settings.number == 9
+
+    def test_readers_see_one_table(self, reloadable, registry):
+        """Every read returns a value of the old or the new table."""
+        from plone.registryfromenviron.reload import reload_overrides
+
+        tables = [
+            "PLONE_REGISTRY_my__number=1\nPLONE_REGISTRY_my__textline=one\n",
+            "PLONE_REGISTRY_my__number=2\nPLONE_REGISTRY_my__flag=true\n",
+        ]
+        seen = set()
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                seen.add((registry["my.number"], registry.get("my.number")))
+
+        reloadable.write_text(tables[0])
+        reload_overrides()
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for i in range(50):
+                reloadable.write_text(tables[i % 2])
+                reload_overrides()
+        finally:
+            stop.set()
+            reader.join()
+        assert {value for pair in seen for value in pair} <= {1, 2}
+
+
+class TestSignal:
+    def test_signal_triggers_reload(self, monkeypatch, reloadable, registry):
+        from plone.registryfromenviron import reload
+
+        previous = signal.getsignal(signal.SIGHUP)
+        done = threading.Event()
+        original = reload.reload_overrides
+
+        def reload_overrides(db=None):
+            try:
+                return original(db)
+            finally:
+                done.set()
+
+        monkeypatch.setattr(reload, "reload_overrides", reload_overrides)
+        try:
+            assert reload.install_signal_handler("hup")
+            reloadable.write_text("PLONE_REGISTRY_my__textline=signalled\n")
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert done.wait(5)
+        finally:
+            signal.signal(signal.SIGHUP, previous)
+        assert registry["my.textline"] == "signalled"
+
+    def test_unknown_signal(self):
+        from plone.registryfromenviron.reload import install_signal_handler
+
+        assert not install_signal_handler("NOPE")
+
+    def test_setup_remembers_database(self, monkeypatch, database):
+        from plone.registryfromenviron import reload
+        from zope.processlifetime import DatabaseOpenedWithRoot
+
+        monkeypatch.setattr(reload, "_database", None)
+        monkeypatch.delenv("PLONE_REGISTRYFROMENVIRON_RELOAD_SIGNAL", raising=False)
+        reload.setup_reload(DatabaseOpenedWithRoot(database))
+        assert reload._database is database
+
+
+class TestReloadView:
+    def _call(self, database, method):
+        from plone.registryfromenviron.reload import ReloadView
+
+        connection = database.open()
+        try:
+            app = connection.root()["Application"]
+            response = HTTPResponse()
+            request = HTTPRequest(
+                BytesIO(),
+                {"REQUEST_METHOD": method, "SERVER_NAME": "x", "SERVER_PORT": "80"},
+                response,
+            )
+            body = ReloadView(app, request)()
+        finally:
+            transaction.abort()
+            connection.close()
+        return response.getStatus(), json.loads(body)
+
+    def test_post_reloads(self, reloadable, database):
+        reloadable.write_text("PLONE_REGISTRY_my__number=5\n")
+        status, body = self._call(database, "POST")
+        assert status == 200
+        assert body["status"] == "reloaded"
+        assert body["added"] == ["my.number"]
+
+    def test_get_not_allowed(self, reloadable, database):
+        status, body = self._call(database, "GET")
+        assert status == 405
+        assert body["status"] == "error"
+
+    def test_rejected(self, reloadable, database):
+        reloadable.write_text("PLONE_REGISTRY_my__number=many\n")
+        status, body = self._call(database, "POST")
+        assert status == 409
+        assert body["status"] == "rejected"
+        assert "my.number" in body["error"]
+
+    def test_invalid_document_rejected(
+        self, monkeypatch, reloadable, database, tmp_path
+    ):
+        document = tmp_path / "overrides.json"
+        document.write_text("{")
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_DOCUMENT", str(document))
+        status, body = self._call(database, "POST")
+        assert status == 409
+        assert body["status"] == "rejected"
@@ -0,0 +1,249 @@
+"""Tests for site-scoped overrides."""
+
+from OFS.Folder import Folder
+from plone.base.interfaces import IPloneSiteRoot
+from plone.registry import field as reg_field
+from plone.registry.registry import Registry
+from zope.interface import alsoProvides
+from zope.processlifetime import DatabaseOpenedWithRoot
+
+import pytest
+import transaction
+
+
+@pytest.fixture
+def site_paths(monkeypatch):
+    """An empty registry-to-site binding for one test."""
+    from plone.registryfromenviron import environ
+
+    paths = {}
+    monkeypatch.setattr(environ, "SITE_PATHS", paths)
+    return paths
+
+
+@pytest.fixture
+def scoped(_clean_overrides, site_paths):
+    """Swap in a table with global, ``/plone`` and ``/intranet`` overrides."""
+    from plone.registryfromenviron.environ import OverrideTable
+    from plone.registryfromenviron.environ import swap_overrides
+
+    original = _clean_overrides.RAW_OVERRIDES
+    table = OverrideTable(
+        {
+            "my.number": "1",
+            "/plone:my.number": "2",
+            "intranet:my.textline": "intranet",
+        }
+    )
+    swap_overrides(table)
+    yield table
+    swap_overrides(original)
+
+
+@pytest.fixture
+def app(database):
+    """The Zope app of ``database`` with a second site ``/intranet``."""
+    connection = database.open()
+    app = connection.root()["Application"]
+    site = Folder("intranet")
+    alsoProvides(site, IPloneSiteRoot)
+    registry = Registry()
+    registry._records._fields["my.number"] = reg_field.Int()
+    registry._records._values["my.number"] = 0
+    registry._records._fields["my.textline"] = reg_field.TextLine()
+    registry._records._values["my.textline"] = "original"
+    site.portal_registry = registry
+    app._setObject("intranet", site)
+    transaction.commit()
+    yield app
+    transaction.abort()
+    connection.close()
+
+
+class TestSyntax:
+    def test_scan_environ(self, monkeypatch, caplog):
+        from plone.registryfromenviron.environ import scan_environ
+
+        monkeypatch.setenv("PLONE_REGISTRYSITE_plone___plone__smtp_host", "mail")
+        monkeypatch.setenv("PLONE_REGISTRYSITE_plone__smtp_host", "broken")
+        overrides = scan_environ()
+        assert overrides["/plone:plone.smtp_host"] == "mail"
+        assert "PLONE_REGISTRYSITE_plone__smtp_host" in caplog.text
+
+    def test_scan_env_file(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_env_file
+
+        path = tmp_path / "overrides.env"
+        path.write_text("PLONE_REGISTRYSITE_intranet___my__number='3'\n")
+        assert scan_env_file(path) == {"/intranet:my.number": "3"}
+
+    @pytest.mark.parametrize(
+        "key, expected",
+        [
+            ("/plone:plone.smtp_host", ("/plone", "plone.smtp_host")),
+            ("plone:plone.smtp_host", ("/plone", "plone.smtp_host")),
+            ("/sites/plone/:a.b", ("/sites/plone", "a.b")),
+            ("plone.smtp_host", None),
+        ],
+    )
+    def test_split_scope(self, key, expected):
+        from plone.registryfromenviron.environ import split_scope
+
+        assert split_scope(key) == expected
+
+
+class TestTable:
+    def test_scopes_are_split(self, scoped):
+        assert dict(scoped) == {"my.number": "1"}
+        assert scoped.scopes == {
+            "/plone": {"my.number": "2"},
+            "/intranet": {"my.textline": "intranet"},
+        }
+        assert scoped.scoped_items() == {
+            "/plone:my.number": "2",
+            "/intranet:my.textline": "intranet",
+        }
+
+    def test_for_site(self, scoped):
+        assert scoped.for_site("/other") is scoped
+        merged = scoped.for_site("/plone")
+        assert dict(merged) == {"my.number": "2"}
+        assert merged.coerced is scoped.coerced
+        assert scoped.for_site("/plone") is merged
+
+    def test_merged_follows_root(self, scoped):
+        merged = scoped.for_site("/intranet")
+        generation = merged.generation
+        scoped["my.rate"] = "0.5"
+        assert dict(merged) == {
+            "my.number": "1",
+            "my.rate": "0.5",
+            "my.textline": "intranet",
+        }
+        assert merged.generation != generation
+        del scoped["my.number"]
+        assert "my.number" not in merged
+
+
+class TestOverridesFor:
+    def test_cached_per_registry(self, scoped, site_paths, registry):
+        from plone.registryfromenviron.environ import bind_site
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import overrides_for
+
+        bind_site("/plone", registry)
+        table = overrides_for(registry)
+        assert table is scoped.for_site("/plone")
+        site_paths.clear()
+        assert overrides_for(registry) is table
+        assert get_override(registry, "my.number") == 2
+
+    def test_unknown_site_uses_global(self, scoped, registry):
+        from plone.registryfromenviron.environ import get_override
+        from plone.registryfromenviron.environ import overrides_for
+
+        assert overrides_for(registry) is scoped
+        assert not scoped.registries
+        assert get_override(registry, "my.number") == 1
+
+    def test_current_site(self, monkeypatch, scoped, site_paths, app):
+        from plone.registryfromenviron import environ
+
+        site = app.intranet
+        monkeypatch.setattr(environ, "getSite", lambda: site)
+        assert environ.overrides_for(site.portal_registry) is scoped.for_site(
+            "/intranet"
+        )
+        assert list(site_paths.values()) == ["/intranet"]
+        assert environ.overrides_for(app.plone.portal_registry) is scoped
+
+
+class TestAccessors:
+    def test_each_site_reads_its_table(self, scoped, app, patched):
+        from plone.registryfromenviron.startup import iter_site_registries
+
+        dict(iter_site_registries(app))
+        assert app.plone.portal_registry["my.number"] == 2
+        intranet = app.intranet.portal_registry
+        assert intranet["my.number"] == 1
+        assert intranet.get("my.textline") == "intranet"
+        assert intranet.records["my.textline"].value == "intranet"
+        assert app.plone.portal_registry.records["my.number"].value == 2
+
+    def test_site_resolved_once(self, monkeypatch, scoped, app):
+        from plone.registryfromenviron import environ
+        from plone.registryfromenviron.patch import apply_patch
+        from plone.registryfromenviron.patch import unpatch
+        from plone.registryfromenviron.startup import iter_site_registries
+
+        calls = []
+        original = environ.overrides_for
+
+        def overrides_for(registry, overrides=None):
+            calls.append(registry)
+            return original(registry, overrides)
+
+        monkeypatch.setattr(environ, "overrides_for", overrides_for)
+        dict(iter_site_registries(app))
+        unpatch()
+        apply_patch()
+        try:
+            registry = app.plone.portal_registry
+            for _ in range(3):
+                assert registry["my.number"] == 2
+                assert registry.get("my.textline", "x") == "x"
+            assert len(calls) == 1
+        finally:
+            unpatch()
+
+    def test_unknown_site_is_not_cached(self, scoped, registry, patched):
+        from plone.registryfromenviron.environ import bind_site
+
+        assert registry["my.number"] == 1
+        bind_site("/plone", registry)
+        assert registry["my.number"] == 2
+
+    def test_proxy_prefix(self, scoped, app, patched):
+        from plone.registryfromenviron.proxy import OverrideRecordsProxy
+        from plone.registryfromenviron.startup import iter_site_registries
+        from zope import schema
+        from zope.interface import Interface
+
+        class ISettings(Interface):
+            textline = schema.TextLine()
+
+        dict(iter_site_registries(app))
+        proxy = OverrideRecordsProxy(
+            app.intranet.portal_registry, ISettings, prefix="my"
+        )
+        assert proxy.textline == "intranet"
+
+
+class TestStartup:
+    def test_compile_reports_per_site(self, scoped, app):
+        from plone.registryfromenviron.startup import compile_sites
+
+        reports = compile_sites(app)
+        assert reports["/plone"]["applied"] == ["my.number"]
+        assert reports["/intranet"]["applied"] == ["my.number", "my.textline"]
+
+    def test_database_open_binds_sites(self, monkeypatch, scoped, site_paths, database):
+        from plone.registryfromenviron.startup import prepare_sites
+
+        monkeypatch.delenv("PLONE_REGISTRYFROMENVIRON_EAGER", raising=False)
+        prepare_sites(DatabaseOpenedWithRoot(database))
+        assert list(site_paths.values()) == ["/plone"]
+
+    def test_reload_reports_scoped_keys(self, monkeypatch, scoped, database, patched):
+        from plone.registryfromenviron import environ
+        from plone.registryfromenviron.reload import reload_overrides
+
+        monkeypatch.setattr(
+            environ,
+            "read_overrides",
+            lambda: environ.OverrideTable({"my.number": "1", "/plone:my.number": "5"}),
+        )
+        report = reload_overrides(database)
+        assert report["changed"] == ["/plone:my.number"]
+        assert report["removed"] == ["/intranet:my.textline"]
+        assert report["sites"]["/plone"]["applied"] == ["my.number"]
@@ -0,0 +1,172 @@
+"""Tests for the file and document override sources."""
+
+from datetime import datetime
+from plone.registry import field as reg_field
+
+import os
+import pytest
+
+
+@pytest.fixture
+def no_sources(monkeypatch):
+    """An environment without overrides or source settings."""
+    from plone.registryfromenviron import environ
+
+    for name in list(os.environ):
+        if name.startswith((environ.PREFIX, environ.CONFIG_PREFIX)):
+            monkeypatch.delenv(name)
+
+
+class TestReadText:
+    def test_small_file(self, tmp_path):
+        from plone.registryfromenviron.environ import _read_text
+
+        path = tmp_path / "value"
+        path.write_text("grüß")
+        assert _read_text(path) == "grüß"
+
+    def test_large_file_is_mapped(self, monkeypatch, tmp_path):
+        from plone.registryfromenviron import environ
+
+        mapped = []
+        original = environ.mmap.mmap
+
+        def mmap(*args, **kwargs):
+            mapped.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(environ, "MMAP_THRESHOLD", 4)
+        monkeypatch.setattr(environ.mmap, "mmap", mmap)
+        path = tmp_path / "value"
+        path.write_text('["grüß", "x"]')
+        assert environ._read_text(path) == '["grüß", "x"]'
+        assert len(mapped) == 1
+
+
+class TestScanDirectory:
+    def test_one_file_per_key(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_directory
+
+        (tmp_path / "plone.smtp_host").write_text("mail.example.com\n")
+        (tmp_path / "my__items").write_text('["a"]')
+        (tmp_path / "..data").mkdir()
+        (tmp_path / ".hidden").write_text("x")
+        (tmp_path / "subdir").mkdir()
+        assert scan_directory(tmp_path) == {
+            "plone.smtp_host": "mail.example.com",
+            "my.items": '["a"]',
+        }
+
+    def test_missing_directory(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_directory
+
+        with pytest.raises(OSError):
+            scan_directory(tmp_path / "nope")
+
+
+class TestScanDocument:
+    def test_json(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_document
+
+        path = tmp_path / "overrides.json"
+        path.write_text('{"my.items": ["a", "b"], "my.number": 3}')
+        assert scan_document(path) == {"my.items": ["a", "b"], "my.number": 3}
+
+    def test_toml(self, tmp_path):
+        from plone.registryfromenviron.environ import scan_document
+
+        path = tmp_path / "overrides.toml"
+        path.write_text(
+            '"my.mapping" = { k = "v" }\n'
+            '"my.when" = 2026-01-02T03:04:05\n'
+            '"*.flag" = true\n'
+        )
+        assert scan_document(path) == {
+            "my.mapping": {"k": "v"},
+            "my.when": datetime(2026, 1, 2, 3, 4, 5),
+            "*.flag": True,
+        }
+
+    @pytest.mark.parametrize(
+        "name, text", [("a.json", "[1]"), ("b.json", "{"), ("c.toml", "x =")]
+    )
+    def test_invalid(self, tmp_path, name, text):
+        from plone.registryfromenviron.environ import scan_document
+
+        path = tmp_path / name
+        path.write_text(text)
+        with pytest.raises(ValueError):
+            scan_document(path)
+
+
+class TestReadOverrides:
+    def test_order_and_report(self, monkeypatch, no_sources, tmp_path):
+        from plone.registryfromenviron.environ import read_overrides
+
+        env_file = tmp_path / "overrides.env"
+        env_file.write_text("PLONE_REGISTRY_a=env_file\nPLONE_REGISTRY_b=env_file\n")
+        directory = tmp_path / "secrets"
+        directory.mkdir()
+        (directory / "b").write_text("directory")
+        (directory / "c").write_text("directory")
+        document = tmp_path / "overrides.json"
+        document.write_text('{"c": "document", "my.*": 1}')
+        monkeypatch.setenv("PLONE_REGISTRY_a", "environment")
+        monkeypatch.setenv("PLONE_REGISTRY_z", "environment")
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_ENV_FILE", str(env_file))
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_DIRECTORY", str(directory))
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_DOCUMENT", str(document))
+        overrides = read_overrides()
+        assert dict(overrides) == {
+            "a": "env_file",
+            "b": "directory",
+            "c": "document",
+            "z": "environment",
+        }
+        assert dict(overrides.patterns.items()) == {"my.*": 1}
+        assert overrides.sources == [
+            ("environment", 2),
+            (f"env_file {env_file}", 2),
+            (f"directory {directory}", 2),
+            (f"document {document}", 2),
+        ]
+
+    def test_unset_sources_are_not_listed(self, no_sources):
+        from plone.registryfromenviron.environ import read_overrides
+
+        assert read_overrides().sources == [("environment", 0)]
+
+
+class TestParsedValues:
+    def test_list_reaches_coercer_as_list(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        registry._records._fields["my.ints"] = reg_field.List(
+            value_type=reg_field.Int()
+        )
+        registry._records._values["my.ints"] = []
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"my.ints": [1, "2"], "my.number": 3, "my.flag": True}
+        )
+        assert get_override(registry, "my.ints") == [1, 2]
+        assert get_override(registry, "my.number") == 3
+        assert get_override(registry, "my.flag") is True
+
+    def test_toml_datetime(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        registry._records._fields["my.when"] = reg_field.Datetime()
+        registry._records._values["my.when"] = None
+        registry._records._fields["my.day"] = reg_field.Date()
+        registry._records._values["my.day"] = None
+        when = datetime(2026, 1, 2, 3, 4, 5)
+        _clean_overrides.RAW_OVERRIDES.update({"my.when": when, "my.day": when})
+        assert get_override(registry, "my.when") == when
+        assert get_override(registry, "my.day") == when.date()
+
+    def test_wrong_type_is_invalid(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import _MARKER
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES["my.textline"] = True
+        assert get_override(registry, "my.textline") is _MARKER
@@ -0,0 +1,95 @@
+"""Tests for eager override compilation at database open."""
+
+from zope.processlifetime import DatabaseOpenedWithRoot
+
+import logging
+import pytest
+
+
+def _cached_values(environ):
+    return [
+        {
+            name: entry[1]
+            for name, entry in table.items()
+            if entry[2] is not environ._FAILED
+        }
+        for table in environ._COERCED.values()
+    ]
+
+
+class TestEagerMode:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [("", ""), ("0", ""), ("true", "on"), ("ON", "on"), ("strict", "strict")],
+    )
+    def test_eager_mode(self, monkeypatch, value, expected):
+        from plone.registryfromenviron.startup import eager_mode
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", value)
+        assert eager_mode() == expected
+
+
+class TestCompileOverrides:
+    def test_report(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import compile_overrides
+
+        _clean_overrides.RAW_OVERRIDES.update(
+            {"my.number": "5", "my.flag": "yes", "my.rate": "fast", "no.such.key": "x"}
+        )
+        table, report = compile_overrides(registry)
+        assert dict(table) == {"my.number": 5, "my.flag": True}
+        assert report == {
+            "applied": ["my.flag", "my.number"],
+            "unknown": ["no.such.key"],
+            "invalid": ["my.rate"],
+        }
+
+    def test_table_is_read_only(self, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import compile_overrides
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        table, _ = compile_overrides(registry)
+        with pytest.raises(TypeError):
+            table["my.number"] = 6
+
+
+class TestEagerCompile:
+    def test_disabled_by_default(self, monkeypatch, _clean_overrides, database):
+        from plone.registryfromenviron.startup import eager_compile
+
+        monkeypatch.delenv("PLONE_REGISTRYFROMENVIRON_EAGER", raising=False)
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        eager_compile(DatabaseOpenedWithRoot(database))
+        assert _clean_overrides._COERCED == {}
+
+    def test_fills_cache_and_logs_report(
+        self, monkeypatch, caplog, _clean_overrides, database
+    ):
+        from plone.registryfromenviron.startup import eager_compile
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "true")
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "5", "no.such.key": "x"})
+        with caplog.at_level(logging.INFO, logger="plone.registryfromenviron.startup"):
+            eager_compile(DatabaseOpenedWithRoot(database))
+        assert _cached_values(_clean_overrides) == [{"my.number": 5}]
+        assert '"/plone": {"applied": ["my.number"]' in caplog.text
+        assert '"unknown": ["no.such.key"]' in caplog.text
+
+    def test_strict_raises(self, monkeypatch, _clean_overrides, database):
+        from plone.registryfromenviron.startup import eager_compile
+        from plone.registryfromenviron.startup import InvalidOverrides
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "strict")
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "many"
+        with pytest.raises(InvalidOverrides, match=r"my\.number"):
+            eager_compile(DatabaseOpenedWithRoot(database))
+
+    def test_strict_passes_when_all_valid(
+        self, monkeypatch, _clean_overrides, database
+    ):
+        from plone.registryfromenviron.startup import eager_compile
+
+        monkeypatch.setenv("PLONE_REGISTRYFROMENVIRON_EAGER", "strict")
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        eager_compile(DatabaseOpenedWithRoot(database))
+        assert _cached_values(_clean_overrides) == [{"my.number": 5}]
@@ -0,0 +1,125 @@
+"""Tests for the per-key override counters."""
+
+from io import BytesIO
+from ZPublisher.HTTPRequest import HTTPRequest
+from ZPublisher.HTTPResponse import HTTPResponse
+
+import pytest
+import threading
+
+
+@pytest.fixture
+def stats(monkeypatch, _clean_overrides):
+    from plone.registryfromenviron.stats import KeyStats
+
+    key_stats = KeyStats()
+    monkeypatch.setattr(_clean_overrides, "STATS", key_stats)
+    return key_stats
+
+
+class TestKeyStats:
+    def test_hits_and_coercion(self, stats, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        for _ in range(3):
+            get_override(registry, "my.number")
+        get_override(registry, "my.textline")
+        counters = stats.snapshot()
+        assert list(counters) == ["my.number"]
+        assert counters["my.number"]["hits"] == 3
+        assert counters["my.number"]["fallbacks"] == 0
+        assert counters["my.number"]["coercions"] == 1
+        assert counters["my.number"]["coercion_seconds"] > 0
+
+    def test_fallbacks(self, stats, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "many", "no.key": "x"})
+        get_override(registry, "my.number")
+        get_override(registry, "no.key")
+        counters = stats.snapshot()
+        assert counters["my.number"]["fallbacks"] == 1
+        assert counters["my.number"]["coercion_failures"] == 1
+        assert counters["no.key"]["fallbacks"] == 1
+        assert counters["no.key"]["coercions"] == 0
+
+    def test_compile_counts_coercions(self, stats, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import compile_overrides
+
+        _clean_overrides.RAW_OVERRIDES.update({"my.number": "5", "my.rate": "fast"})
+        compile_overrides(registry)
+        counters = stats.snapshot()
+        assert counters["my.number"]["coercions"] == 1
+        assert counters["my.rate"]["coercion_failures"] == 1
+        assert counters["my.number"]["hits"] == 0
+
+    def test_threads_lose_no_increment(self, stats, _clean_overrides, registry):
+        from plone.registryfromenviron.environ import get_override
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        get_override(registry, "my.number")
+
+        def read():
+            for _ in range(2000):
+                get_override(registry, "my.number")
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stats.snapshot()["my.number"]["hits"] == 1 + 8 * 2000
+
+    def test_reset(self, stats):
+        stats.hit("my.number")
+        stats.reset()
+        assert stats.snapshot() == {}
+
+    def test_disabled_by_default(self, _clean_overrides, registry):
+        assert _clean_overrides.STATS is None
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        assert _clean_overrides.get_override(registry, "my.number") == 5
+
+
+class TestRender:
+    def test_prometheus_text(self):
+        from plone.registryfromenviron.stats import render
+
+        text = render(
+            {
+                'my."odd"\\key': {
+                    "hits": 2,
+                    "fallbacks": 0,
+                    "coercions": 1,
+                    "coercion_failures": 0,
+                    "coercion_seconds": 0.5,
+                }
+            },
+            {"hits": 4},
+        )
+        lines = text.splitlines()
+        assert "# TYPE plone_registryfromenviron_override_hits_total counter" in lines
+        assert (
+            'plone_registryfromenviron_override_hits_total{key="my.\\"odd\\"\\\\key"} 2'
+            in lines
+        )
+        assert (
+            "plone_registryfromenviron_override_coercion_seconds_total"
+            '{key="my.\\"odd\\"\\\\key"} 0.5' in lines
+        )
+        assert "plone_registryfromenviron_process_cache_hits_total 4" in lines
+        assert text.endswith("\n")
+
+    def test_view(self, stats, _clean_overrides, registry):
+        from plone.registryfromenviron.stats import MetricsView
+
+        _clean_overrides.RAW_OVERRIDES["my.number"] = "5"
+        _clean_overrides.get_override(registry, "my.number")
+        response = HTTPResponse()
+        request = HTTPRequest(
+            BytesIO(), {"SERVER_NAME": "x", "SERVER_PORT": "80"}, response
+        )
+        body = MetricsView(None, request)()
+        assert response.getHeader("Content-Type").startswith("text/plain")
+        assert 'override_hits_total{key="my.number"} 1' in body
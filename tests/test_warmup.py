@@ -0,0 +1,181 @@
+"""Tests for the registry warm-up at database open."""
+
+from io import BytesIO
+from plone.registry import field as reg_field
+from zope.processlifetime import DatabaseOpenedWithRoot
+from ZPublisher.HTTPRequest import HTTPRequest
+from ZPublisher.HTTPResponse import HTTPResponse
+
+import json
+import pytest
+import transaction
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    """The warmup module, enabled, with no report yet."""
+    from plone.registryfromenviron import warmup
+
+    monkeypatch.setattr(warmup, "ENABLED", True)
+    monkeypatch.setattr(warmup, "REPORT", None)
+    return warmup
+
+
+@pytest.fixture
+def big_database(database):
+    """``database`` with enough records to split the BTrees into buckets."""
+    connection = database.open()
+    records = connection.root()["Application"].plone.portal_registry._records
+    for i in range(500):
+        records._fields[f"bulk.list{i}"] = reg_field.List(
+            value_type=reg_field.TextLine()
+        )
+        records._values[f"bulk.list{i}"] = [str(i)]
+    transaction.commit()
+    connection.close()
+    database.setCacheSize(10000)
+    return database
+
+
+def _ghosts(connection):
+    records = connection.root()["Application"].plone.portal_registry._records
+    fields = [records._fields[f"bulk.list{i}"] for i in range(0, 500, 50)]
+    return [field for field in fields if field._p_changed is None]
+
+
+class TestLoad:
+    def test_loads_trees_and_fields(self, warmup, big_database):
+        connection = big_database.open()
+        try:
+            registry = connection.root()["Application"].plone.portal_registry
+            connection.cacheMinimize()
+            objects = warmup.warm_registry(registry)
+            records = registry._records
+            # 500 lists and their value types, plus buckets.
+            assert objects > 1000
+            for name in records._fields:
+                field = records._fields[name]
+                assert field._p_changed is not None
+                if name.startswith("bulk."):
+                    assert field.value_type._p_changed is not None
+            assert warmup.warm_registry(registry) == 0
+        finally:
+            connection.close()
+
+    def test_prefetches_each_level(self, monkeypatch, warmup, big_database):
+        from ZODB.Connection import Connection
+
+        batches = []
+        original = Connection.prefetch
+
+        def prefetch(self, *args):
+            batches.append(len(args[0]))
+            return original(self, *args)
+
+        monkeypatch.setattr(Connection, "prefetch", prefetch)
+        connection = big_database.open()
+        try:
+            registry = connection.root()["Application"].plone.portal_registry
+            warmup.warm_registry(registry)
+        finally:
+            connection.close()
+        # Whole levels at once, not one object per round trip.
+        assert max(batches) > 100
+        assert len(batches) < 10
+
+
+class TestWarmUp:
+    def test_pooled_connections_stay_warm(self, warmup, big_database):
+        report = warmup.warm_up(big_database, connections=2)
+        assert report["status"] == "warm"
+        assert report["connections"] == 2
+        assert report["objects"] == report["sites"]["/plone"]["objects"] > 1000
+        first, second = big_database.open(), big_database.open()
+        try:
+            assert _ghosts(first) == []
+            assert _ghosts(second) == []
+        finally:
+            first.close()
+            second.close()
+
+    def test_compiles_overrides(self, warmup, _clean_overrides, big_database):
+        _clean_overrides.RAW_OVERRIDES["bulk.list3"] = '["x"]'
+        _clean_overrides.RAW_OVERRIDES["bulk.nope"] = "x"
+        report = warmup.warm_up(big_database, connections=1)
+        assert report["sites"]["/plone"]["overrides"] == {
+            "applied": 1,
+            "unknown": 1,
+            "invalid": 0,
+        }
+        (coerced,) = _clean_overrides.RAW_OVERRIDES.coerced.values()
+        assert coerced["bulk.list3"][1] == ["x"]
+
+    def test_retires_when_all_invalid(self, warmup, patched, big_database):
+        from plone.registryfromenviron import patch
+
+        patched.RAW_OVERRIDES["my.number"] = "x"
+        report = warmup.warm_up(big_database, connections=1)
+        assert report["sites"]["/plone"]["overrides"]["invalid"] == 1
+        assert not patch._originals
+
+    def test_cache_too_small(self, warmup, big_database, caplog):
+        big_database.setCacheSize(100)
+        report = warmup.warm_up(big_database, connections=1)
+        assert report["cache_size"] == 100
+        assert "more than the connection cache size" in caplog.text
+
+
+class TestSubscriber:
+    def test_disabled_by_default(self, monkeypatch, warmup, database):
+        monkeypatch.setattr(warmup, "ENABLED", False)
+        warmup.warm_up_database(DatabaseOpenedWithRoot(database))
+        assert warmup.REPORT is None
+
+    def test_stores_report(self, warmup, database):
+        warmup.warm_up_database(DatabaseOpenedWithRoot(database))
+        assert warmup.REPORT["status"] == "warm"
+        assert warmup.REPORT["connections"] == database.getPoolSize()
+
+    def test_failure(self, monkeypatch, warmup, database, caplog):
+        def broken(registry):
+            raise RuntimeError("storage gone")
+
+        monkeypatch.setattr(warmup, "warm_registry", broken)
+        warmup.warm_up_database(DatabaseOpenedWithRoot(database))
+        assert warmup.REPORT == {"status": "failed"}
+        assert "Registry warm-up failed" in caplog.text
+        assert "storage gone" in caplog.text
+
+
+class TestView:
+    def _call(self):
+        from plone.registryfromenviron.warmup import WarmupView
+
+        response = HTTPResponse()
+        request = HTTPRequest(
+            BytesIO(),
+            {"REQUEST_METHOD": "GET", "SERVER_NAME": "x", "SERVER_PORT": "80"},
+            response,
+        )
+        body = WarmupView(None, request)()
+        return response.getStatus(), json.loads(body)
+
+    def test_pending(self, warmup):
+        assert self._call() == (503, {"status": "pending"})
+
+    def test_warm(self, warmup, database):
+        warmup.warm_up_database(DatabaseOpenedWithRoot(database))
+        status, body = self._call()
+        assert status == 200
+        assert set(body) == {"status", "connections", "objects", "seconds", "sites"}
+        assert body["status"] == "warm"
+        assert body["sites"] == 1
+        assert body["objects"] > 0
+
+    def test_failed(self, monkeypatch, warmup):
+        monkeypatch.setattr(warmup, "REPORT", {"status": "failed"})
+        assert self._call() == (503, {"status": "failed"})
+
+    def test_disabled(self, monkeypatch, warmup):
+        monkeypatch.setattr(warmup, "ENABLED", False)
+        assert self._call() == (200, {"status": "disabled"})